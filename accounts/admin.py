@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Parent, Child, Hospital, Vaccine, Appointment
+from .availability import invalidate_network_availability
+from .catalog import invalidate_catalog
+from .forms import AppointmentAdminForm, CatalogChoiceField
+from .models import Parent, Child, Hospital, Vaccine, VaccineDose, Appointment, HospitalSchedule
+from .roles import invalidate_role
+from .vaccination_schedule import rebuild_due_dates
 
 
 @admin.register(Parent)
@@ -24,22 +29,51 @@ class HospitalAdmin(admin.ModelAdmin):
 
     def approve_hospitals(self, request, queryset):
         queryset.update(approved=True)
+        # update() sends no signals, so drop the cached copies here
+        invalidate_network_availability()
+        invalidate_catalog()
         for hospital in queryset:
+            invalidate_role(hospital.user_id)
             if hospital.user:
                 hospital.user.is_active = True
                 hospital.user.save()
     approve_hospitals.short_description = "Approve selected hospitals"
 
 
+@admin.register(HospitalSchedule)
+class HospitalScheduleAdmin(admin.ModelAdmin):
+    list_display = ['hospital', 'opens_at', 'closes_at', 'slot_minutes', 'doses_per_slot', 'open_weekdays']
+    search_fields = ['hospital__name']
+
+
+class VaccineDoseInline(admin.TabularInline):
+    model = VaccineDose
+    extra = 0
+
+
 @admin.register(Vaccine)
 class VaccineAdmin(admin.ModelAdmin):
     list_display = ['name', 'recommended_age', 'description']
     search_fields = ['name']
+    inlines = [VaccineDoseInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Hand-edited doses change every child's due dates for this vaccine
+        if any(formset.has_changed() for formset in formsets):
+            rebuild_due_dates(vaccine_ids=[form.instance.pk])
 
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
+    form = AppointmentAdminForm
     list_display = ['child', 'hospital', 'parent', 'date', 'time', 'status', 'created_at']
     list_filter = ['status', 'date', 'hospital']
     search_fields = ['child__name', 'parent__user__username', 'hospital__name']
-    date_hierarchy = 'date'
\ No newline at end of file
+    date_hierarchy = 'date'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # The vaccine dropdown comes from the in-process catalog, not a query per form
+        if db_field.name == 'vaccine':
+            return CatalogChoiceField(Vaccine, required=False, label=db_field.verbose_name.capitalize())
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
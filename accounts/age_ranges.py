@@ -0,0 +1,70 @@
+"""Parse free-text vaccine ages such as '0-6 months' into day offsets."""
+import re
+
+UNIT_DAYS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+    'year': 365,
+}
+
+_RANGE = re.compile(
+    r'^(?P<low>\d+(?:\.\d+)?)\s*(?P<low_unit>[a-z]+)?\s*'
+    r'(?:(?:-|to)\s*(?P<high>\d+(?:\.\d+)?)\s*(?P<unit>[a-z]+))?$'
+)
+
+
+def _unit_days(unit):
+    unit = unit.rstrip('s')
+    if unit in ('mo', 'mth'):
+        unit = 'month'
+    elif unit in ('wk', 'w'):
+        unit = 'week'
+    elif unit in ('yr', 'y'):
+        unit = 'year'
+    return UNIT_DAYS.get(unit)
+
+
+def parse_age(text):
+    """Parse one age or age range into ``(min_days, max_days)``, or None.
+
+    >>> parse_age('0-6 months')
+    (0, 180)
+    >>> parse_age('at birth')
+    (0, 0)
+    """
+    text = text.strip().lower()
+    if text in ('birth', 'at birth'):
+        return 0, 0
+    match = _RANGE.match(text)
+    if not match:
+        return None
+    unit = match['unit'] or match['low_unit']
+    if unit is None:
+        return None
+    high_days = _unit_days(unit)
+    low_days = _unit_days(match['low_unit']) if match['low_unit'] else high_days
+    if high_days is None or low_days is None:
+        return None
+    low = round(float(match['low']) * low_days)
+    high = round(float(match['high']) * high_days) if match['high'] else round(float(match['low']) * high_days)
+    if high < low:
+        return None
+    return low, high
+
+
+def parse_recommended_age(text):
+    """Parse a recommended-age string into one ``(min_days, max_days)`` pair per dose.
+
+    A comma- or semicolon-separated list ('6 weeks, 10 weeks, 14 weeks') is
+    read as a dose series. Returns an empty list if any part of the text
+    cannot be understood.
+
+    >>> parse_recommended_age('6 weeks, 10 weeks, 14 weeks')
+    [(42, 42), (70, 70), (98, 98)]
+    """
+    parts = [part for part in re.split(r'[,;]|\band\b', text or '') if part.strip()]
+    doses = [parse_age(part) for part in parts]
+    if None in doses:
+        return []
+    return doses
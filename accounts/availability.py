@@ -0,0 +1,171 @@
+"""Cached vaccine-availability documents for the booking page API.
+
+Documents live in Django's cache and are dropped (after commit) whenever a
+hospital's Inventory rows change, so repeated dropdown toggling is served
+without touching the database. Network-wide documents are keyed on a
+version counter that every invalidation bumps.
+"""
+import hashlib
+import json
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Hospital, Inventory
+
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+NETWORK_VERSION_KEY = "vaccine-availability:network-version"
+
+
+def availability_key(hospital_id):
+    return f"vaccine-availability:{hospital_id}"
+
+
+def get_hospital_availability(hospital_id):
+    """Return the availability document for a hospital, or None if it does not exist.
+
+    The document holds the in-stock vaccine list plus the ``etag`` and
+    ``last_modified`` validators used for conditional GETs.
+    """
+    key = availability_key(hospital_id)
+    document = cache.get(key)
+    if document is None:
+        document = _build_availability(hospital_id)
+        cache.set(key, document, AVAILABILITY_CACHE_TIMEOUT)
+    return document if document['found'] else None
+
+
+async def aget_hospital_availability(hospital_id):
+    """Async ``get_hospital_availability``, sharing its cache entries."""
+    key = availability_key(hospital_id)
+    document = await cache.aget(key)
+    if document is None:
+        rows = [row async for row in _inventory_rows(hospital_id)]
+        if not rows and not await Hospital.objects.filter(id=hospital_id).aexists():
+            document = {'found': False}
+        else:
+            document = _availability_document(rows)
+        await cache.aset(key, document, AVAILABILITY_CACHE_TIMEOUT)
+    return document if document['found'] else None
+
+
+def _inventory_rows(hospital_id):
+    return (
+        Inventory.objects.filter(hospital_id=hospital_id)
+        .order_by('vaccine__name')
+        .values_list('vaccine_id', 'vaccine__name', 'stock_quantity', 'last_updated')
+    )
+
+
+def _build_availability(hospital_id):
+    rows = list(_inventory_rows(hospital_id))
+    if not rows and not Hospital.objects.filter(id=hospital_id).exists():
+        return {'found': False}
+    return _availability_document(rows)
+
+
+def _availability_document(rows):
+    vaccines = [{'id': vaccine_id, 'name': name} for vaccine_id, name, quantity, _ in rows if quantity > 0]
+    body = json.dumps({'vaccines': vaccines}, separators=(',', ':'))
+    return {
+        'found': True,
+        'vaccines': vaccines,
+        'etag': hashlib.md5(body.encode()).hexdigest(),
+        'last_modified': max((row[3] for row in rows), default=None),
+    }
+
+
+def network_version():
+    version = cache.get(NETWORK_VERSION_KEY)
+    if version is None:
+        cache.add(NETWORK_VERSION_KEY, 1, timeout=None)
+        version = cache.get(NETWORK_VERSION_KEY, 1)
+    return version
+
+
+def _bump_network_version():
+    try:
+        cache.incr(NETWORK_VERSION_KEY)
+    except ValueError:
+        cache.add(NETWORK_VERSION_KEY, 1, timeout=None)
+
+
+def get_network_availability(hospital_ids=None, vaccine_id=None, columnar=False):
+    """Return the cached in-stock document for many hospitals at once.
+
+    ``hospital_ids`` of None means every approved hospital. The document
+    holds the serialized JSON ``body`` and its ``etag``; it is built from a
+    single Inventory query joined to Hospital and Vaccine.
+    """
+    if hospital_ids is not None:
+        hospital_ids = sorted(set(hospital_ids))
+    params = json.dumps([hospital_ids, vaccine_id, columnar])
+    key = "vaccine-availability:network:%s:%s" % (
+        network_version(), hashlib.md5(params.encode()).hexdigest()
+    )
+    document = cache.get(key)
+    if document is None:
+        document = _build_network_availability(hospital_ids, vaccine_id, columnar)
+        cache.set(key, document, AVAILABILITY_CACHE_TIMEOUT)
+    return document
+
+
+def _build_network_availability(hospital_ids, vaccine_id, columnar):
+    inventory = Inventory.objects.filter(stock_quantity__gt=0, hospital__approved=True)
+    if hospital_ids is not None:
+        inventory = inventory.filter(hospital_id__in=hospital_ids)
+    if vaccine_id is not None:
+        inventory = inventory.filter(vaccine_id=vaccine_id)
+    rows = inventory.order_by('hospital__name', 'hospital_id', 'vaccine__name').values_list(
+        'hospital_id', 'hospital__name', 'vaccine_id', 'vaccine__name'
+    )
+
+    if columnar:
+        data = _columnar_layout(rows)
+    else:
+        data = {'hospitals': [
+            {
+                'id': hospital_id,
+                'name': hospital_name,
+                'vaccines': [{'id': row[2], 'name': row[3]} for row in group],
+            }
+            for (hospital_id, hospital_name), group in groupby(rows, key=lambda row: row[:2])
+        ]}
+
+    body = json.dumps(data, separators=(',', ':'))
+    return {'body': body, 'etag': hashlib.md5(body.encode()).hexdigest()}
+
+
+def _columnar_layout(rows):
+    """Dictionary-encode hospitals and vaccines; pairs refer to them by position."""
+    hospitals = {'id': [], 'name': []}
+    vaccines = {'id': [], 'name': []}
+    pairs = {'hospital': [], 'vaccine': []}
+    vaccine_index = {}
+    for hospital_id, hospital_name, vaccine_id, vaccine_name in rows:
+        if not hospitals['id'] or hospitals['id'][-1] != hospital_id:
+            hospitals['id'].append(hospital_id)
+            hospitals['name'].append(hospital_name)
+        if vaccine_id not in vaccine_index:
+            vaccine_index[vaccine_id] = len(vaccines['id'])
+            vaccines['id'].append(vaccine_id)
+            vaccines['name'].append(vaccine_name)
+        pairs['hospital'].append(len(hospitals['id']) - 1)
+        pairs['vaccine'].append(vaccine_index[vaccine_id])
+    return {'hospitals': hospitals, 'vaccines': vaccines, 'pairs': pairs}
+
+
+def invalidate_availability(*hospital_ids):
+    """Drop cached availability for these hospitals once the transaction commits."""
+    keys = [availability_key(hospital_id) for hospital_id in hospital_ids]
+    if keys:
+        def invalidate():
+            cache.delete_many(keys)
+            _bump_network_version()
+        transaction.on_commit(invalidate)
+
+
+def invalidate_network_availability():
+    """Drop every network-wide document, e.g. after a hospital is approved."""
+    transaction.on_commit(_bump_network_version)
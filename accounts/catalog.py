@@ -0,0 +1,89 @@
+"""Process-local copies of the vaccine catalog and the approved-hospital list.
+
+Both change rarely but are read on most booking and inventory pages. Each
+process keeps them in memory, tagged with the ``CatalogVersion`` row they
+were loaded at. Saving or deleting a Vaccine or Hospital bumps that row
+(see ``accounts.signals``) and drops this process's copy at once; other
+processes compare their copy with the row at most every
+``CATALOG_CHECK_INTERVAL`` seconds and reload when it has moved.
+
+Callers get fresh model instances built from the stored field values, so
+nothing a request sets on them leaks into another request.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import CatalogVersion, Hospital, Vaccine
+
+DEFAULT_CHECK_INTERVAL = 2.0
+
+
+def _catalog_querysets():
+    return {
+        Vaccine: Vaccine.objects.order_by('name', 'id'),
+        Hospital: Hospital.objects.filter(approved=True).order_by('name', 'id'),
+    }
+
+
+class Catalog:
+    """An immutable snapshot of the catalogs at one version."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        # model: (field attnames, {pk: field values}) in display order
+        self._rows = rows
+
+    @classmethod
+    def load(cls, version):
+        rows = {}
+        for model, queryset in _catalog_querysets().items():
+            names = [field.attname for field in model._meta.concrete_fields]
+            rows[model] = (names, {values[0]: values for values in queryset.values_list(*names)})
+        return cls(version, rows)
+
+    def _build(self, model, values):
+        names, _ = self._rows[model]
+        return model.from_db('default', names, list(values))
+
+    def instances(self, model):
+        """Every cached row of ``model`` as new instances, in display order."""
+        _, rows = self._rows[model]
+        return [self._build(model, values) for values in rows.values()]
+
+    def instance(self, model, pk):
+        """A new instance for ``pk``, or None if it is not in the catalog."""
+        values = self._rows[model][1].get(pk)
+        return None if values is None else self._build(model, values)
+
+    def ids(self, model):
+        return list(self._rows[model][1])
+
+
+_lock = threading.Lock()
+_local = {'catalog': None, 'checked': 0.0}
+
+
+def get_catalog():
+    """Return this process's catalog, checking the shared version if it is due."""
+    interval = getattr(settings, 'CATALOG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+    catalog = _local['catalog']
+    if catalog is not None and time.monotonic() - _local['checked'] < interval:
+        return catalog
+
+    with _lock:
+        catalog = _local['catalog']
+        if catalog is None or time.monotonic() - _local['checked'] >= interval:
+            # Read the version before the rows, so a change in between only costs a reload
+            version = CatalogVersion.current()
+            if catalog is None or catalog.version != version:
+                catalog = Catalog.load(version)
+            _local['catalog'], _local['checked'] = catalog, time.monotonic()
+    return catalog
+
+
+def invalidate_catalog():
+    """Record a catalog change for every process; this one reloads on its next read."""
+    CatalogVersion.bump()
+    _local['catalog'] = None
@@ -0,0 +1,231 @@
+"""Streaming CSV and XLSX exports of a hospital's appointments and stock ledger.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written
+out as they arrive, so an export holds one chunk in memory whatever its
+size. XLSX is written without extra dependencies: ``zipfile`` streams the
+workbook parts to a buffer that is drained after every chunk, and the sheet
+uses inline strings so no shared-string table has to be built up front.
+"""
+import calendar
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Appointment, StockMovement
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# (column header, ORM path)
+APPOINTMENT_COLUMNS = (
+    ('Appointment ID', 'id'),
+    ('Date', 'date'),
+    ('Time', 'time'),
+    ('Status', 'status'),
+    ('Child', 'child__name'),
+    ('Date of birth', 'child__date_of_birth'),
+    ('Parent', 'parent__user__username'),
+    ('Parent email', 'parent__user__email'),
+    ('Parent phone', 'parent__phone_number'),
+    ('Vaccine', 'vaccine__name'),
+    ('Notes', 'notes'),
+    ('Booked at', 'created_at'),
+)
+STOCK_COLUMNS = (
+    ('Movement ID', 'id'),
+    ('Recorded at', 'created_at'),
+    ('Vaccine', 'inventory__vaccine__name'),
+    ('Kind', 'kind'),
+    ('Quantity', 'quantity'),
+    ('Stock on hand', 'inventory__stock_quantity'),
+    ('Appointment ID', 'appointment_id'),
+    ('Child', 'appointment__child__name'),
+    ('Note', 'note'),
+)
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Control characters XML 1.0 cannot carry
+XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def month_range(today=None):
+    today = today or date.today()
+    return today.replace(day=1), today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+
+def parse_filters(params):
+    """Read ?start=&end=&status=&vaccine= (default: this month, everything).
+
+    Raises ValueError for a malformed date, status or vaccine id.
+    """
+    first, last = month_range()
+    start = date.fromisoformat(params['start']) if params.get('start') else first
+    end = date.fromisoformat(params['end']) if params.get('end') else last
+    if end < start:
+        raise ValueError("The end date is before the start date.")
+    status = params.get('status') or None
+    if status is not None and status not in dict(Appointment.STATUS_CHOICES):
+        raise ValueError(f"Unknown status: {status}")
+    vaccine = int(params['vaccine']) if params.get('vaccine') else None
+    return {'start': start, 'end': end, 'status': status, 'vaccine': vaccine}
+
+
+def appointment_rows(hospital_id, filters):
+    rows = Appointment.objects.filter(hospital_id=hospital_id, date__range=(filters['start'], filters['end']))
+    if filters['status']:
+        rows = rows.filter(status=filters['status'])
+    if filters['vaccine']:
+        rows = rows.filter(vaccine_id=filters['vaccine'])
+    rows = rows.order_by('date', 'time', 'id').values_list(*(path for _, path in APPOINTMENT_COLUMNS))
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stock_rows(hospital_id, filters):
+    """The stock ledger for the period; the status filter does not apply here."""
+    rows = StockMovement.objects.filter(
+        inventory__hospital_id=hospital_id,
+        created_at__date__range=(filters['start'], filters['end']),
+    )
+    if filters['vaccine']:
+        rows = rows.filter(inventory__vaccine_id=filters['vaccine'])
+    rows = rows.order_by('created_at', 'id').values_list(*(path for _, path in STOCK_COLUMNS))
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+class _Echo:
+    """A file-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    # The byte-order mark makes Excel read the file as UTF-8
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _csv_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = _text(value)
+    return "'" + text if text.startswith(FORMULA_PREFIXES) else text
+
+
+class _Buffer:
+    """Collects what zipfile writes until the next drain(); it cannot seek."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    if value is None:
+        return '<c/>'
+    text = escape(XML_ILLEGAL.sub('', _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(columns, rows, sheet_name):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31])))
+        # The sheet's size is unknown up front, so allow it to pass 4 GiB
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((SHEET_START + _xlsx_row(header for header, _ in columns)).encode())
+            chunk = []
+            for row in rows:
+                chunk.append(_xlsx_row(row))
+                if len(chunk) == EXPORT_CHUNK_SIZE:
+                    sheet.write(''.join(chunk).encode())
+                    chunk.clear()
+                    yield buffer.drain()
+            sheet.write((''.join(chunk) + SHEET_END).encode())
+    yield buffer.drain()
+
+
+def stream(export_format, columns, rows, sheet_name):
+    """The body iterator for ``export_format`` ('csv' or 'xlsx')."""
+    if export_format == 'xlsx':
+        return stream_xlsx(columns, rows, sheet_name)
+    return stream_csv(columns, rows)
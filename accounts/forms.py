@@ -2,7 +2,10 @@ from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.forms.widgets import DateInput, TimeInput
-from .models import Parent, Child, Hospital, Appointment, Vaccine,Inventory
+from django.db.models import F
+from .models import Parent, Child, Hospital, Appointment, Vaccine, Inventory, HospitalSchedule, AppointmentSlot
+from .catalog import get_catalog
+from .slots import next_free_slots, validate_slot
 from datetime import date
 
 
@@ -121,17 +124,92 @@ class HospitalRegisterForm(forms.ModelForm):
 
 # --- In accounts/forms.py ---
 
+class CatalogChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for instance in get_catalog().instances(self.queryset.model):
+            yield self.choice(instance)
+
+    def __len__(self):
+        return len(get_catalog().ids(self.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_catalog().ids(self.queryset.model))
+
+
+class CatalogChoiceField(forms.ModelChoiceField):
+    """A ModelChoiceField served from the process-local catalog instead of a query.
+
+    Choices and the submitted value both come from ``accounts.catalog``, so
+    rendering and validating the field cost no database round trip.
+    """
+    iterator = CatalogChoiceIterator
+
+    def __init__(self, model, **kwargs):
+        super().__init__(queryset=model.objects.none(), **kwargs)
+        self.model = model
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            instance = get_catalog().instance(self.model, int(getattr(value, 'pk', value)))
+        except (TypeError, ValueError):
+            instance = None
+        if instance is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return instance
+
+
 class AppointmentForm(forms.ModelForm):
-    # ... (Meta and __init__ methods unchanged for now)
+    hospital = CatalogChoiceField(Hospital, widget=forms.Select(attrs={'class': 'form-control'}))
+    vaccine = CatalogChoiceField(Vaccine, required=False, widget=forms.Select(attrs={'class': 'form-control'}))
+
+    class Meta:
+        model = Appointment
+        fields = ['child', 'hospital', 'vaccine', 'date', 'time', 'notes']
+        widgets = {
+            'child': forms.Select(attrs={'class': 'form-control'}),
+            'hospital': forms.Select(attrs={'class': 'form-control'}),
+            'vaccine': forms.Select(attrs={'class': 'form-control'}),
+            'date': DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'time': TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+        }
+
+    def __init__(self, *args, parent=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parent = parent
+        if parent is not None:
+            self.fields['child'].queryset = Child.objects.filter(parent=parent).select_related('parent__user')
+        self.fields['date'].widget.attrs['min'] = date.today().isoformat()
 
     def clean(self):
         cleaned_data = super().clean()
         hospital = cleaned_data.get('hospital')
         vaccine = cleaned_data.get('vaccine')
         date = cleaned_data.get('date')
+        time = cleaned_data.get('time')
 
-        # Existing clean_date validation (important to keep)
-        # ...
+        # Slot must fit the hospital's schedule, if it set one, and still have capacity
+        if hospital and date and time:
+            schedule = HospitalSchedule.for_hospital(hospital.id)
+            problem = validate_slot(schedule, date, time)
+            if problem is None and AppointmentSlot.objects.filter(
+                hospital=hospital, date=date, time=time, booked__gte=F('capacity')
+            ).exists():
+                problem = f"The {time:%H:%M} slot on {date:%b %d, %Y} is fully booked."
+            if problem:
+                suggestions = ", ".join(
+                    f"{day:%b %d} {moment:%H:%M}"
+                    for day, moment in next_free_slots(hospital.id, date, count=3, schedule=schedule)
+                )
+                if suggestions:
+                    problem = f"{problem} Next free slots: {suggestions}."
+                self.add_error('time', problem)
 
         # **New Inventory Validation Logic**
         if hospital and vaccine:
@@ -150,7 +228,28 @@ class AppointmentForm(forms.ModelForm):
                 )
 
         return cleaned_data
-    
+
+
+class AppointmentAdminForm(forms.ModelForm):
+    """Admin edits that would take a full slot (e.g. reopening a cancellation) fail validation."""
+
+    class Meta:
+        model = Appointment
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        hospital = cleaned_data.get('hospital')
+        date = cleaned_data.get('date')
+        time = cleaned_data.get('time')
+        if hospital and date and time and cleaned_data.get('status') in Appointment.ACTIVE_STATUSES:
+            if (hospital.id, date, time) != self.instance.held_slot and AppointmentSlot.objects.filter(
+                hospital=hospital, date=date, time=time, booked__gte=F('capacity')
+            ).exists():
+                self.add_error('time', f"The {time:%H:%M} slot on {date:%b %d, %Y} is fully booked.")
+        return cleaned_data
+
+
 class ChildForm(forms.ModelForm):
     class Meta:
         model = Child
@@ -171,4 +270,12 @@ class ChildForm(forms.ModelForm):
         dob = self.cleaned_data.get('date_of_birth')
         if dob and dob > date.today():
             raise forms.ValidationError("Date of birth cannot be in the future.")
-        return dob
\ No newline at end of file
+        return dob
+
+class RecordImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV file",
+        help_text="Columns: parent, child_name, date_of_birth, gender, and optionally blood_group, "
+                  "vaccine, date, time, status, notes.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
@@ -0,0 +1,57 @@
+"""Version tokens for the dashboards' cached template fragments.
+
+The dashboards wrap their slow-changing parts in ``{% cache %}`` blocks
+keyed on the owner and on version tokens. The profile parts reuse the
+profile version from ``accounts.roles``; the children list has its own token.
+Signals replace a token whenever the data behind a fragment changes, so a
+stale fragment is never read again and simply expires.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from .roles import aprofile_version, profile_version
+
+FRAGMENT_TIMEOUT = 60 * 60
+ANONYMOUS_HOME_KEY = "page:anonymous-home"
+ANONYMOUS_HOME_TIMEOUT = 10 * 60
+
+
+def _children_key(parent_id):
+    return f"children-version:{parent_id}"
+
+
+def children_version(parent_id):
+    version = cache.get(_children_key(parent_id))
+    if version is None:
+        cache.add(_children_key(parent_id), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_children_key(parent_id))
+    return version
+
+
+async def achildren_version(parent_id):
+    version = await cache.aget(_children_key(parent_id))
+    if version is None:
+        await cache.aadd(_children_key(parent_id), uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(_children_key(parent_id))
+    return version
+
+
+def invalidate_children(parent_id):
+    cache.set(_children_key(parent_id), uuid.uuid4().hex, timeout=None)
+
+
+def parent_versions(parent):
+    return {'profile': profile_version(parent), 'children': children_version(parent.pk)}
+
+
+async def aparent_versions(parent):
+    return {'profile': await aprofile_version(parent), 'children': await achildren_version(parent.pk)}
+
+
+def hospital_versions(hospital):
+    return {'profile': profile_version(hospital)}
+
+
+async def ahospital_versions(hospital):
+    return {'profile': await aprofile_version(hospital)}
@@ -0,0 +1,42 @@
+"""Bucket an appointment list by status and by upcoming/past in one pass."""
+from datetime import date
+
+from .models import Appointment
+
+
+class GroupedAppointments:
+    """An evaluated appointment list with its status and upcoming/past buckets.
+
+    The rows are read once, whether a queryset or a list is passed in, and
+    every bucket keeps the original order. Iterating, ``len()`` and truth
+    testing behave like the underlying list, so templates can use it as one.
+    """
+
+    def __init__(self, appointments, today=None):
+        today = today or date.today()
+        self.rows = list(appointments)
+        self.by_status = {status: [] for status, _ in Appointment.STATUS_CHOICES}
+        self.upcoming = []
+        self.past = []
+        for appointment in self.rows:
+            self.by_status.setdefault(appointment.status, []).append(appointment)
+            if appointment.date >= today and appointment.status != 'Cancelled':
+                self.upcoming.append(appointment)
+            else:
+                self.past.append(appointment)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def with_status(self, status):
+        return self.by_status.get(status, [])
+
+    @property
+    def counts(self):
+        return {status: len(rows) for status, rows in self.by_status.items()}
@@ -0,0 +1,257 @@
+"""Bulk import of children and their past vaccinations from CSV.
+
+The file is read as a stream, ``BATCH_SIZE`` rows at a time. Each batch is
+checked one column at a time, parents are resolved with one set-based query
+per batch (vaccines once per file), and new children and appointments go in
+with ``bulk_create`` in one transaction per batch. A bad row is reported
+with its line number and left out; it never stops the rest of the file.
+
+``bulk_create`` skips ``save()``, ``full_clean()`` and signals, so the rules
+of ``Child.clean`` are applied here, and the counters, due dates and cached
+children lists are brought up to date once at the end.
+
+A hospital can only import onto parents it already sees: the ``parent``
+column matches only parents with at least one appointment at the importing
+hospital. Any other parent is reported as an error row, with the same
+message as an unknown one, so an import neither writes to other hospitals'
+families nor reveals who is registered.
+
+Columns: ``parent`` (username or email), ``child_name``, ``date_of_birth``
+and ``gender`` are required; ``blood_group``, ``vaccine``, ``date``,
+``time``, ``status`` (Completed or Cancelled) and ``notes`` are optional.
+A row without a vaccine only adds the child.
+"""
+import csv
+from collections import defaultdict, namedtuple
+from datetime import date, time
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .fragments import invalidate_children
+from .models import Appointment, Child, HospitalAppointmentCounter, Parent, Vaccine
+from .vaccination_schedule import rebuild_due_dates
+
+BATCH_SIZE = 1000
+COLUMNS = ('parent', 'child_name', 'date_of_birth', 'gender', 'blood_group', 'vaccine', 'date', 'time', 'status', 'notes')
+REQUIRED_COLUMNS = ('parent', 'child_name', 'date_of_birth', 'gender')
+# Pending and Approved would hold booking slots; only finished visits are history
+HISTORICAL_STATUSES = ('Completed', 'Cancelled')
+DEFAULT_TIME = time(9, 0)
+
+RowError = namedtuple('RowError', 'line column message')
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.children_created = 0
+        self.appointments_created = 0
+        self.duplicates = 0
+        self.errors = []
+
+    @property
+    def rejected(self):
+        """Number of rows left out because of an error."""
+        return len({error.line for error in self.errors})
+
+
+def import_records(stream, hospital_id, batch_size=BATCH_SIZE):
+    """Import CSV records from the text ``stream`` as history at ``hospital_id``."""
+    reader = csv.DictReader(stream)
+    result = ImportResult()
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        result.errors.append(RowError(1, ', '.join(missing), "Missing required column(s)."))
+        return result
+
+    vaccines = {name.casefold(): pk for name, pk in Vaccine.objects.values_list('name', 'id')}
+    touched_parents, touched_children = set(), set()
+    rows = ((reader.line_num, row) for row in reader)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        result.rows += len(batch)
+        _import_batch(batch, hospital_id, vaccines, result, touched_parents, touched_children)
+
+    if result.appointments_created:
+        HospitalAppointmentCounter.rebuild([hospital_id])
+    if touched_children:
+        rebuild_due_dates(child_ids=touched_children)
+    for parent_id in touched_parents:
+        invalidate_children(parent_id)
+    return result
+
+
+def write_error_report(errors, stream):
+    writer = csv.writer(stream)
+    writer.writerow(['line', 'column', 'message'])
+    writer.writerows(errors)
+
+
+def _parse_date(value):
+    return date.fromisoformat(value)
+
+
+def _parse_time(value):
+    return time.fromisoformat(value) if value else DEFAULT_TIME
+
+
+def _check_column(lines, values, column, check, bad):
+    """Run ``check`` over one column; failures are recorded in ``bad`` and give None."""
+    checked = []
+    for line, value in zip(lines, values):
+        try:
+            checked.append(check(value))
+        except ValueError as error:
+            bad[line].append(RowError(line, column, str(error) or f"Invalid {column}."))
+            checked.append(None)
+    return checked
+
+
+def _import_batch(batch, hospital_id, vaccines, result, touched_parents, touched_children):
+    lines = [line for line, _ in batch]
+    columns = {name: [(row.get(name) or '').strip() for _, row in batch] for name in COLUMNS}
+    bad = defaultdict(list)
+    today = timezone.localdate()
+    genders = {choice.casefold(): choice for choice, _ in Child.GENDER_CHOICES}
+
+    def required(limit):
+        def check(value):
+            if not value:
+                raise ValueError("This field is required.")
+            if len(value) > limit:
+                raise ValueError(f"Longer than {limit} characters.")
+            return value
+        return check
+
+    def birth_date(value):
+        born = _parse_date(value)
+        if born > today:
+            raise ValueError("Date of birth cannot be in the future.")
+        return born
+
+    def gender(value):
+        if value.casefold() not in genders:
+            raise ValueError(f"Gender must be one of: {', '.join(genders.values())}.")
+        return genders[value.casefold()]
+
+    def blood_group(value):
+        if len(value) > 5:
+            raise ValueError("Longer than 5 characters.")
+        return value
+
+    def vaccine(value):
+        if value and value.casefold() not in vaccines:
+            raise ValueError(f"Unknown vaccine '{value}'.")
+        return vaccines[value.casefold()] if value else None
+
+    def visit_date(value):
+        if not value:
+            return None
+        day = _parse_date(value)
+        if day > today:
+            raise ValueError("Only past vaccinations can be imported.")
+        return day
+
+    def status(value):
+        value = value.capitalize() or 'Completed'
+        if value not in HISTORICAL_STATUSES:
+            raise ValueError(f"Status must be one of: {', '.join(HISTORICAL_STATUSES)}.")
+        return value
+
+    parent_keys = _check_column(lines, columns['parent'], 'parent', required(254), bad)
+    names = _check_column(lines, columns['child_name'], 'child_name', required(100), bad)
+    births = _check_column(lines, columns['date_of_birth'], 'date_of_birth', birth_date, bad)
+    gender_values = _check_column(lines, columns['gender'], 'gender', gender, bad)
+    blood_groups = _check_column(lines, columns['blood_group'], 'blood_group', blood_group, bad)
+    vaccine_ids = _check_column(lines, columns['vaccine'], 'vaccine', vaccine, bad)
+    days = _check_column(lines, columns['date'], 'date', visit_date, bad)
+    times = _check_column(lines, columns['time'], 'time', _parse_time, bad)
+    statuses = _check_column(lines, columns['status'], 'status', status, bad)
+
+    # Checks that need more than one column
+    for index, line in enumerate(lines):
+        if vaccine_ids[index] and not days[index] and not columns['date'][index]:
+            bad[line].append(RowError(line, 'date', "A vaccination needs a date."))
+        elif days[index] and not vaccine_ids[index] and not columns['vaccine'][index]:
+            bad[line].append(RowError(line, 'vaccine', "A vaccination needs a vaccine."))
+        elif days[index] and births[index] and days[index] < births[index]:
+            bad[line].append(RowError(line, 'date', "Vaccinated before the date of birth."))
+
+    # Parents of this hospital's patients by username or email, one query for the batch
+    keys = {key for index, key in enumerate(parent_keys) if key and lines[index] not in bad}
+    by_username, by_email = {}, defaultdict(set)
+    matches = Parent.objects.filter(
+        Q(user__username__in=keys) | Q(user__email__in=keys),
+        Exists(Appointment.objects.filter(parent=OuterRef('pk'), hospital_id=hospital_id)),
+    )
+    for parent_id, username, email in matches.values_list('id', 'user__username', 'user__email'):
+        by_username[username] = parent_id
+        by_email[email].add(parent_id)
+    parents = []
+    for index, key in enumerate(parent_keys):
+        parent_id = by_username.get(key)
+        if parent_id is None and len(by_email.get(key, ())) == 1:
+            parent_id = next(iter(by_email[key]))
+        if key and parent_id is None and lines[index] not in bad:
+            problem = "matches more than one parent" if by_email.get(key) else "has no appointments at this hospital"
+            bad[lines[index]].append(RowError(lines[index], 'parent', f"'{key}' {problem}."))
+        parents.append(parent_id)
+
+    good = [index for index, line in enumerate(lines) if line not in bad]
+    for line in sorted(bad):
+        result.errors.extend(bad[line])
+    if not good:
+        return
+
+    with transaction.atomic():
+        # Children already on file are matched on (parent, name, date of birth)
+        child_keys = {(parents[i], names[i], births[i]) for i in good}
+        existing = Child.objects.filter(
+            parent_id__in={key[0] for key in child_keys}, name__in={key[1] for key in child_keys}
+        ).values_list('parent_id', 'name', 'date_of_birth', 'id')
+        child_ids = {(parent_id, name, born): pk for parent_id, name, born, pk in existing}
+
+        new_children = {}
+        for i in good:
+            key = (parents[i], names[i], births[i])
+            if key not in child_ids and key not in new_children:
+                new_children[key] = Child(
+                    parent_id=parents[i], name=names[i], date_of_birth=births[i],
+                    gender=gender_values[i], blood_group=blood_groups[i],
+                )
+        for key, child in zip(new_children, Child.objects.bulk_create(new_children.values())):
+            child_ids[key] = child.pk
+            touched_parents.add(child.parent_id)
+            touched_children.add(child.pk)
+        result.children_created += len(new_children)
+
+        visits = [i for i in good if vaccine_ids[i]]
+        visit_child = {i: child_ids[parents[i], names[i], births[i]] for i in visits}
+        seen = set(
+            Appointment.objects.filter(
+                hospital_id=hospital_id,
+                child_id__in=set(visit_child.values()),
+                date__in={days[i] for i in visits},
+            ).values_list('child_id', 'vaccine_id', 'date')
+        )
+        now = timezone.now()
+        appointments = []
+        for i in visits:
+            key = (visit_child[i], vaccine_ids[i], days[i])
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            appointments.append(Appointment(
+                parent_id=parents[i], child_id=visit_child[i], hospital_id=hospital_id,
+                vaccine_id=vaccine_ids[i], date=days[i], time=times[i], status=statuses[i],
+                notes=columns['notes'][i], created_at=now,
+            ))
+            touched_children.add(visit_child[i])
+        Appointment.objects.bulk_create(appointments)
+        result.appointments_created += len(appointments)
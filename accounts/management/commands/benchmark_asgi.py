@@ -0,0 +1,271 @@
+import asyncio
+import socket
+import subprocess
+import sys
+import time as timer
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import Appointment, Hospital, Inventory, Parent
+
+from .loadtest import QuietHandler, ThreadingWSGIServer, percentile
+
+# (label, sync url name, async url name, who is signed in)
+ENDPOINTS = (
+    ('availability', 'get_available_vaccines_api', 'get_available_vaccines_api_async', None),
+    ('parent dashboard', 'parent_dashboard', 'parent_dashboard_async', 'parent'),
+    ('appointments', 'view_appointments', 'view_appointments_async', 'parent'),
+    ('hospital dashboard', 'hospital_dashboard', 'hospital_dashboard_async', 'hospital'),
+)
+
+
+class BacklogWSGIServer(ThreadingWSGIServer):
+    # socketserver's default listen backlog of 5 drops connections under a burst
+    request_queue_size = 1024
+
+
+class ASGIServer:
+    """A minimal HTTP/1.1 server for an ASGI app, used when uvicorn is not installed.
+
+    It reads one request per connection and buffers the whole response,
+    which is all the benchmark client needs.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def serve(self, port):
+        server = await asyncio.start_server(self.handle, '127.0.0.1', port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        request_line, *lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = request_line.split(' ', 2)
+        headers = []
+        for line in filter(None, lines):
+            name, _, value = line.partition(':')
+            headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+        length = int(dict(headers).get(b'content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': method, 'path': unquote(path), 'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'), 'root_path': '', 'headers': headers,
+            'client': writer.get_extra_info('peername')[:2], 'server': writer.get_extra_info('sockname')[:2],
+        }
+        closed = asyncio.Event()
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Django listens for a disconnect while the view runs
+            await closed.wait()
+            return {'type': 'http.disconnect'}
+
+        response = {'status': 500, 'headers': [], 'body': []}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = message.get('headers', [])
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        try:
+            await self.application(scope, receive, send)
+            content = b''.join(response['body'])
+            status = response['status']
+            lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode()]
+            lines += [
+                name + b': ' + value for name, value in response['headers']
+                if name.lower() not in (b'content-length', b'connection')
+            ]
+            lines += [b'Content-Length: %d' % len(content), b'Connection: close', b'', b'']
+            writer.write(b'\r\n'.join(lines) + content)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            closed.set()
+            writer.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path, cookie):
+    """GET ``path`` on a new connection; returns the status code, or 0 on a connection error."""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+        if cookie:
+            request += f"Cookie: {cookie}\r\n"
+        writer.write((request + "\r\n").encode())
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        return int(data.split(b' ', 2)[1]) if data else 0
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of the read-heavy endpoints under WSGI (a threaded "
+        "wsgiref server) and ASGI (uvicorn when installed, otherwise a minimal asyncio "
+        "server), for both the sync views and their async variants. Each server runs in "
+        "its own process against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight at once.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per endpoint and server.")
+        parser.add_argument('--warmup', type=int, default=50, help="Untimed requests before each run.")
+        parser.add_argument('--server', choices=['uvicorn', 'builtin'], default=None,
+                            help="ASGI server to use (default: uvicorn if importable).")
+        parser.add_argument('--serve', choices=['wsgi', 'asgi'], default=None, help="Internal: run one server.")
+        parser.add_argument('--port', type=int, default=None, help="Internal: port for --serve.")
+
+    def handle(self, *args, **options):
+        if options['serve']:
+            return self.serve(options['serve'], options['port'])
+
+        targets = self.targets()
+        asgi_server = options['server'] or ('uvicorn' if self.uvicorn_available() else 'builtin')
+        servers = [('wsgi', 'wsgi', 'sync'), (f'asgi ({asgi_server})', asgi_server, 'sync'),
+                   (f'asgi ({asgi_server})', asgi_server, 'async')]
+        self.stdout.write(
+            f"{options['concurrency']} concurrent requests, {options['duration']:.0f}s per run"
+        )
+        self.stdout.write(f"{'endpoint':<20} {'server':<18} {'views':<6} {'rps':>8} {'p50':>8} {'p95':>8} "
+                          f"{'p99':>8} {'errors':>7}")
+        results = {}
+        for label, server, views in servers:
+            port = free_port()
+            process = self.start(server, port)
+            try:
+                for endpoint, *_ in ENDPOINTS:
+                    paths, cookie = targets[endpoint]
+                    path = paths[views == 'async']
+                    result = asyncio.run(self.run(port, path, cookie, options))
+                    results[endpoint, label, views] = result
+                    self.stdout.write(
+                        f"{endpoint:<20} {label:<18} {views:<6} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                        f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7}"
+                    )
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+
+        for endpoint, *_ in ENDPOINTS:
+            wsgi = results[endpoint, 'wsgi', 'sync']['rps']
+            best = results[endpoint, f'asgi ({asgi_server})', 'async']['rps']
+            if wsgi:
+                self.stdout.write(f"{endpoint}: async views under ASGI at {best / wsgi:.2f}x WSGI throughput")
+
+    def targets(self):
+        """Per endpoint: its (sync, async) paths and the session cookie of a signed-in user."""
+        parent_id = Appointment.objects.values_list('parent_id', flat=True).first()
+        hospital = Hospital.objects.filter(approved=True, user__isnull=False).select_related('user').first()
+        hospital_id = Inventory.objects.filter(stock_quantity__gt=0).values_list('hospital_id', flat=True).first()
+        if parent_id is None or hospital is None or hospital_id is None:
+            raise CommandError("Need appointments, an approved hospital and stocked inventory; run generate_data first.")
+
+        users = {'parent': Parent.objects.select_related('user').get(id=parent_id).user, 'hospital': hospital.user}
+        cookies = {None: ''}
+        for role, user in users.items():
+            client = Client()
+            client.force_login(user)
+            cookies[role] = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+        targets = {}
+        for endpoint, sync_name, async_name, role in ENDPOINTS:
+            args = [hospital_id] if role is None else []
+            paths = (reverse(f'accounts:{sync_name}', args=args), reverse(f'accounts:{async_name}', args=args))
+            targets[endpoint] = (paths, cookies[role])
+        return targets
+
+    def uvicorn_available(self):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def start(self, server, port):
+        manage = Path(settings.BASE_DIR) / 'manage.py'
+        if server == 'uvicorn':
+            command = [sys.executable, '-m', 'uvicorn', 'child_vaccination.asgi:application',
+                       '--port', str(port), '--log-level', 'warning', '--no-access-log', '--backlog', '1024']
+        else:
+            command = [sys.executable, str(manage), 'benchmark_asgi', '--skip-checks', '--serve',
+                       'wsgi' if server == 'wsgi' else 'asgi', '--port', str(port)]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR)
+        deadline = timer.monotonic() + 30
+        while timer.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return process
+            except OSError:
+                if process.poll() is not None:
+                    break
+                timer.sleep(0.1)
+        process.kill()
+        raise CommandError(f"{server} server did not start on port {port}.")
+
+    def serve(self, kind, port):
+        if kind == 'wsgi':
+            from wsgiref.simple_server import make_server
+            from child_vaccination.wsgi import application
+            make_server('127.0.0.1', port, application, server_class=BacklogWSGIServer,
+                        handler_class=QuietHandler).serve_forever()
+        else:
+            from child_vaccination.asgi import application
+            asyncio.run(ASGIServer(application).serve(port))
+
+    async def run(self, port, path, cookie, options):
+        await asyncio.gather(*(fetch(port, path, cookie) for _ in range(options['warmup'])))
+        latencies = []
+        errors = 0
+        deadline = timer.perf_counter() + options['duration']
+
+        async def worker():
+            nonlocal errors
+            while timer.perf_counter() < deadline:
+                started = timer.perf_counter()
+                status = await fetch(port, path, cookie)
+                latencies.append(timer.perf_counter() - started)
+                if not 200 <= status < 400:
+                    errors += 1
+
+        started = timer.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        elapsed = timer.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': len(latencies) / elapsed,
+            'p50_ms': (percentile(latencies, 50) or 0) * 1000,
+            'p95_ms': (percentile(latencies, 95) or 0) * 1000,
+            'p99_ms': (percentile(latencies, 99) or 0) * 1000,
+        }
@@ -0,0 +1,152 @@
+import gc
+import random
+import statistics
+import time as timer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from accounts import metrics
+from accounts.metrics import MetricsMiddleware, RequestMetrics, count_query
+from accounts.models import Appointment, Hospital, Inventory, Parent
+
+# (label, url name, who is signed in)
+ENDPOINTS = (
+    ('availability', 'get_available_vaccines_api', None),
+    ('parent dashboard', 'parent_dashboard', 'parent'),
+    ('hospital board', 'hospital_appointments', 'hospital'),
+)
+METRICS_MIDDLEWARE = 'accounts.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what MetricsMiddleware adds to a request. Two clients, one with and one "
+        "without the middleware, take turns request by request in ABBA order so drift "
+        "cancels out; the overhead is the median of the per-round ratios, with a bootstrap "
+        "95% confidence interval that shows whether the run can resolve a few percent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=40, help="ABBA rounds per endpoint.")
+        parser.add_argument('--requests', type=int, default=100, help="Timed requests per configuration per round.")
+        parser.add_argument('--warmup', type=int, default=50, help="Untimed requests per configuration.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if METRICS_MIDDLEWARE not in settings.MIDDLEWARE:
+            raise CommandError("MetricsMiddleware is not installed; there is nothing to compare.")
+        self.rng = random.Random(options['seed'])
+        # A client loads its middleware on its first request and keeps it, so both can run
+        # side by side. Templates stay instrumented in both; without a current request the
+        # wrapper only reads a ContextVar.
+        configurations = {
+            'on': {'MIDDLEWARE': settings.MIDDLEWARE},
+            'off': {'MIDDLEWARE': [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]},
+        }
+
+        self.stdout.write(f"{options['rounds']} rounds x {options['requests']} requests per configuration")
+        self.stdout.write(f"{'endpoint':<18} {'off ms':>8} {'on ms':>8} {'overhead':>9} {'95% CI':>17}")
+        for label, path, user in self.targets():
+            clients = {}
+            for name, overrides in configurations.items():
+                with override_settings(**overrides):
+                    # 'localhost' passes ALLOWED_HOSTS' development default
+                    clients[name] = Client(SERVER_NAME='localhost')
+                    if user is not None:
+                        clients[name].force_login(user)
+                    status = clients[name].get(path).status_code
+                    if status != 200:
+                        raise CommandError(f"{path} answered {status} with metrics {name}.")
+                    for _ in range(options['warmup']):
+                        clients[name].get(path)
+
+            ratios, times = [], {'on': [], 'off': []}
+            for _ in range(options['rounds']):
+                # ABBA: each configuration runs first and last equally often
+                order = ('on', 'off') if self.rng.random() < 0.5 else ('off', 'on')
+                spent = self.time_round(clients, path, order + order[::-1], options['requests'])
+                for name in spent:
+                    times[name].append(spent[name] / options['requests'])
+                ratios.append(spent['on'] / spent['off'])
+
+            off, on = statistics.median(times['off']), statistics.median(times['on'])
+            overhead = statistics.median(ratios) - 1
+            low, high = self.bootstrap(ratios)
+            self.stdout.write(
+                f"{label:<18} {off * 1000:>8.3f} {on * 1000:>8.3f} {overhead:>+9.2%} "
+                f"[{low - 1:+.2%}, {high - 1:+.2%}]"
+            )
+
+        per_request, per_query = self.component_costs()
+        self.stdout.write(
+            f"Middleware around a stub view: {per_request * 1e6:.2f} us per request, "
+            f"plus {per_query * 1e6:.2f} us per SQL query."
+        )
+
+    def targets(self):
+        parent_id = Appointment.objects.values_list('parent_id', flat=True).first()
+        hospital = Hospital.objects.filter(approved=True, user__isnull=False).select_related('user').first()
+        hospital_id = Inventory.objects.filter(stock_quantity__gt=0).values_list('hospital_id', flat=True).first()
+        if parent_id is None or hospital is None or hospital_id is None:
+            raise CommandError("Need appointments, an approved hospital and stocked inventory; run generate_data first.")
+        users = {'parent': Parent.objects.select_related('user').get(id=parent_id).user, 'hospital': hospital.user}
+        return [
+            (label, reverse(f'accounts:{name}', args=[hospital_id] if role is None else []), users.get(role))
+            for label, name, role in ENDPOINTS
+        ]
+
+    def time_round(self, clients, path, sequence, count):
+        """Seconds spent per configuration, with requests interleaved in ``sequence`` order."""
+        spent = dict.fromkeys(clients, 0.0)
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(count // 2 or 1):
+                for name in sequence:
+                    started = timer.perf_counter()
+                    clients[name].get(path)
+                    spent[name] += timer.perf_counter() - started
+            return spent
+        finally:
+            gc.enable()
+
+    def component_costs(self, count=100_000):
+        """Time the middleware around a stub view, and the SQL counter around a stub execute."""
+        response = HttpResponse()
+        middleware = MetricsMiddleware(lambda request: response)
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve(reverse('accounts:home'))
+
+        started = timer.perf_counter()
+        for _ in range(count):
+            middleware(request)
+        per_request = (timer.perf_counter() - started) / count
+
+        def execute(sql, params, many, context):
+            return None
+
+        token = metrics._current.set(RequestMetrics())
+        try:
+            started = timer.perf_counter()
+            for _ in range(count):
+                count_query(execute, '', (), False, {})
+            wrapped = timer.perf_counter() - started
+        finally:
+            metrics._current.reset(token)
+        started = timer.perf_counter()
+        for _ in range(count):
+            execute('', (), False, {})
+        per_query = (wrapped - (timer.perf_counter() - started)) / count
+        return per_request, per_query
+
+    def bootstrap(self, ratios, samples=2000):
+        """95% confidence interval of the median ratio."""
+        medians = sorted(
+            statistics.median(self.rng.choices(ratios, k=len(ratios))) for _ in range(samples)
+        )
+        return medians[int(samples * 0.025)], medians[int(samples * 0.975) - 1]
@@ -0,0 +1,122 @@
+import random
+import time as timer
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from accounts.models import Appointment, AppointmentSlot, Child, Hospital, HospitalSchedule, Parent
+from accounts.slots import next_free_slots
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark next-free-slot search against a naive Appointment scan. "
+        "Synthetic data is created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=1_000_000)
+        parser.add_argument('--hospitals', type=int, default=20)
+        parser.add_argument('--fill', type=float, default=0.9, help="Share of slots that are fully booked.")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            hospitals = self.seed(options)
+            self.measure(hospitals, options)
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        started = timer.perf_counter()
+        user = User.objects.create(username='slot-benchmark-parent')
+        parent = Parent.objects.create(user=user)
+        [child] = Child.objects.bulk_create([
+            Child(parent=parent, name='Benchmark', date_of_birth=date(2024, 1, 1), gender='Other')
+        ])
+
+        hospitals = Hospital.objects.bulk_create([
+            Hospital(name=f'Benchmark Hospital {i}', address='-', phone=f'bench-{i}',
+                     email=f'bench-{i}@example.com', approved=True)
+            for i in range(options['hospitals'])
+        ])
+        HospitalSchedule.objects.bulk_create([
+            HospitalSchedule(hospital=hospital, open_weekdays='0123456') for hospital in hospitals
+        ])
+        schedule = HospitalSchedule(open_weekdays='0123456')
+        capacity = schedule.doses_per_slot
+        slot_times = schedule.slot_times()
+
+        per_hospital = options['appointments'] // len(hospitals)
+        today = date.today()
+        batch_size = options['batch_size']
+        appointments, slots = [], []
+        total = 0
+        for hospital in hospitals:
+            remaining = per_hospital
+            day = today
+            while remaining > 0:
+                for moment in slot_times:
+                    if remaining <= 0:
+                        break
+                    booked = capacity if random.random() < options['fill'] else random.randrange(capacity)
+                    booked = min(booked, remaining)
+                    if not booked:
+                        continue
+                    remaining -= booked
+                    slots.append(AppointmentSlot(
+                        hospital=hospital, date=day, time=moment, capacity=capacity, booked=booked
+                    ))
+                    appointments.extend(
+                        Appointment(parent=parent, child=child, hospital=hospital, date=day,
+                                    time=moment, status='Approved')
+                        for _ in range(booked)
+                    )
+                    if len(appointments) >= batch_size:
+                        total += self.flush(appointments, slots, batch_size)
+                day += timedelta(days=1)
+        total += self.flush(appointments, slots, batch_size)
+
+        elapsed = timer.perf_counter() - started
+        self.stdout.write(f"Seeded {total:,} appointments in {elapsed:.1f}s")
+        return hospitals
+
+    def flush(self, appointments, slots, batch_size):
+        count = len(appointments)
+        Appointment.objects.bulk_create(appointments, batch_size=batch_size)
+        AppointmentSlot.objects.bulk_create(slots, batch_size=batch_size)
+        appointments.clear()
+        slots.clear()
+        return count
+
+    def measure(self, hospitals, options):
+        today = date.today()
+        capacity = HospitalSchedule().doses_per_slot
+        queries = options['queries']
+        picks = [random.choice(hospitals) for _ in range(queries)]
+
+        started = timer.perf_counter()
+        for hospital in picks:
+            next_free_slots(hospital.id, today, count=5, horizon_days=365)
+        indexed = (timer.perf_counter() - started) / queries
+
+        scan_queries = max(1, queries // 20)
+        started = timer.perf_counter()
+        for hospital in picks[:scan_queries]:
+            booked = {
+                (row['date'], row['time']): row['n']
+                for row in Appointment.objects.filter(
+                    hospital=hospital, date__gte=today, status__in=Appointment.ACTIVE_STATUSES
+                ).values('date', 'time').annotate(n=Count('id')).order_by()
+            }
+            [key for key, n in booked.items() if n < capacity][:5]
+        scan = (timer.perf_counter() - started) / scan_queries
+
+        self.stdout.write(f"next_free_slots (slot index): {indexed * 1000:8.2f} ms/query over {queries} queries")
+        self.stdout.write(f"naive Appointment scan:       {scan * 1000:8.2f} ms/query over {scan_queries} queries")
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {scan / indexed:.1f}x"))
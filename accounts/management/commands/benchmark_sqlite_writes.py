@@ -0,0 +1,176 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time as timer
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from child_vaccination.sqlite_profile import pragmas
+
+SCHEMA = """
+CREATE TABLE slot (id INTEGER PRIMARY KEY, hospital INTEGER, day INTEGER, moment INTEGER,
+                   capacity INTEGER, booked INTEGER, UNIQUE (hospital, day, moment));
+CREATE TABLE appointment (id INTEGER PRIMARY KEY, hospital INTEGER, child INTEGER, day INTEGER,
+                          moment INTEGER, status TEXT, notes TEXT);
+CREATE INDEX appointment_hospital ON appointment (hospital, day);
+CREATE TABLE counter (hospital INTEGER PRIMARY KEY, pending INTEGER);
+"""
+
+
+class Profile:
+    """How a worker connects and opens transactions."""
+
+    def __init__(self, name, pragma_values, begin, persistent):
+        self.name = name
+        self.pragma_values = pragma_values
+        self.begin = begin
+        self.persistent = persistent
+
+    def connect(self, path):
+        # Python's sqlite3 default (and Django's) is a 5 second busy timeout
+        db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for name, value in self.pragma_values.items():
+            db.execute(f"PRAGMA {name}={value}")
+        return db
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare booking-shaped write throughput under SQLite's defaults and the "
+        "DB_PROFILE=production settings. Each profile gets a fresh database in a "
+        "temporary directory and the same concurrent writers and readers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0, help="Run time per profile.")
+        parser.add_argument('--hospitals', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=3)
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Django defaults: rollback journal, synchronous=FULL, deferred BEGIN, a connection per request
+            Profile('default', {}, 'BEGIN', persistent=False),
+            Profile('production', pragmas(), 'BEGIN IMMEDIATE', persistent=True),
+        ]
+        results = {}
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                results[profile.name] = self.run_profile(profile, Path(directory) / 'bench.sqlite3', options)
+            self.report(profile.name, results[profile.name])
+
+        default, production = results['default'], results['production']
+        if default['tps']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Write throughput: {production['tps'] / default['tps']:.1f}x, "
+                f"locked errors {default['failed']} -> {production['failed']}"
+            ))
+
+    def run_profile(self, profile, path, options):
+        setup = profile.connect(str(path))
+        setup.executescript(SCHEMA)
+        setup.executemany(
+            "INSERT INTO counter (hospital, pending) VALUES (?, 0)", [(h,) for h in range(options['hospitals'])]
+        )
+        setup.close()
+
+        stats = {'latencies': [], 'failed': 0, 'reads': 0}
+        lock = threading.Lock()
+        deadline = timer.perf_counter() + options['seconds']
+        threads = [
+            threading.Thread(target=self.writer, args=(profile, path, options, i, deadline, stats, lock))
+            for i in range(options['writers'])
+        ] + [
+            threading.Thread(target=self.reader, args=(profile, path, options, i, deadline, stats, lock))
+            for i in range(options['readers'])
+        ]
+        started = timer.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = timer.perf_counter() - started
+
+        latencies = sorted(stats['latencies'])
+        return {
+            'committed': len(latencies),
+            'failed': stats['failed'],
+            'tps': len(latencies) / elapsed,
+            'reads_per_s': stats['reads'] / elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        }
+
+    def writer(self, profile, path, options, number, deadline, stats, lock):
+        """Book appointments: read the slot, take a dose, insert, bump the counter."""
+        rng = random.Random(options['seed'] * 1000 + number)
+        db = profile.connect(str(path)) if profile.persistent else None
+        while timer.perf_counter() < deadline:
+            hospital, day, moment = rng.randrange(options['hospitals']), rng.randrange(30), rng.randrange(32)
+            started = timer.perf_counter()
+            connection = db or profile.connect(str(path))
+            try:
+                connection.execute(profile.begin)
+                row = connection.execute(
+                    "SELECT id, booked, capacity FROM slot WHERE hospital=? AND day=? AND moment=?",
+                    (hospital, day, moment),
+                ).fetchone()
+                if row is None:
+                    connection.execute(
+                        "INSERT INTO slot (hospital, day, moment, capacity, booked) VALUES (?, ?, ?, 1000000, 1)",
+                        (hospital, day, moment),
+                    )
+                else:
+                    connection.execute("UPDATE slot SET booked = booked + 1 WHERE id = ?", (row[0],))
+                connection.execute(
+                    "INSERT INTO appointment (hospital, child, day, moment, status, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                    (hospital, rng.randrange(10 ** 6), day, moment, 'Pending', 'benchmark'),
+                )
+                connection.execute("UPDATE counter SET pending = pending + 1 WHERE hospital = ?", (hospital,))
+                connection.execute("COMMIT")
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                with lock:
+                    stats['failed'] += 1
+            else:
+                with lock:
+                    stats['latencies'].append(timer.perf_counter() - started)
+            finally:
+                if db is None:
+                    connection.close()
+        if db is not None:
+            db.close()
+
+    def reader(self, profile, path, options, number, deadline, stats, lock):
+        """Hospital-board style reads running alongside the writers."""
+        rng = random.Random(options['seed'] * 2000 + number)
+        db = profile.connect(str(path)) if profile.persistent else None
+        reads = 0
+        while timer.perf_counter() < deadline:
+            connection = db or profile.connect(str(path))
+            try:
+                connection.execute(
+                    "SELECT status, COUNT(*) FROM appointment WHERE hospital = ? GROUP BY status",
+                    (rng.randrange(options['hospitals']),),
+                ).fetchall()
+                reads += 1
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                if db is None:
+                    connection.close()
+        if db is not None:
+            db.close()
+        with lock:
+            stats['reads'] += reads
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<11} {result['committed']:>7} commits {result['failed']:>5} locked "
+            f"{result['tps']:>9.1f} tx/s  p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+            f"{result['reads_per_s']:>9.1f} reads/s"
+        )
@@ -0,0 +1,258 @@
+import random
+import time as timer
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.catalog import invalidate_catalog
+from accounts.models import (
+    Appointment, AppointmentSlot, Child, Hospital, HospitalAppointmentCounter, HospitalSchedule,
+    Inventory, Parent, StockMovement, Vaccine,
+)
+from accounts.vaccination_schedule import rebuild_due_dates
+
+# A national-style childhood schedule: (name, recommended age, relative demand)
+VACCINE_CATALOG = [
+    ('BCG', 'at birth', 4),
+    ('OPV', 'birth, 6 weeks, 10 weeks, 14 weeks', 10),
+    ('Hepatitis B', 'birth, 6 weeks, 10 weeks, 14 weeks', 9),
+    ('Pentavalent', '6 weeks, 10 weeks, 14 weeks', 8),
+    ('Rotavirus', '6 weeks, 10 weeks, 14 weeks', 7),
+    ('PCV', '6 weeks, 14 weeks, 9 months', 6),
+    ('IPV', '6 weeks, 14 weeks', 5),
+    ('Measles-Rubella', '9-12 months, 16-24 months', 6),
+    ('Japanese Encephalitis', '9-12 months, 16-24 months', 3),
+    ('Vitamin A', '9 months', 4),
+    ('Typhoid Conjugate', '9-12 months', 3),
+    ('Hepatitis A', '12 months', 2),
+    ('Varicella', '15 months', 2),
+    ('DPT Booster', '16-24 months, 5-6 years', 4),
+    ('Td', '10 years', 2),
+]
+CHILDREN_PER_PARENT = ([1, 2, 3, 4], [50, 35, 12, 3])
+PAST_STATUSES = (['Completed', 'Cancelled', 'Approved', 'Pending'], [80, 12, 5, 3])
+FUTURE_STATUSES = (['Pending', 'Approved', 'Cancelled'], [55, 40, 5])
+MAX_CHILD_AGE_DAYS = 6 * 365
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic parents, children, hospitals, vaccines, "
+        "inventory and appointments. Rows go in with bulk_create in batched "
+        "transactions; derived tables (slots, counters, due dates) are rebuilt in "
+        "bulk at the end. Every user's password is --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parents', type=int, default=50_000)
+        parser.add_argument('--hospitals', type=int, default=250)
+        parser.add_argument('--appointments', type=int, default=1_000_000)
+        parser.add_argument('--history-days', type=int, default=365, help="How far back appointments go.")
+        parser.add_argument('--future-days', type=int, default=60, help="How far ahead appointments go.")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='load', help="Prefix for generated usernames, phones and emails.")
+        parser.add_argument('--password', default='loadtest123')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Do not rebuild slots, counters and due dates afterwards.")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if len(prefix) > 8:
+            raise CommandError("--prefix must be at most 8 characters.")
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Users with prefix '{prefix}-' already exist; choose another --prefix.")
+        if options['parents'] < 1 or options['hospitals'] < 1:
+            raise CommandError("--parents and --hospitals must be at least 1.")
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.password = make_password(options['password'])
+        self.today = timezone.localdate()
+        self.total_rows = 0
+        started = timer.perf_counter()
+
+        vaccines = self.timed('vaccines', self.create_vaccines)
+        hospitals = self.timed('hospitals', self.create_hospitals)
+        # bulk_create sends no signals, so tell every process the catalogs changed
+        invalidate_catalog()
+        self.timed('inventory', self.create_inventory, hospitals, vaccines)
+        children = self.timed('parents and children', self.create_families)
+        slot_counts = self.timed('appointments', self.create_appointments, hospitals, vaccines, children)
+        if not options['skip_derived']:
+            self.timed('derived tables', self.rebuild_derived, vaccines, hospitals, slot_counts)
+
+        elapsed = timer.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {self.total_rows:,} rows in {elapsed:.1f}s ({self.total_rows / elapsed:,.0f} rows/s)."
+        ))
+
+    def timed(self, label, step, *args):
+        """Run one generation step and report its rows per second."""
+        before = self.total_rows
+        started = timer.perf_counter()
+        result = step(*args)
+        elapsed = max(timer.perf_counter() - started, 1e-9)
+        rows = self.total_rows - before
+        self.stdout.write(f"{label:<22} {rows:>12,} rows {elapsed:8.1f}s {rows / elapsed:>12,.0f} rows/s")
+        return result
+
+    def insert(self, model, objects):
+        """Bulk insert in one transaction; save(), full_clean() and signals are skipped."""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.total_rows += len(created)
+        return created
+
+    def create_users(self, kind, start, count):
+        prefix = self.options['prefix']
+        return self.insert(User, [
+            User(username=f'{prefix}-{kind}-{i}', email=f'{prefix}-{kind}-{i}@example.com',
+                 password=self.password, is_active=True)
+            for i in range(start, start + count)
+        ])
+
+    def create_vaccines(self):
+        """Reuse catalog vaccines that already exist; return ``(vaccines, demand weights)``."""
+        existing = {vaccine.name: vaccine for vaccine in Vaccine.objects.filter(
+            name__in=[name for name, _, _ in VACCINE_CATALOG]
+        )}
+        self.insert(Vaccine, [
+            Vaccine(name=name, recommended_age=age)
+            for name, age, _ in VACCINE_CATALOG if name not in existing
+        ])
+        by_name = {vaccine.name: vaccine for vaccine in Vaccine.objects.filter(
+            name__in=[name for name, _, _ in VACCINE_CATALOG]
+        )}
+        return [by_name[name] for name, _, _ in VACCINE_CATALOG], [weight for _, _, weight in VACCINE_CATALOG]
+
+    def create_hospitals(self):
+        """Create hospitals with Zipf-like popularity; return ``(approved hospitals, cumulative weights)``."""
+        prefix = self.options['prefix']
+        count = self.options['hospitals']
+        users = self.create_users('hospital', 0, count)
+        hospitals = self.insert(Hospital, [
+            Hospital(user=user, name=f'{prefix.title()} Hospital {i}', address=f'{i} Health Street',
+                     phone=f'{prefix}-{i}', email=user.email, approved=self.rng.random() < 0.95)
+            for i, user in enumerate(users)
+        ])
+        # Generated hospitals keep the default hours explicitly, so their slots are enforced
+        self.insert(HospitalSchedule, [HospitalSchedule(hospital=hospital) for hospital in hospitals])
+        approved = [hospital for hospital in hospitals if hospital.approved] or hospitals[:1]
+        self.rng.shuffle(approved)
+        weights, total = [], 0.0
+        for rank in range(len(approved)):
+            total += 1 / (rank + 1) ** 0.8
+            weights.append(total)
+        return approved, weights
+
+    def create_inventory(self, hospitals, vaccines):
+        rows = [
+            Inventory(hospital=hospital, vaccine=vaccine, stock_quantity=int(self.rng.expovariate(1 / 60)))
+            for hospital in hospitals[0]
+            for vaccine in vaccines[0]
+            if self.rng.random() < 0.8
+        ]
+        inventory = self.insert(Inventory, rows)
+        # Opening balances, so the ledger sums to the stock on hand
+        self.insert(StockMovement, [
+            StockMovement(inventory=item, kind=StockMovement.RESTOCK, quantity=item.stock_quantity,
+                          note='Generated opening balance')
+            for item in inventory if item.stock_quantity
+        ])
+
+    def create_families(self):
+        """Create parents and their children; return ``(child_id, parent_id, birth date)`` tuples."""
+        children = []
+        count = self.options['parents']
+        sizes, size_weights = CHILDREN_PER_PARENT
+        for start in range(0, count, self.batch_size):
+            users = self.create_users('parent', start, min(self.batch_size, count - start))
+            parents = self.insert(Parent, [
+                Parent(user=user, phone_number=f'9{self.rng.randrange(10 ** 9):09d}',
+                       address=f'{self.rng.randrange(1, 999)} Park Road')
+                for user in users
+            ])
+            batch = []
+            for parent in parents:
+                for n in range(self.rng.choices(sizes, size_weights)[0]):
+                    born = self.today - timedelta(days=self.rng.randrange(MAX_CHILD_AGE_DAYS))
+                    batch.append(Child(
+                        parent=parent, name=f'Child {parent.id}-{n + 1}', date_of_birth=born,
+                        gender=self.rng.choice(['Male', 'Female']),
+                        blood_group=self.rng.choice(['', 'A+', 'B+', 'O+', 'AB+', 'O-']),
+                    ))
+            children.extend(
+                (child.id, child.parent_id, child.date_of_birth) for child in self.insert(Child, batch)
+            )
+        return children
+
+    def create_appointments(self, hospitals, vaccines, children):
+        """Create appointments that respect opening days and slot capacity.
+
+        Returns the booked count of every future active slot, keyed by
+        ``(hospital_id, date, time)``.
+        """
+        hospital_list, hospital_weights = hospitals
+        vaccine_list, vaccine_weights = vaccines[0], list(accumulate(vaccines[1]))
+        schedule = HospitalSchedule()
+        slot_times = schedule.slot_times()
+        capacity = schedule.doses_per_slot
+        history, future = self.options['history_days'], self.options['future_days']
+        now = timezone.now()
+        slot_counts = Counter()
+
+        batch = []
+        for _ in range(self.options['appointments']):
+            child_id, parent_id, born = self.rng.choice(children)
+            hospital = self.rng.choices(hospital_list, cum_weights=hospital_weights)[0]
+            day = max(born, self.today + timedelta(days=self.rng.randint(-history, future)))
+            while not schedule.is_open_on(day):
+                day += timedelta(days=1)
+            moment = self.rng.choice(slot_times)
+
+            if day >= self.today:
+                status = self.rng.choices(*FUTURE_STATUSES)[0]
+                if status in Appointment.ACTIVE_STATUSES:
+                    for _ in range(3):
+                        if slot_counts[hospital.id, day, moment] < capacity:
+                            break
+                        moment = self.rng.choice(slot_times)
+                    if slot_counts[hospital.id, day, moment] < capacity:
+                        slot_counts[hospital.id, day, moment] += 1
+                    else:
+                        status = 'Cancelled'
+            else:
+                status = self.rng.choices(*PAST_STATUSES)[0]
+
+            batch.append(Appointment(
+                parent_id=parent_id, child_id=child_id, hospital_id=hospital.id,
+                vaccine_id=self.rng.choices(vaccine_list, cum_weights=vaccine_weights)[0].id,
+                date=day, time=moment, status=status,
+                created_at=now - timedelta(days=max(0, (self.today - day).days) + self.rng.randint(1, 30)),
+            ))
+            if len(batch) >= self.batch_size:
+                self.insert(Appointment, batch)
+                batch = []
+        if batch:
+            self.insert(Appointment, batch)
+        return slot_counts
+
+    def rebuild_derived(self, vaccines, hospitals, slot_counts):
+        """Bring slot, counter and due-date tables in line with the generated rows."""
+        capacity = HospitalSchedule().doses_per_slot
+        self.insert(AppointmentSlot, [
+            AppointmentSlot(hospital_id=hospital_id, date=day, time=moment, capacity=capacity, booked=booked)
+            for (hospital_id, day, moment), booked in slot_counts.items()
+        ])
+        HospitalAppointmentCounter.rebuild([hospital.id for hospital in hospitals[0]])
+        for vaccine in vaccines[0]:
+            vaccine.sync_doses(rebuild=False)
+        self.total_rows += rebuild_due_dates()
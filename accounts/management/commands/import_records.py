@@ -0,0 +1,50 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importer import BATCH_SIZE, import_records, write_error_report
+from accounts.models import Hospital
+
+
+class Command(BaseCommand):
+    help = (
+        "Import children and their past vaccinations from a CSV file as history at one "
+        "hospital, onto parents who already have an appointment there. Rows are validated "
+        "and inserted in batches; bad rows are reported by line number and skipped, "
+        "never aborting the rest of the file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import, or - for standard input.")
+        parser.add_argument('--hospital', type=int, required=True, help="Id of the hospital the records belong to.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--errors', help="Write the per-row error report to this CSV file.")
+
+    def handle(self, *args, **options):
+        if not Hospital.objects.filter(id=options['hospital']).exists():
+            raise CommandError(f"Hospital {options['hospital']} does not exist.")
+
+        started = time.perf_counter()
+        if options['path'] == '-':
+            result = import_records(sys.stdin, options['hospital'], options['batch_size'])
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                    result = import_records(stream, options['hospital'], options['batch_size'])
+            except OSError as error:
+                raise CommandError(f"Cannot read {options['path']}: {error}")
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {result.rows} rows in {elapsed:.1f}s: {result.children_created} children and "
+            f"{result.appointments_created} vaccinations added, {result.duplicates} duplicates skipped, "
+            f"{result.rejected} rows rejected."
+        ))
+        if result.errors:
+            if options['errors']:
+                with open(options['errors'], 'w', newline='', encoding='utf-8') as stream:
+                    write_error_report(result.errors, stream)
+                self.stdout.write(f"Wrote {len(result.errors)} errors to {options['errors']}.")
+            else:
+                write_error_report(result.errors, self.stdout)
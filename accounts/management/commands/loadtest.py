@@ -0,0 +1,311 @@
+import json
+import random
+import subprocess
+import threading
+import time as timer
+from collections import defaultdict
+from datetime import datetime
+from http.cookiejar import CookieJar
+from socketserver import ThreadingMixIn
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.urls import Resolver404, resolve, reverse
+
+from accounts.models import Appointment, Child, Hospital, Parent
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Report redirects instead of following them, so every request is timed on its own."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Thread-safe latency samples per URL name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, seconds, ok):
+        with self.lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+class Session:
+    """One simulated user with its own cookie jar."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def request(self, path, data=None):
+        """Send one request and record its latency; returns ``(status, body)``."""
+        try:
+            name = resolve(urlsplit(path).path).url_name
+        except Resolver404:
+            name = path
+        url = self.base_url + path
+        headers = {}
+        body = None
+        if data is not None:
+            data = {'csrfmiddlewaretoken': self.csrf_token(), **data}
+            body = urlencode(data).encode()
+            headers = {'Content-Type': 'application/x-www-form-urlencoded', 'Referer': url}
+
+        started = timer.perf_counter()
+        try:
+            with self.opener.open(Request(url, data=body, headers=headers), timeout=30) as response:
+                status, content = response.status, response.read()
+        except HTTPError as error:
+            status, content = error.code, error.read()
+        except (URLError, OSError):
+            status, content = 0, b''
+        self.recorder.add(name, timer.perf_counter() - started, 0 < status < 400)
+        return status, content
+
+    def login(self, url_name, username, password):
+        path = reverse(url_name)
+        self.request(path)
+        status, _ = self.request(path, {'username': username, 'password': password})
+        return status == 302
+
+
+class ParentSession(Session):
+    """Dashboard, availability lookups, booking and the occasional cancellation."""
+
+    def __str__(self):
+        return f"parent {self.parent.user.username}"
+
+    def __init__(self, base_url, recorder, parent, hospital_ids, rng, cancel_rate):
+        super().__init__(base_url, recorder)
+        self.parent = parent
+        self.child_ids = list(Child.objects.filter(parent=parent).values_list('id', flat=True))
+        self.hospital_ids = hospital_ids
+        self.rng = rng
+        self.cancel_rate = cancel_rate
+
+    def iteration(self):
+        self.request(reverse('accounts:parent_dashboard'))
+        self.request(reverse('accounts:book_appointment'))
+        hospital_id = self.rng.choice(self.hospital_ids)
+        _, body = self.request(reverse('accounts:get_available_vaccines_api', args=[hospital_id]))
+        vaccines = json.loads(body or b'{}').get('vaccines', [])
+        _, body = self.request(reverse('accounts:next_free_slots_api', args=[hospital_id]))
+        slots = json.loads(body or b'{}').get('slots', [])
+
+        if vaccines and slots and self.child_ids:
+            slot = self.rng.choice(slots)
+            status, _ = self.request(reverse('accounts:book_appointment'), {
+                'child': self.rng.choice(self.child_ids), 'hospital': hospital_id,
+                'vaccine': self.rng.choice(vaccines)['id'], 'date': slot['date'], 'time': slot['time'],
+                'notes': 'load test',
+            })
+            if status == 302 and self.rng.random() < self.cancel_rate:
+                appointment_id = Appointment.objects.filter(
+                    parent=self.parent, hospital_id=hospital_id, date=slot['date'], time=slot['time'],
+                    status='Pending',
+                ).values_list('id', flat=True).first()
+                if appointment_id:
+                    self.request(reverse('accounts:cancel_appointment', args=[appointment_id]), {})
+        self.request(reverse('accounts:view_appointments'))
+
+
+class HospitalSession(Session):
+    """Board, approvals and the inventory page."""
+
+    def __str__(self):
+        return f"hospital {self.hospital.user.username}"
+
+    def __init__(self, base_url, recorder, hospital, rng):
+        super().__init__(base_url, recorder)
+        self.hospital = hospital
+        self.rng = rng
+
+    def iteration(self):
+        self.request(reverse('accounts:hospital_dashboard'))
+        self.request(reverse('accounts:hospital_appointments'))
+        pending = list(
+            Appointment.objects.filter(hospital=self.hospital, status='Pending')
+            .order_by('date', 'time', 'id').values_list('id', flat=True)[:20]
+        )
+        if pending:
+            self.request(
+                reverse('accounts:hospital_confirm_appointment', args=[self.rng.choice(pending)]), {}
+            )
+        self.request(reverse('accounts:hospital_inventory'))
+
+
+def percentile(ordered, share):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * share // 100))
+    return ordered[int(rank) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the WSGI application with concurrent simulated parents and hospitals and "
+        "report throughput and p50/p95/p99 latency per URL name. By default the app is "
+        "served in-process on 127.0.0.1; seed the database with generate_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parents', type=int, default=8, help="Concurrent simulated parents.")
+        parser.add_argument('--hospitals', type=int, default=2, help="Concurrent simulated hospital staff.")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run.")
+        parser.add_argument('--prefix', default='load', help="Username prefix used by generate_data.")
+        parser.add_argument('--password', default='loadtest123')
+        parser.add_argument('--cancel-rate', type=float, default=0.3, help="Share of bookings cancelled again.")
+        parser.add_argument('--url', default=None,
+                            help="Base URL of an already running server instead of the in-process one.")
+        parser.add_argument('--output', default=None,
+                            help="Where to save the JSON results (default: loadtest-<timestamp>.json).")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        parents = list(
+            Child.objects.filter(parent__user__username__startswith=f'{prefix}-parent-')
+            .values_list('parent', flat=True).distinct()[:options['parents'] * 20]
+        )
+        hospitals = list(
+            Hospital.objects.filter(user__username__startswith=f'{prefix}-hospital-', approved=True)
+            .select_related('user')
+        )
+        if len(parents) < options['parents'] or not hospitals:
+            raise CommandError(
+                f"Not enough '{prefix}-' parents with children or approved hospitals; run generate_data first."
+            )
+        parents = rng.sample(parents, options['parents'])
+        hospital_ids = [hospital.id for hospital in hospitals]
+
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            from child_vaccination.wsgi import application
+            server = make_server('127.0.0.1', 0, application, server_class=ThreadingWSGIServer,
+                                 handler_class=QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+        base_url = base_url.rstrip('/')
+
+        recorder = Recorder()
+        sessions = [
+            ParentSession(base_url, recorder, parent, hospital_ids, random.Random(rng.random()), options['cancel_rate'])
+            for parent in Parent.objects.filter(id__in=parents).select_related('user')
+        ] + [
+            HospitalSession(base_url, recorder, hospital, random.Random(rng.random()))
+            for hospital in rng.sample(hospitals, min(options['hospitals'], len(hospitals)))
+        ]
+        connection.close()
+
+        self.stdout.write(f"Running {len(sessions)} simulated users against {base_url} for {options['duration']:.0f}s...")
+        deadline = timer.perf_counter() + options['duration']
+        started = timer.perf_counter()
+        threads = [
+            threading.Thread(target=self.run_session, args=(session, options['password'], deadline))
+            for session in sessions
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = timer.perf_counter() - started
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+        results = self.summarize(recorder, elapsed, options)
+        self.report(results)
+        output = options['output'] or f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+    def run_session(self, session, password, deadline):
+        try:
+            if isinstance(session, ParentSession):
+                logged_in = session.login('accounts:parent_login', session.parent.user.username, password)
+            else:
+                logged_in = session.login('accounts:hospital_login', session.hospital.user.username, password)
+            if not logged_in:
+                self.stderr.write(f"Login failed for {session}; this user sends no further requests.")
+            while logged_in and timer.perf_counter() < deadline:
+                session.iteration()
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def summarize(self, recorder, elapsed, options):
+        urls = {}
+        for name, samples in sorted(recorder.samples.items()):
+            ordered = sorted(samples)
+            urls[name] = {
+                'requests': len(ordered),
+                'errors': recorder.errors[name],
+                'throughput_rps': round(len(ordered) / elapsed, 2),
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+                'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+                'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+                'max_ms': round(ordered[-1] * 1000, 2),
+            }
+        total = sum(url['requests'] for url in urls.values())
+        return {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': self.git_commit(),
+            'options': {key: options[key] for key in ('parents', 'hospitals', 'duration', 'cancel_rate', 'seed')},
+            'elapsed_s': round(elapsed, 2),
+            'total': {
+                'requests': total,
+                'errors': sum(url['errors'] for url in urls.values()),
+                'throughput_rps': round(total / elapsed, 2),
+            },
+            'urls': urls,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, results):
+        self.stdout.write(f"{'url name':<30} {'reqs':>7} {'errs':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name, url in results['urls'].items():
+            self.stdout.write(
+                f"{name:<30} {url['requests']:>7} {url['errors']:>5} {url['throughput_rps']:>8.1f} "
+                f"{url['p50_ms']:>8.1f} {url['p95_ms']:>8.1f} {url['p99_ms']:>8.1f}"
+            )
+        total = results['total']
+        self.stdout.write(
+            f"Total: {total['requests']} requests, {total['errors']} errors, {total['throughput_rps']:.1f} req/s"
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import HospitalAppointmentCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-hospital appointment status counters from the Appointment table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hospital', type=int, action='append', dest='hospitals',
+            help="Only rebuild this hospital id (may be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        written = HospitalAppointmentCounter.rebuild(options['hospitals'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt appointment counters for {written} hospital(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.stock import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute Inventory stock balances from the StockMovement ledger."
+
+    def handle(self, *args, **options):
+        corrected = rebuild_balances()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {corrected} inventory balance(s)."))
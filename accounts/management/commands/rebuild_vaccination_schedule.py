@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Vaccine
+from accounts.vaccination_schedule import CHUNK_SIZE, rebuild_due_dates
+
+
+class Command(BaseCommand):
+    help = "Parse vaccine recommended ages and recompute every child's due vaccinations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--skip-parse', action='store_true',
+            help="Keep the existing dose series instead of re-parsing recommended_age.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_parse']:
+            unparsed = [vaccine.name for vaccine in Vaccine.objects.all() if not vaccine.sync_doses(rebuild=False)]
+            for name in unparsed:
+                self.stdout.write(self.style.WARNING(f"Could not parse the recommended age of '{name}'."))
+
+        started = time.perf_counter()
+        written = rebuild_due_dates(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} due vaccination rows in {elapsed:.2f}s."))
@@ -0,0 +1,130 @@
+import time as timer
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.template.loader import get_template
+from django.utils import timezone
+
+from accounts.models import Appointment, AppointmentReminder
+
+EMAIL_BACKENDS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'locmem': 'django.core.mail.backends.locmem.EmailBackend',
+}
+CHANNEL = 'email'
+
+
+class Command(BaseCommand):
+    help = (
+        "Email reminders for upcoming Pending/Approved appointments. Appointments "
+        "are streamed from the database and sent over one connection; each reminder "
+        "is claimed before it is sent, so a rerun after a failure never sends twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-ahead', type=int, default=1,
+                            help="Remind appointments from today up to this many days ahead.")
+        parser.add_argument('--backend', default=None,
+                            help="smtp, file, console, locmem or a dotted backend path. "
+                                 "Defaults to settings.EMAIL_BACKEND.")
+        parser.add_argument('--file-path', default=None, help="Output directory for the file backend.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per database round trip.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Reminders claimed per database round trip.")
+        parser.add_argument('--dry-run', action='store_true', help="Count reminders without sending them.")
+
+    def handle(self, *args, **options):
+        if options['days_ahead'] < 0:
+            raise CommandError("--days-ahead must not be negative.")
+        today = timezone.localdate()
+        appointments = self.due_appointments(today, today + timedelta(days=options['days_ahead']))
+
+        if options['dry_run']:
+            self.stdout.write(f"{appointments.count()} reminder(s) would be sent.")
+            return
+
+        backend = options['backend']
+        backend = EMAIL_BACKENDS.get(backend, backend)
+        backend_options = {'file_path': options['file_path']} if options['file_path'] else {}
+        self.template = get_template('accounts/emails/appointment_reminder.txt')
+
+        started = timer.perf_counter()
+        sent = 0
+        connection = get_connection(backend, fail_silently=False, **backend_options)
+        connection.open()
+        try:
+            batch = []
+            for appointment in appointments.iterator(chunk_size=options['chunk_size']):
+                batch.append(appointment)
+                if len(batch) >= options['batch_size']:
+                    sent += self.send_batch(connection, batch)
+                    batch = []
+            if batch:
+                sent += self.send_batch(connection, batch)
+        finally:
+            connection.close()
+
+        elapsed = timer.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminder(s) in {elapsed:.2f}s."))
+
+    def due_appointments(self, first_day, last_day):
+        already_sent = AppointmentReminder.objects.filter(
+            appointment=OuterRef('pk'), appointment_date=OuterRef('date'), channel=CHANNEL
+        )
+        return (
+            Appointment.objects.filter(
+                status__in=Appointment.ACTIVE_STATUSES, date__range=(first_day, last_day)
+            )
+            .exclude(parent__user__email='')
+            .exclude(Exists(already_sent))
+            .select_related('child', 'parent__user', 'hospital', 'vaccine')
+            .order_by('date', 'time', 'id')
+        )
+
+    def send_batch(self, connection, appointments):
+        """Claim a batch, then send it one message at a time over the open connection.
+
+        Claims are written before anything is sent, so neither a rerun nor a
+        concurrent run mails an appointment twice. If a send fails, the claims
+        of the messages not yet sent are released and the error is raised.
+        """
+        claimed_at = timezone.now()
+        AppointmentReminder.objects.bulk_create(
+            [
+                AppointmentReminder(
+                    appointment=appointment, appointment_date=appointment.date, channel=CHANNEL, sent_at=claimed_at
+                )
+                for appointment in appointments
+            ],
+            ignore_conflicts=True,
+        )
+        claimed = set(
+            AppointmentReminder.objects.filter(
+                appointment_id__in=[appointment.id for appointment in appointments],
+                channel=CHANNEL, sent_at=claimed_at,
+            ).values_list('appointment_id', flat=True)
+        )
+        pending = [appointment for appointment in appointments if appointment.id in claimed]
+
+        from_email = settings.DEFAULT_FROM_EMAIL
+        for index, appointment in enumerate(pending):
+            message = EmailMessage(
+                subject=f"Vaccination reminder: {appointment.child.name} on {appointment.date:%b %d}",
+                body=self.template.render({'appointment': appointment}),
+                from_email=from_email,
+                to=[appointment.parent.user.email],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception:
+                AppointmentReminder.objects.filter(
+                    appointment_id__in=[unsent.id for unsent in pending[index:]],
+                    channel=CHANNEL, sent_at=claimed_at,
+                ).delete()
+                raise
+        return len(pending)
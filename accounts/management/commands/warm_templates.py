@@ -0,0 +1,27 @@
+import time as timer
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.fragments import ANONYMOUS_HOME_KEY
+from accounts.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile every template and fail on syntax errors; run it as a deploy step. "
+        "Also drops cached full pages, which embed the previous release's static URLs. "
+        "Web processes warm their own template cache at startup (see wsgi.py/asgi.py)."
+    )
+
+    def handle(self, *args, **options):
+        started = timer.perf_counter()
+        compiled, errors = warm_templates()
+        elapsed = timer.perf_counter() - started
+        cache.delete(ANONYMOUS_HOME_KEY)
+
+        for name, error in errors.items():
+            self.stderr.write(f"{name}: {error}")
+        if errors:
+            raise CommandError(f"{len(errors)} template(s) failed to compile.")
+        self.stdout.write(self.style.SUCCESS(f"Compiled {compiled} templates in {elapsed * 1000:.0f} ms."))
@@ -0,0 +1,252 @@
+"""In-process request metrics exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times each request and counts its SQL queries and
+their time; ``InstrumentedDjangoTemplates`` adds template render time. The
+SQL counter is an ``execute_wrapper`` installed once on every new database
+connection, which only counts while a request's metrics are current, so a
+request pays nothing to install it. Each thread folds its requests into its
+own per-URL-name aggregates, under a lock that only ``/metrics`` contends
+for; the cost on a hot endpoint is a few ``perf_counter`` calls and a dict
+update.
+
+Under ASGI the middleware runs natively async. ``sync_to_async`` copies the
+request's context to the thread that runs its ORM calls, so the same
+counter sees their queries.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for the request being served."""
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class ViewMetrics:
+    """Running totals for one URL name."""
+    __slots__ = ('buckets', 'count', 'seconds', 'statuses', 'queries', 'sql_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class MetricsShard:
+    """One thread's aggregates; its lock is only contended while /metrics reads it."""
+    __slots__ = ('lock', 'views')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shards = []
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = MetricsShard()
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def record(self, view, status, seconds, request_metrics):
+        status_class = f"{status // 100}xx"
+        shard = self._shard()
+        with shard.lock:
+            metrics = shard.views.get(view)
+            if metrics is None:
+                metrics = shard.views[view] = ViewMetrics()
+            metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            metrics.count += 1
+            metrics.seconds += seconds
+            metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+            metrics.queries += request_metrics.queries
+            metrics.sql_seconds += request_metrics.sql_seconds
+            metrics.template_seconds += request_metrics.template_seconds
+
+    def reset(self):
+        with self.lock:
+            shards = list(self.shards)
+        for shard in shards:
+            with shard.lock:
+                shard.views = {}
+
+    def merged(self):
+        """Every thread's aggregates summed per URL name."""
+        with self.lock:
+            shards = list(self.shards)
+        views = {}
+        for shard in shards:
+            with shard.lock:
+                for view, m in shard.views.items():
+                    total = views.get(view)
+                    if total is None:
+                        total = views[view] = ViewMetrics()
+                    total.buckets = [a + b for a, b in zip(total.buckets, m.buckets)]
+                    total.count += m.count
+                    total.seconds += m.seconds
+                    for status_class, hits in m.statuses.items():
+                        total.statuses[status_class] = total.statuses.get(status_class, 0) + hits
+                    total.queries += m.queries
+                    total.sql_seconds += m.sql_seconds
+                    total.template_seconds += m.template_seconds
+        return views
+
+    def render(self):
+        """Return every aggregate in the Prometheus text exposition format."""
+        snapshot = [
+            (view, m.buckets, m.count, m.seconds, m.statuses, m.queries, m.sql_seconds, m.template_seconds)
+            for view, m in sorted(self.merged().items())
+        ]
+
+        lines = [
+            "# HELP django_request_duration_seconds Request latency by URL name.",
+            "# TYPE django_request_duration_seconds histogram",
+        ]
+        for view, buckets, count, seconds, *_ in snapshot:
+            cumulative = 0
+            for bound, hits in zip(LATENCY_BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'django_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'django_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {count}')
+            lines.append(f'django_request_duration_seconds_sum{{view="{view}"}} {seconds:.6f}')
+            lines.append(f'django_request_duration_seconds_count{{view="{view}"}} {count}')
+
+        lines += [
+            "# HELP django_responses_total Responses by URL name and status class.",
+            "# TYPE django_responses_total counter",
+        ]
+        for view, _, _, _, statuses, *_ in snapshot:
+            for status_class, hits in sorted(statuses.items()):
+                lines.append(f'django_responses_total{{view="{view}",status="{status_class}"}} {hits}')
+
+        for name, index, help_text, fmt in (
+            ("django_sql_queries_total", 5, "SQL queries run by URL name.", "{}"),
+            ("django_sql_duration_seconds_total", 6, "Time spent in SQL by URL name.", "{:.6f}"),
+            ("django_template_render_seconds_total", 7, "Time spent rendering templates by URL name.", "{:.6f}"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines.extend(f'{name}{{view="{row[0]}"}} {fmt.format(row[index])}' for row in snapshot)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def count_query(execute, sql, params, many, context):
+    """Connection-wide execute wrapper that reports to the current request, if any."""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class MetricsMiddleware:
+    """Time each request and count its SQL; put it first in MIDDLEWARE."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, request_metrics)
+        return response
+
+    def record(self, request, response, elapsed, request_metrics):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        registry.record(view, response.status_code, elapsed, request_metrics)
+
+
+class InstrumentedTemplate:
+    """Wraps a backend template to add its render time to the current request."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        request_metrics = _current.get()
+        if request_metrics is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            request_metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times reported to MetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
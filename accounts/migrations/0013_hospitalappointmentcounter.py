@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Appointment = apps.get_model('accounts', 'Appointment')
+    Counter = apps.get_model('accounts', 'HospitalAppointmentCounter')
+    grouped = Appointment.objects.values('hospital_id').annotate(
+        pending=Count('id', filter=Q(status='Pending')),
+        approved=Count('id', filter=Q(status='Approved')),
+        completed=Count('id', filter=Q(status='Completed')),
+        cancelled=Count('id', filter=Q(status='Cancelled')),
+    ).order_by()
+    Counter.objects.bulk_create(Counter(**row) for row in grouped)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalAppointmentCounter',
+            fields=[
+                ('hospital', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='appointment_counter', serialize=False, to='accounts.hospital')),
+                ('pending', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Appointment Counter',
+                'verbose_name_plural': 'Appointment Counters',
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
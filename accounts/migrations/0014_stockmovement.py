@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    Inventory = apps.get_model('accounts', 'Inventory')
+    StockMovement = apps.get_model('accounts', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        StockMovement(inventory_id=inventory_id, kind='Correction', quantity=quantity, note='Opening balance')
+        for inventory_id, quantity in Inventory.objects.exclude(stock_quantity=0).values_list('id', 'stock_quantity')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_hospitalappointmentcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('Restock', 'Restock'), ('Dose issued', 'Dose issued'), ('Correction', 'Correction')], max_length=20)),
+                ('quantity', models.IntegerField(help_text='Signed change in stock, e.g. -1 for one dose issued')),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('appointment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='accounts.appointment')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='accounts.inventory')),
+            ],
+            options={
+                'verbose_name': 'Stock Movement',
+                'verbose_name_plural': 'Stock Movements',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['inventory', 'created_at'], name='accounts_st_invento_d27c30_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_slots(apps, schema_editor):
+    Appointment = apps.get_model('accounts', 'Appointment')
+    AppointmentSlot = apps.get_model('accounts', 'AppointmentSlot')
+    booked = Appointment.objects.filter(status__in=['Pending', 'Approved']).values(
+        'hospital_id', 'date', 'time'
+    ).annotate(booked=Count('id')).order_by()
+    AppointmentSlot.objects.bulk_create(
+        # Never create a slot that is already over its default capacity
+        AppointmentSlot(capacity=max(4, row['booked']), **row)
+        for row in booked
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalSchedule',
+            fields=[
+                ('hospital', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule', serialize=False, to='accounts.hospital')),
+                ('opens_at', models.TimeField(default=datetime.time(9, 0))),
+                ('closes_at', models.TimeField(default=datetime.time(17, 0))),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=15)),
+                ('doses_per_slot', models.PositiveSmallIntegerField(default=4)),
+                ('open_weekdays', models.CharField(default='012345', help_text="Days open, Monday=0 ... Sunday=6, e.g. '012345'", max_length=7)),
+            ],
+            options={
+                'verbose_name': 'Hospital Schedule',
+                'verbose_name_plural': 'Hospital Schedules',
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('capacity', models.PositiveSmallIntegerField()),
+                ('booked', models.PositiveSmallIntegerField(default=0)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='accounts.hospital')),
+            ],
+            options={
+                'verbose_name': 'Appointment Slot',
+                'verbose_name_plural': 'Appointment Slots',
+                'constraints': [models.UniqueConstraint(fields=('hospital', 'date', 'time'), name='unique_hospital_slot'), models.CheckConstraint(condition=models.Q(('booked__lte', models.F('capacity'))), name='slot_booked_within_capacity')],
+            },
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from accounts.age_ranges import parse_recommended_age
+
+
+def parse_existing_ages(apps, schema_editor):
+    Vaccine = apps.get_model('accounts', 'Vaccine')
+    VaccineDose = apps.get_model('accounts', 'VaccineDose')
+    VaccineDose.objects.bulk_create(
+        VaccineDose(vaccine_id=vaccine_id, dose_number=number, min_age_days=low, max_age_days=high)
+        for vaccine_id, text in Vaccine.objects.values_list('id', 'recommended_age')
+        for number, (low, high) in enumerate(parse_recommended_age(text), start=1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_appointment_slots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vaccine',
+            name='recommended_age',
+            field=models.CharField(blank=True, help_text="e.g., '0-6 months', '12-15 months', or a dose series like '6 weeks, 10 weeks, 14 weeks'", max_length=50),
+        ),
+        migrations.CreateModel(
+            name='VaccinationDue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dose_number', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField()),
+                ('overdue_after', models.DateField()),
+                ('completed_on', models.DateField(blank=True, null=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vaccinations_due', to='accounts.child')),
+                ('vaccine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.vaccine')),
+            ],
+            options={
+                'verbose_name': 'Vaccination Due',
+                'verbose_name_plural': 'Vaccinations Due',
+                'ordering': ['due_date'],
+                'indexes': [models.Index(fields=['child', 'due_date'], name='accounts_va_child_i_68642c_idx'), models.Index(condition=models.Q(('completed_on__isnull', True)), fields=['due_date'], name='vaccinationdue_open_idx')],
+                'unique_together': {('child', 'vaccine', 'dose_number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VaccineDose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dose_number', models.PositiveSmallIntegerField(default=1)),
+                ('min_age_days', models.PositiveIntegerField()),
+                ('max_age_days', models.PositiveIntegerField()),
+                ('vaccine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doses', to='accounts.vaccine')),
+            ],
+            options={
+                'verbose_name': 'Vaccine Dose',
+                'verbose_name_plural': 'Vaccine Doses',
+                'ordering': ['vaccine', 'dose_number'],
+                'unique_together': {('vaccine', 'dose_number')},
+            },
+        ),
+        migrations.RunPython(parse_existing_ages, migrations.RunPython.noop),
+    ]
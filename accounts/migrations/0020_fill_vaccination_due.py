@@ -0,0 +1,63 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import migrations
+
+# Frozen copy of accounts.vaccination_schedule as of this migration, so later
+# changes to that module cannot change what this migration does
+DUE_GRACE_DAYS = 28
+CHUNK_SIZE = 5000
+
+
+def fill_due_dates(apps, schema_editor):
+    # 0016 parsed the dose series but left existing children without due rows
+    Appointment = apps.get_model('accounts', 'Appointment')
+    Child = apps.get_model('accounts', 'Child')
+    VaccinationDue = apps.get_model('accounts', 'VaccinationDue')
+    VaccineDose = apps.get_model('accounts', 'VaccineDose')
+
+    entries = [
+        (vaccine_id, number, low, high if high > low else low + DUE_GRACE_DAYS)
+        for vaccine_id, number, low, high in VaccineDose.objects.order_by('vaccine_id', 'dose_number').values_list(
+            'vaccine_id', 'dose_number', 'min_age_days', 'max_age_days'
+        )
+    ]
+    last_id = 0
+    while True:
+        chunk = list(
+            Child.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'date_of_birth')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        ids = [child_id for child_id, _ in chunk]
+
+        given = defaultdict(list)
+        for child_id, vaccine_id, day in Appointment.objects.filter(
+            child_id__in=ids, status='Completed', vaccine__isnull=False
+        ).order_by('date', 'id').values_list('child_id', 'vaccine_id', 'date'):
+            given[child_id, vaccine_id].append(day)
+
+        rows = [
+            VaccinationDue(
+                child_id=child_id, vaccine_id=vaccine_id, dose_number=number,
+                due_date=date.fromordinal(born.toordinal() + due_offset),
+                overdue_after=date.fromordinal(born.toordinal() + overdue_offset),
+                completed_on=(given[child_id, vaccine_id][number - 1:number] or [None])[0],
+            )
+            for vaccine_id, number, due_offset, overdue_offset in entries
+            for child_id, born in chunk
+        ]
+        VaccinationDue.objects.filter(child_id__in=ids).delete()
+        VaccinationDue.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_catalogversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_fill_vaccination_due'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileVersion',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Profile Version',
+                'verbose_name_plural': 'Profile Versions',
+            },
+        ),
+    ]
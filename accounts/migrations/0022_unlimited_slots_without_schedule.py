@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Largest PositiveSmallIntegerField value, as AppointmentSlot.UNLIMITED when this migration was written
+UNLIMITED = 32767
+
+
+def lift_default_capacity(apps, schema_editor):
+    # 0015 gave every booked slot a capacity of four, including slots at hospitals
+    # that never set a schedule; those hospitals take bookings without a limit
+    AppointmentSlot = apps.get_model('accounts', 'AppointmentSlot')
+    HospitalSchedule = apps.get_model('accounts', 'HospitalSchedule')
+    AppointmentSlot.objects.exclude(
+        hospital_id__in=HospitalSchedule.objects.values('hospital_id')
+    ).update(capacity=UNLIMITED)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_profileversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(lift_default_capacity, migrations.RunPython.noop),
+    ]
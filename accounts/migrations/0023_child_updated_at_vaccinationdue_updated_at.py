@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_unlimited_slots_without_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='child',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='vaccinationdue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,144 @@
+"""Read-only JSON documents for the mobile app.
+
+Rows are read with ``values_list()`` and zipped straight into dicts, so no
+model instances are built. Each resource maps its public field names to ORM
+paths; ``?fields=`` picks a subset, and related names (``child``,
+``hospital``, ``vaccine``) are only joined in when asked for.
+
+Responses carry a strong ``ETag`` hashed from a cheap validator: the row
+count and latest ``updated_at`` from one aggregate, plus the catalog version
+when hospital or vaccine names are shown. An unchanged refresh is answered
+with a 304 before any row is read.
+"""
+import hashlib
+from datetime import date
+from operator import itemgetter
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .catalog import get_catalog
+from .models import Appointment, Child, VaccinationDue
+from .pagination import keyset_page
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+CHILD_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'date_of_birth': 'date_of_birth',
+    'gender': 'gender',
+    'blood_group': 'blood_group',
+}
+APPOINTMENT_FIELDS = {
+    'id': 'id',
+    'date': 'date',
+    'time': 'time',
+    'status': 'status',
+    'child_id': 'child_id',
+    'child': 'child__name',
+    'hospital_id': 'hospital_id',
+    'hospital': 'hospital__name',
+    'vaccine_id': 'vaccine_id',
+    'vaccine': 'vaccine__name',
+    'notes': 'notes',
+}
+# 'status' is worked out from the dates rather than read from a column
+VACCINATION_FIELDS = {
+    'id': 'id',
+    'child_id': 'child_id',
+    'child': 'child__name',
+    'vaccine_id': 'vaccine_id',
+    'vaccine': 'vaccine__name',
+    'dose_number': 'dose_number',
+    'due_date': 'due_date',
+    'overdue_after': 'overdue_after',
+    'completed_on': 'completed_on',
+    'status': None,
+}
+
+
+def select_fields(value, fields):
+    """Parse ``?fields=a,b`` against a resource's fields; all of them when empty.
+
+    Raises ValueError naming any unknown field.
+    """
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(names)) or list(fields)
+
+
+def page_size(value):
+    """Parse ``?limit=``, clamped to 1..MAX_PAGE_SIZE; raises ValueError if not a number."""
+    return max(1, min(int(value), MAX_PAGE_SIZE)) if value else PAGE_SIZE
+
+
+def children(parent, names):
+    rows = Child.objects.filter(parent=parent).order_by('name', 'id')
+    return [dict(zip(names, row)) for row in rows.values_list(*(CHILD_FIELDS[name] for name in names))]
+
+
+def appointments(parent, names, cursor, limit):
+    """One page of a parent's appointments, newest first, and the cursor for the next."""
+    # (date, time, id) lead every row so the cursor can be read from it
+    paths = ['date', 'time', 'id'] + [APPOINTMENT_FIELDS[name] for name in names]
+    rows, next_cursor = keyset_page(
+        Appointment.objects.filter(parent=parent).values_list(*paths), cursor, limit,
+        descending=True, position=itemgetter(0, 1, 2),
+    )
+    return [dict(zip(names, row[3:])) for row in rows], next_cursor
+
+
+def vaccinations(parent, names):
+    """Every scheduled dose of the parent's children with its status."""
+    paths = ['due_date', 'overdue_after', 'completed_on'] + [
+        VACCINATION_FIELDS[name] for name in names if name != 'status'
+    ]
+    rows = VaccinationDue.objects.filter(child__parent=parent).order_by('child_id', 'due_date', 'id')
+    documents = []
+    for due_date, overdue_after, completed_on, *values in rows.values_list(*paths):
+        document = dict(zip((name for name in names if name != 'status'), values))
+        if 'status' in names:
+            document['status'] = VaccinationDue.status_for(due_date, overdue_after, completed_on)
+        documents.append(document)
+    return documents
+
+
+def _fingerprint(queryset, names):
+    """What the rows' contents depend on, read with a single aggregate."""
+    latest = {'rows': Count('id'), 'updated': Max('updated_at')}
+    if 'child' in names:
+        latest['child_updated'] = Max('child__updated_at')
+    fingerprint = sorted(queryset.aggregate(**latest).items())
+    if 'hospital' in names or 'vaccine' in names:
+        fingerprint.append(('catalog', get_catalog().version))
+    return fingerprint
+
+
+def children_validator(parent, names):
+    return ('children', names, _fingerprint(Child.objects.filter(parent=parent), names))
+
+
+def appointments_validator(parent, names, cursor, limit):
+    return ('appointments', names, cursor, limit, _fingerprint(Appointment.objects.filter(parent=parent), names))
+
+
+def vaccinations_validator(parent, names):
+    validator = ('vaccinations', names, _fingerprint(VaccinationDue.objects.filter(child__parent=parent), names))
+    # A dose's status moves on with the calendar
+    return validator + (date.today(),) if 'status' in names else validator
+
+
+def conditional_json(request, validator, build):
+    """A 304 if the client's ETag matches ``validator``, else a JsonResponse of ``build()``."""
+    etag = quote_etag(hashlib.md5(repr(validator).encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build())
+    response.headers['ETag'] = etag
+    return response
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+
+from .age_ranges import parse_recommended_age
 
 class Parent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -31,6 +35,7 @@ class Child(models.Model):
     date_of_birth = models.DateField()
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
     blood_group = models.CharField(max_length=5, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} (Child of {self.parent.user.username})"
@@ -72,7 +77,10 @@ class Hospital(models.Model):
 class Vaccine(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
-    recommended_age = models.CharField(max_length=50, blank=True, help_text="e.g., '0-6 months', '12-15 months'")
+    recommended_age = models.CharField(
+        max_length=50, blank=True,
+        help_text="e.g., '0-6 months', '12-15 months', or a dose series like '6 weeks, 10 weeks, 14 weeks'"
+    )
 
     def __str__(self):
         return self.name
@@ -82,6 +90,63 @@ class Vaccine(models.Model):
         verbose_name_plural = "Vaccines"
         ordering = ['name']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'recommended_age' in field_names:
+            instance._loaded_recommended_age = instance.recommended_age
+        return instance
+
+    def save(self, *args, **kwargs):
+        age_changed = getattr(self, '_loaded_recommended_age', None) != self.recommended_age
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if age_changed:
+                self.sync_doses()
+        self._loaded_recommended_age = self.recommended_age
+
+    def sync_doses(self, rebuild=True):
+        """Replace the structured dose series with one parsed from ``recommended_age``.
+
+        Text that cannot be parsed leaves the existing doses alone, so they
+        can still be maintained by hand in the admin. With ``rebuild`` the
+        children's due dates for this vaccine are recomputed after commit.
+        """
+        doses = parse_recommended_age(self.recommended_age)
+        if not doses:
+            return False
+        from .vaccination_schedule import rebuild_due_dates
+
+        self.doses.all().delete()
+        VaccineDose.objects.bulk_create(
+            VaccineDose(vaccine=self, dose_number=number, min_age_days=low, max_age_days=high)
+            for number, (low, high) in enumerate(doses, start=1)
+        )
+        if rebuild:
+            transaction.on_commit(lambda: rebuild_due_dates(vaccine_ids=[self.pk]))
+        return True
+
+
+class VaccineDose(models.Model):
+    """One dose of a vaccine's schedule, as an age window counted from birth."""
+    vaccine = models.ForeignKey(Vaccine, on_delete=models.CASCADE, related_name='doses')
+    dose_number = models.PositiveSmallIntegerField(default=1)
+    min_age_days = models.PositiveIntegerField()
+    max_age_days = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Vaccine Dose"
+        verbose_name_plural = "Vaccine Doses"
+        ordering = ['vaccine', 'dose_number']
+        unique_together = ('vaccine', 'dose_number')
+
+    def __str__(self):
+        return f"{self.vaccine.name} dose {self.dose_number} ({self.min_age_days}-{self.max_age_days} days)"
+
+    def clean(self):
+        if self.max_age_days < self.min_age_days:
+            raise ValidationError({'max_age_days': "Maximum age must not be before the minimum age."})
+
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -113,20 +178,328 @@ class Appointment(models.Model):
         verbose_name = "Appointment"
         verbose_name_plural = "Appointments"
         ordering = ['-date', '-time']
+        indexes = [
+            # Hospital board tabs: one status, a date window, sorted by slot
+            models.Index(fields=['hospital', 'status', 'date', 'time'], name='appt_hospital_status_idx'),
+            # Hospital board counts: covers the per-status aggregate over a date window
+            models.Index(fields=['hospital', 'date', 'status'], name='appt_hospital_date_idx'),
+            # Parent dashboard and appointment list, newest first
+            models.Index(fields=['parent', 'date', 'time'], name='appt_parent_date_idx'),
+            # Network-wide date ranges such as the reminder run
+            models.Index(fields=['date', 'time'], name='appt_date_idx'),
+        ]
+
+    ACTIVE_STATUSES = ('Pending', 'Approved')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so post_save can tell what changed
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+            if {'hospital_id', 'date', 'time'}.issubset(field_names):
+                instance._loaded_slot = instance.slot_key
+        return instance
+
+    @property
+    def slot_key(self):
+        """The (hospital, date, time) slot this appointment holds, if it holds one."""
+        if self.status in self.ACTIVE_STATUSES:
+            return (self.hospital_id, self.date, self.time)
+        return None
+
+    @property
+    def held_slot(self):
+        """The slot the stored row holds, ignoring unsaved changes."""
+        if self._state.adding:
+            return None
+        return getattr(self, '_loaded_slot', self.slot_key)
+
+    def save(self, *args, **kwargs):
+        # Move the slot reservation in the same transaction as the row itself
+        with transaction.atomic():
+            old_slot = self.held_slot
+            new_slot = self.slot_key
+            if old_slot != new_slot:
+                if old_slot:
+                    AppointmentSlot.release(*old_slot)
+                if new_slot:
+                    AppointmentSlot.reserve(*new_slot)
+            super().save(*args, **kwargs)
+        self._loaded_slot = new_slot
     
     @property
     def is_upcoming(self):
         """Check if appointment is in the future"""
-        from datetime import datetime
         appointment_datetime = datetime.combine(self.date, self.time)
         return appointment_datetime > datetime.now() and self.status in ['Pending', 'Approved']
     
     @property
     def is_past(self):
         """Check if appointment is in the past"""
-        from datetime import datetime
         appointment_datetime = datetime.combine(self.date, self.time)
         return appointment_datetime < datetime.now()
+
+
+class HospitalSchedule(models.Model):
+    """Opening hours and slot capacity that bookings at a hospital must fit.
+
+    Only hospitals with a saved row are held to them; the others book any
+    date and time without a capacity limit, as they did before slots existed.
+    """
+    hospital = models.OneToOneField(
+        Hospital, on_delete=models.CASCADE, primary_key=True, related_name='schedule'
+    )
+    opens_at = models.TimeField(default=time(9, 0))
+    closes_at = models.TimeField(default=time(17, 0))
+    slot_minutes = models.PositiveSmallIntegerField(default=15)
+    doses_per_slot = models.PositiveSmallIntegerField(default=4)
+    open_weekdays = models.CharField(
+        max_length=7, default='012345', help_text="Days open, Monday=0 ... Sunday=6, e.g. '012345'"
+    )
+
+    class Meta:
+        verbose_name = "Hospital Schedule"
+        verbose_name_plural = "Hospital Schedules"
+
+    def __str__(self):
+        return f"{self.hospital_id}: {self.opens_at}-{self.closes_at} every {self.slot_minutes} min"
+
+    def clean(self):
+        if self.closes_at <= self.opens_at:
+            raise ValidationError({'closes_at': "Closing time must be after opening time."})
+        if not self.slot_minutes:
+            raise ValidationError({'slot_minutes': "Slot length must be at least one minute."})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Existing future slots follow the new capacity, but never below what is booked
+            AppointmentSlot.objects.filter(
+                hospital_id=self.hospital_id, date__gte=timezone.localdate()
+            ).update(capacity=Greatest(F('booked'), self.doses_per_slot))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Without a schedule the hospital's future slots are no longer limited
+            AppointmentSlot.objects.filter(
+                hospital_id=self.hospital_id, date__gte=timezone.localdate()
+            ).update(capacity=AppointmentSlot.UNLIMITED)
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def for_hospital(cls, hospital_id):
+        """The hospital's schedule, or an unsaved default one if it never set hours."""
+        return cls.objects.filter(hospital_id=hospital_id).first() or cls(hospital_id=hospital_id)
+
+    @property
+    def enforced(self):
+        """Whether bookings must fit this schedule; an unsaved default only suggests slots."""
+        return not self._state.adding
+
+    @property
+    def slot_capacity(self):
+        return self.doses_per_slot if self.enforced else AppointmentSlot.UNLIMITED
+
+    def is_open_on(self, day):
+        return str(day.weekday()) in self.open_weekdays
+
+    def slot_times(self):
+        """Start times of every slot in a working day."""
+        start = datetime.combine(datetime.min, self.opens_at)
+        end = datetime.combine(datetime.min, self.closes_at)
+        step = timedelta(minutes=self.slot_minutes)
+        times = []
+        while start + step <= end:
+            times.append(start.time())
+            start += step
+        return times
+
+
+class AppointmentSlot(models.Model):
+    """Doses booked in one hospital time slot.
+
+    A row exists only once someone books the slot. The CHECK constraint keeps
+    ``booked`` within ``capacity`` even if two bookings race.
+    """
+    # Capacity of slots at hospitals without a schedule: the largest PositiveSmallIntegerField value
+    UNLIMITED = 32767
+
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='slots')
+    date = models.DateField()
+    time = models.TimeField()
+    capacity = models.PositiveSmallIntegerField()
+    booked = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Appointment Slot"
+        verbose_name_plural = "Appointment Slots"
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'date', 'time'], name='unique_hospital_slot'),
+            models.CheckConstraint(condition=Q(booked__lte=F('capacity')), name='slot_booked_within_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id} {self.date} {self.time} ({self.booked}/{self.capacity})"
+
+    @property
+    def is_full(self):
+        return self.booked >= self.capacity
+
+    @classmethod
+    def reserve(cls, hospital_id, day, moment):
+        """Take one dose from a slot, raising ValidationError if it is already full."""
+        with transaction.atomic():
+            cls.objects.get_or_create(
+                hospital_id=hospital_id, date=day, time=moment,
+                defaults={'capacity': HospitalSchedule.for_hospital(hospital_id).slot_capacity},
+            )
+            taken = cls.objects.filter(
+                hospital_id=hospital_id, date=day, time=moment, booked__lt=F('capacity')
+            ).update(booked=F('booked') + 1)
+        if not taken:
+            raise ValidationError(
+                f"The {moment:%H:%M} slot on {day:%b %d, %Y} is fully booked.", code='slot_full'
+            )
+
+    @classmethod
+    def release(cls, hospital_id, day, moment):
+        cls.objects.filter(
+            hospital_id=hospital_id, date=day, time=moment, booked__gt=0
+        ).update(booked=F('booked') - 1)
+
+
+class HospitalAppointmentCounter(models.Model):
+    """Running per-status appointment totals for one hospital.
+
+    Kept current by the Appointment signal handlers so the hospital
+    dashboard can read every count with a single primary-key lookup.
+    Run ``manage.py rebuild_appointment_counters`` to repair drift.
+    """
+    STATUS_FIELDS = {
+        'Pending': 'pending',
+        'Approved': 'approved',
+        'Completed': 'completed',
+        'Cancelled': 'cancelled',
+    }
+
+    hospital = models.OneToOneField(
+        Hospital, on_delete=models.CASCADE, primary_key=True, related_name='appointment_counter'
+    )
+    pending = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Appointment Counter"
+        verbose_name_plural = "Appointment Counters"
+
+    def __str__(self):
+        return f"{self.hospital_id}: {self.total} appointments"
+
+    @property
+    def total(self):
+        return self.pending + self.approved + self.completed + self.cancelled
+
+    def as_dict(self):
+        counts = {name: getattr(self, name) for name in self.STATUS_FIELDS.values()}
+        counts['total'] = self.total
+        return counts
+
+    @classmethod
+    def status_aggregates(cls):
+        """Conditional Count() expressions, one per status field."""
+        return {
+            name: Count('id', filter=Q(status=status))
+            for status, name in cls.STATUS_FIELDS.items()
+        }
+
+    @classmethod
+    def aggregate_counts(cls, hospital_id):
+        """Count a hospital's appointments per status in one conditional aggregate."""
+        counts = Appointment.objects.filter(hospital_id=hospital_id).aggregate(**cls.status_aggregates())
+        counts['total'] = sum(counts.values())
+        return counts
+
+    @classmethod
+    def counts_for(cls, hospital_id):
+        """Return status totals, falling back to an aggregate if no counter row exists yet."""
+        counter = cls.objects.filter(hospital_id=hospital_id).first()
+        if counter is None:
+            return cls.aggregate_counts(hospital_id)
+        return counter.as_dict()
+
+    @classmethod
+    async def acounts_for(cls, hospital_id):
+        """Async ``counts_for`` for async views."""
+        counter = await cls.objects.filter(hospital_id=hospital_id).afirst()
+        if counter is None:
+            counts = await Appointment.objects.filter(hospital_id=hospital_id).aaggregate(**cls.status_aggregates())
+            counts['total'] = sum(counts.values())
+            return counts
+        return counter.as_dict()
+
+    @classmethod
+    def rebuild(cls, hospital_ids=None):
+        """Recompute counters from Appointment with one grouped aggregate.
+
+        Rebuilds every hospital when ``hospital_ids`` is None. Returns the
+        number of counter rows written.
+        """
+        hospitals = Hospital.objects.all()
+        appointments = Appointment.objects.all()
+        if hospital_ids is not None:
+            hospitals = hospitals.filter(id__in=hospital_ids)
+            appointments = appointments.filter(hospital_id__in=hospital_ids)
+
+        counters = {
+            hospital_id: cls(hospital_id=hospital_id)
+            for hospital_id in hospitals.values_list('id', flat=True)
+        }
+        grouped = appointments.values('hospital_id').annotate(**cls.status_aggregates()).order_by()
+        for row in grouped:
+            counter = counters.get(row.pop('hospital_id'))
+            if counter is not None:
+                for name, value in row.items():
+                    setattr(counter, name, value)
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                counters.values(),
+                update_conflicts=True,
+                unique_fields=['hospital'],
+                update_fields=[*cls.STATUS_FIELDS.values(), 'updated_at'],
+            )
+        return len(counters)
+
+    @classmethod
+    def record_transition(cls, hospital_id, old_status, new_status, seed=True, count=1):
+        """Move ``count`` appointments between status buckets with an atomic UPDATE.
+
+        With ``seed`` a missing counter row is created from the table; deletes
+        pass ``seed=False`` so a cascading hospital delete never re-inserts it.
+        """
+        if old_status == new_status or not count:
+            return
+        changes = {}
+        if old_status in cls.STATUS_FIELDS:
+            name = cls.STATUS_FIELDS[old_status]
+            changes[name] = F(name) - count
+        if new_status in cls.STATUS_FIELDS:
+            name = cls.STATUS_FIELDS[new_status]
+            changes[name] = F(name) + count
+        if not changes:
+            return
+        updated = cls.objects.filter(hospital_id=hospital_id).update(
+            updated_at=timezone.now(), **changes
+        )
+        if not updated and seed:
+            # First appointment event for this hospital: seed the row from the table
+            cls.rebuild([hospital_id])
+
+
 class Inventory(models.Model):
     """Tracks the stock of a specific vaccine at a specific hospital."""
     hospital = models.ForeignKey('Hospital', on_delete=models.CASCADE, related_name='inventory')
@@ -139,6 +512,13 @@ class Inventory(models.Model):
         unique_together = ('hospital', 'vaccine')
         verbose_name = "Vaccine Inventory"
         verbose_name_plural = "Vaccine Inventories"
+        indexes = [
+            # Only in-stock rows, for availability lookups
+            models.Index(
+                fields=['hospital', 'vaccine', 'stock_quantity'], condition=Q(stock_quantity__gt=0),
+                name='inventory_in_stock_idx',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.hospital.name} - {self.vaccine.name} ({self.stock_quantity})"
@@ -146,4 +526,190 @@ class Inventory(models.Model):
     # Optional: Custom validation to ensure stock is not negative
     def clean(self):
         if self.stock_quantity < 0:
-            raise ValidationError({'stock_quantity': "Stock quantity cannot be negative."})
\ No newline at end of file
+            raise ValidationError({'stock_quantity': "Stock quantity cannot be negative."})
+
+class StockMovement(models.Model):
+    """Append-only ledger of every change to a hospital's vaccine stock.
+
+    ``Inventory.stock_quantity`` is the materialized sum of these rows; write
+    them through ``accounts.stock.record_movements`` so both stay in step.
+    """
+    RESTOCK = 'Restock'
+    DOSE_ISSUED = 'Dose issued'
+    CORRECTION = 'Correction'
+    KIND_CHOICES = [
+        (RESTOCK, 'Restock'),
+        (DOSE_ISSUED, 'Dose issued'),
+        (CORRECTION, 'Correction'),
+    ]
+
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text="Signed change in stock, e.g. -1 for one dose issued")
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Stock Movement"
+        verbose_name_plural = "Stock Movements"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['inventory', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} (inventory {self.inventory_id})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Stock movements are append-only; record a correction instead.")
+        return super().save(*args, **kwargs)
+
+
+class VaccinationDueQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(completed_on__isnull=True)
+
+    def overdue(self, today=None):
+        return self.open().filter(overdue_after__lt=today or date.today())
+
+    def due(self, today=None):
+        today = today or date.today()
+        return self.open().filter(due_date__lte=today, overdue_after__gte=today)
+
+    def upcoming(self, today=None, days=30):
+        today = today or date.today()
+        return self.open().filter(due_date__gt=today, due_date__lte=today + timedelta(days=days))
+
+
+class VaccinationDue(models.Model):
+    """Precomputed due window for one dose of one vaccine for one child.
+
+    Rows are written in bulk by ``accounts.vaccination_schedule`` so that
+    dashboards and reminder jobs can query due dates directly.
+    """
+    child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name='vaccinations_due')
+    vaccine = models.ForeignKey(Vaccine, on_delete=models.CASCADE, related_name='+')
+    dose_number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    overdue_after = models.DateField()
+    completed_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VaccinationDueQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Vaccination Due"
+        verbose_name_plural = "Vaccinations Due"
+        ordering = ['due_date']
+        unique_together = ('child', 'vaccine', 'dose_number')
+        indexes = [
+            models.Index(fields=['child', 'due_date']),
+            models.Index(
+                fields=['due_date'], condition=Q(completed_on__isnull=True), name='vaccinationdue_open_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.child_id}: {self.vaccine_id} dose {self.dose_number} due {self.due_date}"
+
+    @property
+    def status(self):
+        return self.status_for(self.due_date, self.overdue_after, self.completed_on)
+
+    @staticmethod
+    def status_for(due_date, overdue_after, completed_on, today=None):
+        """The status of a dose from its dates, for rows read with ``values()``."""
+        today = today or date.today()
+        if completed_on:
+            return 'Completed'
+        if overdue_after < today:
+            return 'Overdue'
+        if due_date <= today:
+            return 'Due'
+        return 'Upcoming'
+
+
+class AppointmentReminder(models.Model):
+    """A reminder claimed just before it is sent, so reminder runs can be repeated safely."""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    appointment_date = models.DateField(help_text="Date the reminder was for; a rescheduled appointment is reminded again")
+    channel = models.CharField(max_length=20, default='email')
+    sent_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Appointment Reminder"
+        verbose_name_plural = "Appointment Reminders"
+        unique_together = ('appointment', 'appointment_date', 'channel')
+
+    def __str__(self):
+        return f"{self.channel} reminder for appointment {self.appointment_id} on {self.appointment_date}"
+
+
+class CatalogVersion(models.Model):
+    """One row counting changes to the vaccine catalog and the approved-hospital list.
+
+    ``accounts.catalog`` keeps a copy of both in every process and reloads it
+    when this number moves, so workers agree without a shared cache service.
+    """
+    SINGLETON_ID = 1
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Catalog Version"
+        verbose_name_plural = "Catalog Versions"
+
+    def __str__(self):
+        return f"catalog version {self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Move the version on with an atomic UPDATE, creating the row on first use."""
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(pk=cls.SINGLETON_ID, defaults={'version': 1})
+
+
+class ProfileVersion(models.Model):
+    """Counts changes to one user's Parent/Hospital profile and account.
+
+    Sessions keep a copy of the profile tagged with this number (see
+    ``accounts.roles``); it lives in the database so a change made in one
+    worker process invalidates the copies held by sessions served by any other.
+    A user without a row is at version 0.
+    """
+    # A plain key rather than a ForeignKey: profile deletes bump it while the User is being deleted
+    user_id = models.BigIntegerField(primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Profile Version"
+        verbose_name_plural = "Profile Versions"
+
+    def __str__(self):
+        return f"profile version {self.version} for user {self.user_id}"
+
+    @classmethod
+    def current(cls, user_id):
+        return cls.objects.filter(pk=user_id).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    async def acurrent(cls, user_id):
+        return await cls.objects.filter(pk=user_id).values_list('version', flat=True).afirst() or 0
+
+    @classmethod
+    def bump(cls, user_id):
+        """Move the version on with an atomic UPDATE, creating the row on first use."""
+        if not cls.objects.filter(pk=user_id).update(version=F('version') + 1):
+            cls.objects.get_or_create(pk=user_id, defaults={'version': 1})
@@ -0,0 +1,77 @@
+"""Keyset pagination for appointment lists ordered by (date, time, id)."""
+import base64
+from datetime import date, time
+from operator import attrgetter
+
+from django.db.models import Q
+
+appointment_position = attrgetter('date', 'time', 'id')
+
+
+def encode_cursor(appointment):
+    """Return an opaque, URL-safe cursor pointing just past ``appointment``."""
+    return encode_position(*appointment_position(appointment))
+
+
+def encode_position(day, moment, pk):
+    """Return the cursor for a ``(date, time, id)`` position."""
+    raw = f"{day.isoformat()}|{moment.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Decode a cursor into a (date, time, id) tuple, or None if it is invalid."""
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        day, moment, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return date.fromisoformat(day), time.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def after_cursor(cursor, descending=False):
+    """Build the seek predicate for rows strictly after ``cursor`` in sort order."""
+    day, moment, pk = cursor
+    op = 'lt' if descending else 'gt'
+    return (
+        Q(**{f'date__{op}': day})
+        | Q(date=day, **{f'time__{op}': moment})
+        | Q(date=day, time=moment, **{f'id__{op}': pk})
+    )
+
+
+def keyset_page(queryset, cursor, page_size, descending=False, position=appointment_position):
+    """Fetch one page of ``queryset`` after ``cursor``.
+
+    Returns ``(rows, next_cursor)`` where ``next_cursor`` is None on the last
+    page. Only ``page_size + 1`` rows are ever read, whatever the history size.
+    ``position`` reads ``(date, time, id)`` from a row; pass an ``itemgetter``
+    for ``values()`` or ``values_list()`` querysets.
+    """
+    rows = list(_page_queryset(queryset, cursor, page_size, descending))
+    return _split_page(rows, page_size, position)
+
+
+async def akeyset_page(queryset, cursor, page_size, descending=False, position=appointment_position):
+    """Async ``keyset_page``."""
+    rows = [row async for row in _page_queryset(queryset, cursor, page_size, descending)]
+    return _split_page(rows, page_size, position)
+
+
+def _page_queryset(queryset, cursor, page_size, descending):
+    ordering = ('-date', '-time', '-id') if descending else ('date', 'time', 'id')
+    queryset = queryset.order_by(*ordering)
+    position = decode_cursor(cursor)
+    if position is not None:
+        queryset = queryset.filter(after_cursor(position, descending))
+    return queryset[:page_size + 1]
+
+
+def _split_page(rows, page_size, position):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_position(*position(rows[-1]))
+    return rows, next_cursor
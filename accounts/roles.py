@@ -0,0 +1,184 @@
+"""Resolve the signed-in user's Parent or Hospital profile once per session.
+
+``RoleMiddleware`` gives the request ``role``, ``parent`` and ``hospital``
+attributes that resolve on first access, so requests that never look at them
+(e.g. a 304 from the availability API) load neither the session nor the user.
+The profile fields are kept in the session, tagged with a per-user version.
+The ``ProfileVersion`` row is the source of truth; the cache holds a copy so
+checking it costs no query. Saving or deleting a profile bumps the version
+(see ``accounts.signals``) and the next request reloads the profile. Workers
+only see each other's bumps through a shared cache backend.
+
+Under ASGI the middleware resolves the role up front with the async ORM and
+session API, and loads ``request.user`` too, so async views and their
+templates never touch the lazy, sync-only user object.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Hospital, Parent, ProfileVersion
+
+SESSION_KEY = '_role_profile'
+PROFILE_MODELS = {'parent': Parent, 'hospital': Hospital}
+
+
+def _version_key(user_id):
+    return f"profile-version:{user_id}"
+
+
+def current_version(user_id):
+    """The user's profile version from the cache, read from the database on a miss."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = ProfileVersion.current(user_id)
+        # add(), not set(): a bump committed meanwhile has already stored the newer value
+        cache.add(_version_key(user_id), version, timeout=None)
+    return version
+
+
+async def acurrent_version(user_id):
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = await ProfileVersion.acurrent(user_id)
+        await cache.aadd(_version_key(user_id), version, timeout=None)
+    return version
+
+
+def invalidate_role(user_id):
+    """Make every session of this user reload its profile on the next request."""
+    if user_id is not None:
+        ProfileVersion.bump(user_id)
+        key = _version_key(user_id)
+        cache.delete(key)
+        # A reader may have cached the old value before the bump committed
+        transaction.on_commit(lambda: cache.set(key, ProfileVersion.current(user_id), timeout=None))
+
+
+def _serialize(instance):
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def profile_version(profile):
+    """The version a Parent or Hospital was resolved at, or the stored one for other instances."""
+    version = getattr(profile, '_profile_version', None)
+    return current_version(profile.user_id) if version is None else version
+
+
+async def aprofile_version(profile):
+    version = getattr(profile, '_profile_version', None)
+    return await acurrent_version(profile.user_id) if version is None else version
+
+
+def _restore(model, fields, user, version):
+    """Rebuild a saved model instance from session data without a query."""
+    instance = model.from_db('default', list(fields), list(fields.values()))
+    instance.user = user
+    instance._profile_version = version
+    return instance
+
+
+def _is_current(cached, user, version):
+    return bool(cached) and cached['user'] == user.pk and cached['version'] == version
+
+
+def _entry(user, version, instances):
+    profiles = {role: _serialize(instance) for role, instance in instances.items() if instance is not None}
+    return {'user': user.pk, 'version': version, 'role': next(iter(profiles), None), 'profiles': profiles}
+
+
+def _resolved(cached, user):
+    profiles = {
+        role: _restore(PROFILE_MODELS[role], fields, user, cached['version']) for role, fields in cached['profiles'].items()
+    }
+    # Prime user.parent / user.hospital too, so templates that check them cost no query
+    for role, model in PROFILE_MODELS.items():
+        model._meta.get_field('user').remote_field.set_cached_value(user, profiles.get(role))
+    return cached['role'], profiles.get('parent'), profiles.get('hospital')
+
+
+def resolve_role(request):
+    """Return ``(role, parent, hospital)`` for the request's user."""
+    user = request.user
+    if not user.is_authenticated:
+        return None, None, None
+
+    version = current_version(user.pk)
+    cached = request.session.get(SESSION_KEY)
+    if not _is_current(cached, user, version):
+        instances = {role: model.objects.filter(user=user).first() for role, model in PROFILE_MODELS.items()}
+        cached = _entry(user, version, instances)
+        request.session[SESSION_KEY] = cached
+    return _resolved(cached, user)
+
+
+async def aresolve_role(request):
+    """Async ``resolve_role``, using the async session and ORM APIs."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, None, None
+
+    version = await acurrent_version(user.pk)
+    cached = await request.session.aget(SESSION_KEY)
+    if not _is_current(cached, user, version):
+        instances = {
+            role: await model.objects.filter(user=user).afirst() for role, model in PROFILE_MODELS.items()
+        }
+        cached = _entry(user, version, instances)
+        await request.session.aset(SESSION_KEY, cached)
+    return _resolved(cached, user)
+
+
+class LazyRoleRequest:
+    """Request attributes that resolve the role on first access."""
+
+    @property
+    def _resolved_role(self):
+        if '_role' not in self.__dict__:
+            self.__dict__['_role'] = resolve_role(self)
+        return self.__dict__['_role']
+
+    @property
+    def role(self):
+        return self._resolved_role[0]
+
+    @property
+    def parent(self):
+        return self._resolved_role[1]
+
+    @property
+    def hospital(self):
+        return self._resolved_role[2]
+
+
+_lazy_request_classes = {}
+
+
+def _lazy_request_class(request_class):
+    lazy_class = _lazy_request_classes.get(request_class)
+    if lazy_class is None:
+        lazy_class = type(request_class.__name__, (LazyRoleRequest, request_class), {})
+        _lazy_request_classes[request_class] = lazy_class
+    return lazy_class
+
+
+class RoleMiddleware:
+    """Expose request.role, request.parent and request.hospital; place after AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.__class__ = _lazy_request_class(type(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.user = await request.auser()
+        request.role, request.parent, request.hospital = await aresolve_role(request)
+        return await self.get_response(request)
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import invalidate_availability, invalidate_network_availability
+from .catalog import invalidate_catalog
+from .models import (
+    Appointment, AppointmentSlot, Child, Hospital, HospitalAppointmentCounter, Inventory, Parent, Vaccine,
+)
+from .fragments import invalidate_children
+from .roles import invalidate_role
+from .vaccination_schedule import rebuild_due_dates
+
+
+@receiver(post_save, sender=Appointment)
+def track_appointment_status(sender, instance, created, raw=False, **kwargs):
+    """Keep the hospital's status counters in step with every saved appointment."""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', 'unknown')
+    if previous == 'unknown':
+        # Previous status unknown (instance not loaded from the DB): recount
+        HospitalAppointmentCounter.rebuild([instance.hospital_id])
+    else:
+        HospitalAppointmentCounter.record_transition(instance.hospital_id, previous, instance.status)
+
+    # Completing (or un-completing) a dose moves the child's schedule
+    if instance.vaccine_id and 'Completed' in (previous, instance.status) and previous != instance.status:
+        rebuild_due_dates(child_ids=[instance.child_id], vaccine_ids=[instance.vaccine_id])
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Child)
+def schedule_child_vaccinations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rebuild_due_dates(child_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Child)
+@receiver(post_delete, sender=Child)
+def drop_cached_children(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_children(instance.parent_id)
+
+
+@receiver(post_delete, sender=Appointment)
+def untrack_appointment(sender, instance, **kwargs):
+    HospitalAppointmentCounter.record_transition(instance.hospital_id, instance.status, None, seed=False)
+    if instance.slot_key:
+        AppointmentSlot.release(*instance.slot_key)
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def drop_cached_availability(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_availability(instance.hospital_id)
+
+
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+@receiver(post_save, sender=Vaccine)
+@receiver(post_delete, sender=Vaccine)
+def drop_network_availability(sender, instance, raw=False, **kwargs):
+    # Approval and renames change what the network-wide documents contain
+    if not raw:
+        invalidate_network_availability()
+
+
+@receiver(post_save, sender=Vaccine)
+def drop_vaccine_availability(sender, instance, created, raw=False, **kwargs):
+    # Per-hospital documents carry vaccine names; deletes cascade through Inventory instead
+    if not raw and not created:
+        invalidate_availability(
+            *Inventory.objects.filter(vaccine_id=instance.pk).values_list('hospital_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+@receiver(post_save, sender=Vaccine)
+@receiver(post_delete, sender=Vaccine)
+def drop_cached_catalog(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_catalog()
+
+
+@receiver(post_save, sender=Parent)
+@receiver(post_delete, sender=Parent)
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+def drop_cached_role(sender, instance, raw=False, **kwargs):
+    # Sessions hold a copy of the profile; make them reload it
+    if not raw:
+        invalidate_role(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def drop_cached_user_fragments(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Dashboards show the username and email; a login only touches last_login
+    if not raw and set(update_fields or ()) != {'last_login'}:
+        invalidate_role(instance.pk)
@@ -0,0 +1,66 @@
+"""Free-slot search over the AppointmentSlot capacity table."""
+from datetime import datetime, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AppointmentSlot, HospitalSchedule
+
+SLOT_SEARCH_HORIZON_DAYS = 60
+SLOT_SEARCH_WINDOW_DAYS = 7
+
+
+def next_free_slots(hospital_id, start_date, count=5, horizon_days=SLOT_SEARCH_HORIZON_DAYS, schedule=None):
+    """Return up to ``count`` free ``(date, time)`` slots at a hospital from ``start_date``.
+
+    Only slots that are already full are read, a week at a time, with a
+    range query on the (hospital, date, time) index; everything else is
+    generated from the hospital's schedule. The cost depends on how far
+    away the first openings are, not on how many appointments exist.
+    """
+    schedule = schedule or HospitalSchedule.for_hospital(hospital_id)
+    slot_times = schedule.slot_times()
+    now = timezone.localtime()
+    day = max(start_date, now.date())
+    end_date = day + timedelta(days=horizon_days)
+
+    free = []
+    while day <= end_date and len(free) < count:
+        window_end = min(day + timedelta(days=SLOT_SEARCH_WINDOW_DAYS - 1), end_date)
+        full = set(
+            AppointmentSlot.objects.filter(
+                hospital_id=hospital_id,
+                date__range=(day, window_end),
+                booked__gte=F('capacity'),
+            ).values_list('date', 'time')
+        )
+        while day <= window_end and len(free) < count:
+            if schedule.is_open_on(day):
+                for moment in slot_times:
+                    if day == now.date() and moment <= now.time():
+                        continue
+                    if (day, moment) not in full:
+                        free.append((day, moment))
+                        if len(free) == count:
+                            break
+            day += timedelta(days=1)
+    return free
+
+
+def validate_slot(schedule, day, moment):
+    """Return an error message if ``day``/``moment`` is not a bookable slot start, else None.
+
+    Hospitals that never saved a schedule accept any date and time.
+    """
+    if not schedule.enforced:
+        return None
+    if not schedule.is_open_on(day):
+        return f"The hospital is closed on {day:%A}s."
+    if moment not in schedule.slot_times():
+        return (
+            f"Please choose a slot start between {schedule.opens_at:%H:%M} and "
+            f"{schedule.closes_at:%H:%M} in {schedule.slot_minutes}-minute steps."
+        )
+    if datetime.combine(day, moment) <= timezone.localtime().replace(tzinfo=None):
+        return "Please choose a time in the future."
+    return None
@@ -0,0 +1,210 @@
+"""Stock operations that have to stay exact under concurrent approvals.
+
+Every change is appended to the StockMovement ledger and applied to the
+materialized ``Inventory.stock_quantity`` balance in the same transaction.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .availability import invalidate_availability
+from .models import Appointment, HospitalAppointmentCounter, Inventory, StockMovement
+
+# Outcomes of approve_appointment()
+APPROVED = 'approved'
+OUT_OF_STOCK = 'out_of_stock'
+NOT_PENDING = 'not_pending'
+NO_VACCINE = 'no_vaccine'
+
+
+def record_movements(movements):
+    """Append ``movements`` in bulk and apply them to their Inventory balances.
+
+    Balances are moved with one ``F()`` UPDATE per inventory row, so the
+    only rows locked are the balances being changed.
+    """
+    movements = list(movements)
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.inventory_id] += movement.quantity
+
+    now = timezone.now()
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements)
+        for inventory_id, delta in deltas.items():
+            if delta:
+                Inventory.objects.filter(pk=inventory_id).update(
+                    stock_quantity=F('stock_quantity') + delta, last_updated=now
+                )
+        invalidate_availability(
+            *Inventory.objects.filter(pk__in=deltas).values_list('hospital_id', flat=True).distinct()
+        )
+    return movements
+
+
+def set_stock_level(inventory, new_quantity, note=''):
+    """Record whatever movement brings ``inventory`` to ``new_quantity``.
+
+    Increases are booked as a restock and decreases as a correction.
+    Returns the movement, or None if the level was already correct.
+    """
+    with transaction.atomic():
+        # Touch the balance first so the row is write-locked before we read it
+        Inventory.objects.filter(pk=inventory.pk).update(last_updated=timezone.now())
+        current = Inventory.objects.values_list('stock_quantity', flat=True).get(pk=inventory.pk)
+        delta = new_quantity - current
+        movement = None
+        if delta:
+            movement = StockMovement(
+                inventory_id=inventory.pk,
+                kind=StockMovement.RESTOCK if delta > 0 else StockMovement.CORRECTION,
+                quantity=delta,
+                note=note,
+            )
+            record_movements([movement])
+
+    inventory.stock_quantity = new_quantity
+    return movement
+
+
+def approve_appointment(appointment):
+    """Approve a pending appointment and issue one dose from the hospital's stock.
+
+    The status change and the stock decrement happen in one transaction, and
+    both are conditional UPDATEs, so concurrent approvals can neither
+    oversell a vaccine nor approve the same appointment twice. Returns one
+    of the outcome constants above.
+    """
+    if appointment.vaccine_id is None:
+        return NO_VACCINE
+
+    inventory_id = Inventory.objects.filter(
+        hospital_id=appointment.hospital_id, vaccine_id=appointment.vaccine_id
+    ).values_list('id', flat=True).first()
+    if inventory_id is None:
+        return OUT_OF_STOCK
+
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = Appointment.objects.filter(pk=appointment.pk, status='Pending').update(
+            status='Approved', updated_at=now
+        )
+        if not claimed:
+            return NOT_PENDING
+
+        issued = Inventory.objects.filter(pk=inventory_id, stock_quantity__gt=0).update(
+            stock_quantity=F('stock_quantity') - 1, last_updated=now
+        )
+        if not issued:
+            transaction.set_rollback(True)
+            return OUT_OF_STOCK
+
+        # Balance already moved by the conditional UPDATE; only append the entry
+        StockMovement.objects.create(
+            inventory_id=inventory_id,
+            kind=StockMovement.DOSE_ISSUED,
+            quantity=-1,
+            appointment_id=appointment.pk,
+            created_at=now,
+        )
+        HospitalAppointmentCounter.record_transition(appointment.hospital_id, 'Pending', 'Approved')
+        invalidate_availability(appointment.hospital_id)
+
+    appointment.status = 'Approved'
+    appointment._loaded_status = 'Approved'
+    return APPROVED
+
+
+def approve_appointments(hospital_id, appointment_ids):
+    """Approve many pending appointments of one hospital in a single transaction.
+
+    Appointments are grouped by vaccine and each group draws on its stock
+    once, earliest appointment first, so a short vaccine approves as many
+    as it can. Statuses change with one ``UPDATE ... WHERE id IN``. Returns
+    ``{appointment_id: outcome}`` with one of the outcome constants above
+    for every requested id; ids that are not pending at this hospital (or
+    do not exist) are reported as NOT_PENDING.
+    """
+    appointment_ids = set(appointment_ids)
+    results = dict.fromkeys(appointment_ids, NOT_PENDING)
+    if not appointment_ids:
+        return results
+
+    now = timezone.now()
+    with transaction.atomic():
+        pending = list(
+            Appointment.objects.select_for_update()
+            .filter(hospital_id=hospital_id, pk__in=appointment_ids, status='Pending')
+            .order_by('date', 'time', 'id')
+            .values_list('id', 'vaccine_id')
+        )
+        by_vaccine = defaultdict(list)
+        for appointment_id, vaccine_id in pending:
+            if vaccine_id is None:
+                results[appointment_id] = NO_VACCINE
+            else:
+                by_vaccine[vaccine_id].append(appointment_id)
+
+        # Touch the balances first so their rows are write-locked before we read them
+        inventories = Inventory.objects.filter(hospital_id=hospital_id, vaccine_id__in=by_vaccine)
+        inventories.update(last_updated=now)
+        stock = {
+            vaccine_id: (inventory_id, quantity)
+            for inventory_id, vaccine_id, quantity in inventories.values_list('id', 'vaccine_id', 'stock_quantity')
+        }
+
+        approved = []
+        movements = []
+        for vaccine_id, group in by_vaccine.items():
+            inventory_id, quantity = stock.get(vaccine_id, (None, 0))
+            issue = group[:max(quantity, 0)]
+            if issue and not Inventory.objects.filter(pk=inventory_id, stock_quantity__gte=len(issue)).update(
+                stock_quantity=F('stock_quantity') - len(issue), last_updated=now
+            ):
+                issue = []
+            for appointment_id in group:
+                results[appointment_id] = OUT_OF_STOCK
+            for appointment_id in issue:
+                results[appointment_id] = APPROVED
+                movements.append(StockMovement(
+                    inventory_id=inventory_id, kind=StockMovement.DOSE_ISSUED, quantity=-1,
+                    appointment_id=appointment_id, created_at=now,
+                ))
+            approved.extend(issue)
+
+        if approved:
+            Appointment.objects.filter(pk__in=approved).update(status='Approved', updated_at=now)
+            # Balances already moved by the conditional UPDATEs; only append the entries
+            StockMovement.objects.bulk_create(movements)
+            HospitalAppointmentCounter.record_transition(hospital_id, 'Pending', 'Approved', count=len(approved))
+            invalidate_availability(hospital_id)
+    return results
+
+
+def rebuild_balances():
+    """Recompute every Inventory balance from the ledger with one grouped aggregate.
+
+    Returns the number of balances that had drifted and were corrected.
+    """
+    ledger = dict(
+        StockMovement.objects.values('inventory_id')
+        .annotate(balance=Sum('quantity'))
+        .order_by()
+        .values_list('inventory_id', 'balance')
+    )
+    drifted = []
+    now = timezone.now()
+    for inventory in Inventory.objects.only('id', 'hospital', 'stock_quantity'):
+        balance = ledger.get(inventory.id, 0)
+        if inventory.stock_quantity != balance:
+            # bulk_update skips auto_now, so the repair stamps last_updated itself
+            inventory.stock_quantity = balance
+            inventory.last_updated = now
+            drifted.append(inventory)
+
+    with transaction.atomic():
+        Inventory.objects.bulk_update(drifted, ['stock_quantity', 'last_updated'], batch_size=500)
+        invalidate_availability(*{inventory.hospital_id for inventory in drifted})
+    return len(drifted)
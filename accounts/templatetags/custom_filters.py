@@ -1,13 +1,18 @@
 from django import template
 
+from accounts.grouping import GroupedAppointments
+
 register = template.Library()
 
 @register.filter
 def filter_by_status(appointments, status):
     """
     Returns items whose .status equals the given status.
-    Works with QuerySets or lists.
+    Works with QuerySets or lists; GroupedAppointments answer from their
+    status buckets without rescanning.
     """
+    if isinstance(appointments, GroupedAppointments):
+        return appointments.with_status(status)
     if not appointments:
         return []
     try:
@@ -1,3 +1,1829 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+import zipfile
+from collections import Counter
+from datetime import date, time, timedelta
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.cache import cache
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.core.exceptions import ValidationError
+from django.db.models import F, Sum
+from django.forms.models import model_to_dict
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from child_vaccination.sqlite_profile import DEFAULT_PRAGMAS, pragmas, production_database
+
+from . import exports, roles, slots, stock, urls
+from .admin import HospitalAdmin
+from .age_ranges import parse_age, parse_recommended_age
+from .catalog import get_catalog, invalidate_catalog
+from .management.commands import benchmark_sqlite_writes, loadtest
+from .forms import AppointmentAdminForm, AppointmentForm
+from .grouping import GroupedAppointments
+from .models import (
+    Appointment, AppointmentReminder, AppointmentSlot, CatalogVersion, Child, Hospital, HospitalAppointmentCounter,
+    HospitalSchedule, Inventory, Parent, ProfileVersion, StockMovement, Vaccine, VaccinationDue,
+)
+from .metrics import RequestMetrics, registry
+from .templatetags.custom_filters import filter_by_status
+from .views import APPOINTMENTS_PAGE_SIZE
+from .vaccination_schedule import DUE_GRACE_DAYS, rebuild_due_dates
+
+
+def make_parent(username="parent"):
+    user = User.objects.create_user(username, f"{username}@example.com", "pass12345")
+    return Parent.objects.create(user=user, phone_number="555", address="1 Main St")
+
+
+def make_hospital(username="hospital", approved=True):
+    user = User.objects.create_user(username, f"{username}@example.com", "pass12345")
+    return Hospital.objects.create(
+        user=user, name=f"{username.title()} Hospital", address="2 Main St",
+        phone=f"555-{username}", email=f"{username}@example.com", approved=approved,
+    )
+
+
+def make_child(parent, name="Asha"):
+    return Child.objects.create(
+        parent=parent, name=name, date_of_birth=date(2024, 1, 1), gender="Female"
+    )
+
+
+def make_appointment(parent, child, hospital, vaccine, status="Pending", days=1, hour=10):
+    return Appointment.objects.create(
+        parent=parent, child=child, hospital=hospital, vaccine=vaccine,
+        date=date.today() + timedelta(days=days), time=time(hour), status=status,
+    )
+
+
+class AppointmentCounterTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+
+    def counts(self, hospital=None):
+        return HospitalAppointmentCounter.counts_for((hospital or self.hospital).id)
+
+    def fresh_counts(self, hospital=None):
+        return HospitalAppointmentCounter.aggregate_counts((hospital or self.hospital).id)
+
+    def test_create_change_and_delete_move_the_buckets(self):
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        self.assertEqual(self.counts()["pending"], 1)
+
+        appointment.status = "Approved"
+        appointment.save()
+        counter = HospitalAppointmentCounter.objects.get(hospital=self.hospital)
+        self.assertEqual((counter.pending, counter.approved), (0, 1))
+
+        appointment.delete()
+        self.assertEqual(self.counts(), self.fresh_counts())
+        self.assertEqual(self.counts()["total"], 0)
+
+    def test_missing_row_is_seeded_from_the_table(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Completed", days=-3)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        HospitalAppointmentCounter.objects.all().delete()
+        # Without a row the dashboard falls back to the aggregate
+        self.assertEqual(self.counts(), self.fresh_counts())
+
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, hour=11)
+        counter = HospitalAppointmentCounter.objects.get(hospital=self.hospital)
+        self.assertEqual((counter.pending, counter.completed, counter.total), (2, 1, 3))
+
+    def test_instance_without_a_loaded_status_is_recounted(self):
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        stale = Appointment(pk=appointment.pk, parent=self.parent, child=self.child, hospital=self.hospital,
+                            vaccine=self.vaccine, date=appointment.date, time=appointment.time, status="Cancelled")
+        stale.save()
+        self.assertEqual(self.counts(), self.fresh_counts())
+
+    def test_counters_match_an_aggregate_after_random_transitions(self):
+        rng = random.Random(7)
+        other = make_hospital("other")
+        hospitals = [self.hospital, other]
+        statuses = [status for status, _ in Appointment.STATUS_CHOICES]
+        appointments = []
+        for step in range(120):
+            action = rng.random()
+            if action < 0.35 or not appointments:
+                appointments.append(make_appointment(
+                    self.parent, self.child, rng.choice(hospitals), self.vaccine,
+                    status=rng.choice(statuses), days=len(appointments) + 1, hour=9 + step % 8,
+                ))
+            elif action < 0.85:
+                appointment = rng.choice(appointments)
+                appointment.status = rng.choice(statuses)
+                appointment.save()
+            else:
+                appointments.pop(rng.randrange(len(appointments))).delete()
+
+        for hospital in hospitals:
+            self.assertEqual(self.counts(hospital), self.fresh_counts(hospital))
+
+    def test_rebuild_command_repairs_drift(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Cancelled", hour=11)
+        HospitalAppointmentCounter.objects.filter(hospital=self.hospital).update(pending=40, cancelled=-2)
+
+        out = io.StringIO()
+        call_command("rebuild_appointment_counters", "--hospital", str(self.hospital.id), stdout=out)
+        self.assertIn("1 hospital(s)", out.getvalue())
+        self.assertEqual(self.counts(), self.fresh_counts())
+        self.assertEqual((self.counts()["pending"], self.counts()["cancelled"]), (1, 1))
+
+
+class HospitalBoardTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine, stock_quantity=8)
+        self.client.force_login(self.hospital.user)
+
+    def board(self, url=None, **params):
+        return self.client.get(url or reverse("accounts:hospital_appointments"), params)
+
+    @mock.patch("accounts.views.BOARD_PAGE_SIZE", 2)
+    def test_tabs_page_in_slot_order_without_repeats(self):
+        pending = [make_appointment(self.parent, self.child, self.hospital, self.vaccine, days=5 - i) for i in range(5)]
+        expected = sorted(pending, key=lambda a: (a.date, a.time, a.id))
+
+        seen, response = [], self.board()
+        while True:
+            seen.extend(response.context["pending_appointments"])
+            next_url = response.context["pending_next_url"]
+            if not next_url:
+                break
+            response = self.board(reverse("accounts:hospital_appointments") + next_url)
+        self.assertEqual([a.id for a in seen], [a.id for a in expected])
+        self.assertEqual(response.context["pending_count"], 5)
+
+    def test_window_limits_rows_and_counts(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, days=2)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Approved", days=3)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, days=30)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Completed", days=-5)
+
+        response = self.board()
+        self.assertEqual(
+            [response.context[f"{tab}_count"] for tab in ("pending", "confirmed", "completed", "cancelled")],
+            [1, 1, 0, 0],
+        )
+        later = self.board(start=(date.today() + timedelta(days=20)).isoformat(),
+                           end=(date.today() + timedelta(days=40)).isoformat())
+        self.assertEqual(len(later.context["pending_appointments"]), 1)
+        self.assertEqual(later.context["confirmed_count"], 0)
+
+    def test_pending_rows_carry_stock_and_bad_input_falls_back(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        response = self.board(start="not-a-date", pending_after="garbage")
+        self.assertEqual(response.context["window_start"], date.today())
+        [row] = response.context["pending_appointments"]
+        self.assertEqual(row.stock_quantity, 8)
+        self.assertContains(response, "(Stock: 8)")
+
+
+class ConfirmAppointmentTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        self.inventory = Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine, stock_quantity=1)
+        self.client.force_login(self.hospital.user)
+
+    def confirm(self, appointment):
+        return self.client.post(reverse("accounts:hospital_confirm_appointment", args=[appointment.id]))
+
+    def test_approval_issues_one_dose(self):
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        self.confirm(appointment)
+        appointment.refresh_from_db()
+        self.inventory.refresh_from_db()
+        self.assertEqual(appointment.status, "Approved")
+        self.assertEqual(self.inventory.stock_quantity, 0)
+
+    def test_out_of_stock_leaves_appointment_pending(self):
+        first = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        second = make_appointment(self.parent, self.child, self.hospital, self.vaccine, hour=11)
+        self.confirm(first)
+        response = self.confirm(second)
+        second.refresh_from_db()
+        self.inventory.refresh_from_db()
+        self.assertEqual(second.status, "Pending")
+        self.assertEqual(self.inventory.stock_quantity, 0)
+        self.assertIn("OUT OF STOCK", str(list(response.wsgi_request._messages)))
+
+    def test_repeat_approval_does_not_issue_twice(self):
+        self.inventory.stock_quantity = 5
+        self.inventory.save()
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        self.confirm(appointment)
+        self.confirm(appointment)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 4)
+
+    def test_bulk_approval_draws_each_vaccine_once_and_reports_every_appointment(self):
+        self.inventory.stock_quantity = 2
+        self.inventory.save()
+        other = Vaccine.objects.create(name="OPV")
+        Inventory.objects.create(hospital=self.hospital, vaccine=other, stock_quantity=0)
+        bcg = [make_appointment(self.parent, self.child, self.hospital, self.vaccine, hour=9 + i) for i in range(3)]
+        opv = make_appointment(self.parent, self.child, self.hospital, other)
+        approved_already = make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Approved", days=2)
+        ids = [a.id for a in bcg] + [opv.id, approved_already.id, 999999]
+
+        results = stock.approve_appointments(self.hospital.id, ids)
+        self.assertEqual(results, {
+            bcg[0].id: stock.APPROVED, bcg[1].id: stock.APPROVED, bcg[2].id: stock.OUT_OF_STOCK,
+            opv.id: stock.OUT_OF_STOCK, approved_already.id: stock.NOT_PENDING, 999999: stock.NOT_PENDING,
+        })
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 0)
+        self.assertEqual(
+            set(StockMovement.objects.filter(kind=StockMovement.DOSE_ISSUED).values_list("appointment_id", flat=True)),
+            {bcg[0].id, bcg[1].id},
+        )
+        self.assertEqual(HospitalAppointmentCounter.objects.get(hospital=self.hospital).approved, 3)
+
+    def test_bulk_approve_view_reports_per_appointment(self):
+        first = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        second = make_appointment(self.parent, self.child, self.hospital, self.vaccine, hour=11)
+        response = self.client.post(
+            reverse("accounts:hospital_bulk_approve_appointments"), {"appointment_ids": [first.id, second.id]}
+        )
+        self.assertRedirects(response, reverse("accounts:hospital_appointments"))
+        texts = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(texts, ["Approved 1 appointment(s): Asha (BCG).", "Not approved, out of stock: Asha (BCG)."])
+        self.assertEqual(Appointment.objects.get(pk=first.pk).status, "Approved")
+        self.assertEqual(Appointment.objects.get(pk=second.pk).status, "Pending")
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="Hep B")
+        self.inventory = Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine)
+        self.client.force_login(self.hospital.user)
+
+    def test_stock_changes_are_booked_in_the_ledger(self):
+        url = reverse("accounts:update_inventory_stock", args=[self.inventory.id])
+        self.client.post(url, {"stock_quantity": 10})
+        self.client.post(url, {"stock_quantity": 7})
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        stock.approve_appointment(appointment)
+
+        kinds = list(StockMovement.objects.order_by("id").values_list("kind", "quantity"))
+        self.assertEqual(kinds, [
+            (StockMovement.RESTOCK, 10),
+            (StockMovement.CORRECTION, -3),
+            (StockMovement.DOSE_ISSUED, -1),
+        ])
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 6)
+
+    def test_rebuild_restores_drifted_balance(self):
+        stock.set_stock_level(self.inventory, 12)
+        stale = timezone.now() - timedelta(days=3)
+        Inventory.objects.filter(pk=self.inventory.pk).update(stock_quantity=99, last_updated=stale)
+        self.assertEqual(stock.rebuild_balances(), 1)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 12)
+        self.assertGreater(self.inventory.last_updated, stale + timedelta(days=2))
+
+
+class AvailabilityApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        self.inventory = Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine, stock_quantity=5)
+        self.url = reverse("accounts:get_available_vaccines_api", args=[self.hospital.id])
+
+    def names(self, response):
+        return [vaccine["name"] for vaccine in response.json()["vaccines"]]
+
+    def test_conditional_gets_are_answered_with_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.names(response), ["BCG"])
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        with self.assertNumQueries(0):
+            unchanged = self.client.get(self.url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b"")
+        since = self.client.get(self.url, headers={"if-modified-since": response["Last-Modified"]})
+        self.assertEqual(since.status_code, 304)
+        self.assertEqual(self.client.get(reverse("accounts:get_available_vaccines_api", args=[0])).status_code, 404)
+
+    def test_signed_in_booking_page_refresh_costs_no_queries(self):
+        parent = make_parent()
+        make_child(parent)
+        self.client.force_login(parent.user)
+        self.assertEqual(self.client.get(reverse("accounts:book_appointment")).status_code, 200)
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            unchanged = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(unchanged.status_code, 304)
+
+    def test_stock_change_invalidates_the_document(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.set_stock_level(self.inventory, 0)
+
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), [])
+
+    def test_vaccine_rename_invalidates_the_document(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vaccine.name = "BCG (live)"
+            self.vaccine.save()
+
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ["BCG (live)"])
+
+
+class BulkAvailabilityApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.north = make_hospital("north")
+        self.south = make_hospital("south")
+        hidden = make_hospital("hidden", approved=False)
+        self.bcg = Vaccine.objects.create(name="BCG")
+        self.opv = Vaccine.objects.create(name="OPV")
+        self.north_bcg = Inventory.objects.create(hospital=self.north, vaccine=self.bcg, stock_quantity=3)
+        Inventory.objects.create(hospital=self.north, vaccine=self.opv, stock_quantity=0)
+        Inventory.objects.create(hospital=self.south, vaccine=self.bcg, stock_quantity=1)
+        Inventory.objects.create(hospital=self.south, vaccine=self.opv, stock_quantity=2)
+        Inventory.objects.create(hospital=hidden, vaccine=self.bcg, stock_quantity=9)
+        self.url = reverse("accounts:bulk_available_vaccines_api")
+
+    def test_nested_layout_lists_in_stock_vaccines_of_approved_hospitals(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {"hospitals": [
+            {"id": self.north.id, "name": "North Hospital", "vaccines": [{"id": self.bcg.id, "name": "BCG"}]},
+            {"id": self.south.id, "name": "South Hospital", "vaccines": [
+                {"id": self.bcg.id, "name": "BCG"}, {"id": self.opv.id, "name": "OPV"},
+            ]},
+        ]})
+
+    def test_columnar_layout_refers_to_hospitals_and_vaccines_by_position(self):
+        data = self.client.get(self.url, {"layout": "columnar"}).json()
+        self.assertEqual(data["hospitals"], {"id": [self.north.id, self.south.id],
+                                             "name": ["North Hospital", "South Hospital"]})
+        self.assertEqual(data["vaccines"], {"id": [self.bcg.id, self.opv.id], "name": ["BCG", "OPV"]})
+        pairs = list(zip(data["pairs"]["hospital"], data["pairs"]["vaccine"]))
+        self.assertEqual(pairs, [(0, 0), (1, 0), (1, 1)])
+
+    def test_filters_and_bad_parameters(self):
+        response = self.client.get(self.url, {"hospital": f"{self.south.id}", "vaccine": self.opv.id})
+        self.assertEqual([h["id"] for h in response.json()["hospitals"]], [self.south.id])
+        self.assertEqual(response.json()["hospitals"][0]["vaccines"], [{"id": self.opv.id, "name": "OPV"}])
+        both = self.client.get(self.url, {"hospital": f"{self.north.id},{self.south.id}"})
+        self.assertEqual(len(both.json()["hospitals"]), 2)
+
+        self.assertEqual(self.client.get(self.url, {"hospital": "x"}).status_code, 400)
+        too_many = ",".join(str(i) for i in range(1, 202))
+        self.assertEqual(self.client.get(self.url, {"hospital": too_many}).status_code, 400)
+
+    def test_etag_answers_304_until_stock_changes(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, headers={"if-none-match": etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.set_stock_level(self.north_bcg, 0)
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([h["id"] for h in response.json()["hospitals"]], [self.south.id])
+
+
+class SlotCapacityTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        HospitalSchedule.objects.create(hospital=self.hospital, doses_per_slot=2)
+        # A Monday at least a week out, inside the default 09:00-17:00 hours
+        self.day = date.today() + timedelta(days=7 + (-date.today().weekday()) % 7)
+        self.moment = time(10)
+
+    def book(self, status="Pending", moment=None):
+        return Appointment.objects.create(
+            parent=self.parent, child=self.child, hospital=self.hospital, vaccine=self.vaccine,
+            date=self.day, time=moment or self.moment, status=status,
+        )
+
+    def booked(self):
+        return AppointmentSlot.objects.get(hospital=self.hospital, date=self.day, time=self.moment).booked
+
+    def fill_slot_around_a_cancellation(self):
+        cancelled = self.book()
+        cancelled.status = "Cancelled"
+        cancelled.save()
+        self.book()
+        self.book()
+        return cancelled
+
+    def test_capacity_is_enforced(self):
+        self.book()
+        self.book(status="Approved")
+        with self.assertRaises(ValidationError) as caught:
+            self.book()
+        self.assertEqual(caught.exception.code, "slot_full")
+        self.assertEqual(self.booked(), 2)
+        # Finished visits hold no slot
+        self.book(status="Completed")
+        self.assertEqual(Appointment.objects.filter(date=self.day).count(), 3)
+
+    def test_cancelling_and_deleting_release_the_slot(self):
+        first, second = self.book(), self.book()
+        first.status = "Cancelled"
+        first.save()
+        self.assertEqual(self.booked(), 1)
+        second.delete()
+        self.assertEqual(self.booked(), 0)
+        # Moving a booking to another time moves its reservation
+        first.status = "Pending"
+        first.time = time(11)
+        first.save()
+        self.assertEqual(self.booked(), 0)
+        self.assertEqual(AppointmentSlot.objects.get(time=time(11)).booked, 1)
+
+    def test_reopening_into_a_full_slot_is_refused_by_the_hospital_view(self):
+        cancelled = self.fill_slot_around_a_cancellation()
+        self.client.force_login(self.hospital.user)
+        response = self.client.post(
+            reverse("accounts:update_appointment_status", args=[cancelled.id]), {"status": "Pending"}
+        )
+        self.assertRedirects(response, reverse("accounts:hospital_appointments"), fetch_redirect_response=False)
+        [message] = [str(message) for message in response.wsgi_request._messages]
+        self.assertIn("fully booked", message)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, "Cancelled")
+        self.assertEqual(self.booked(), 2)
+
+    def test_reopening_into_a_full_slot_is_refused_by_the_admin_form(self):
+        cancelled = self.fill_slot_around_a_cancellation()
+        data = {**model_to_dict(cancelled), "status": "Approved"}
+        form = AppointmentAdminForm(data=data, instance=cancelled)
+        self.assertFalse(form.is_valid())
+        self.assertIn("fully booked", form.errors["time"][0])
+        # Edits that keep the slot it already holds are fine
+        held = Appointment.objects.filter(status="Pending").first()
+        self.assertTrue(AppointmentAdminForm(data={**model_to_dict(held), "notes": "x"}, instance=held).is_valid())
+
+    def test_next_free_slots_skip_full_slots_and_closed_days(self):
+        self.book()
+        self.book()
+        schedule = HospitalSchedule.for_hospital(self.hospital.id)
+        free = slots.next_free_slots(self.hospital.id, self.day, count=3, schedule=schedule)
+        self.assertEqual(free, [(self.day, time(9)), (self.day, time(9, 15)), (self.day, time(9, 30))])
+
+        late = slots.next_free_slots(self.hospital.id, self.day, count=40)
+        self.assertNotIn((self.day, self.moment), late)
+        self.assertEqual(late[-1][0], self.day + timedelta(days=1))
+        sunday = self.day + timedelta(days=6)
+        self.assertEqual(slots.next_free_slots(self.hospital.id, sunday, count=1)[0][0], sunday + timedelta(days=1))
+
+    def test_validate_slot_explains_what_is_wrong(self):
+        schedule = HospitalSchedule.for_hospital(self.hospital.id)
+        self.assertIsNone(slots.validate_slot(schedule, self.day, self.moment))
+        self.assertIn("closed on Sundays", slots.validate_slot(schedule, self.day - timedelta(days=1), self.moment))
+        self.assertIn("15-minute steps", slots.validate_slot(schedule, self.day, time(10, 5)))
+        self.assertIn("15-minute steps", slots.validate_slot(schedule, self.day, time(17)))
+        self.assertIn("in the future", slots.validate_slot(schedule, self.day - timedelta(days=14), self.moment))
+
+    def test_hospitals_without_a_schedule_take_any_booking(self):
+        HospitalSchedule.objects.filter(hospital=self.hospital).delete()
+        Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine, stock_quantity=5)
+        sunday_evening = {"date": self.day - timedelta(days=1), "time": time(19, 5)}
+        form = AppointmentForm(data={"child": self.child.id, "hospital": self.hospital.id,
+                                     "vaccine": self.vaccine.id, **sunday_evening}, parent=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        for _ in range(5):
+            self.book()
+        self.assertEqual(self.booked(), 5)
+
+        # Setting hours later caps future slots, but never below what is booked
+        HospitalSchedule.objects.create(hospital=self.hospital, doses_per_slot=2)
+        self.assertEqual(AppointmentSlot.objects.get(time=self.moment).capacity, 5)
+        self.assertFalse(AppointmentForm(data={"child": self.child.id, "hospital": self.hospital.id,
+                                               "vaccine": self.vaccine.id, **sunday_evening},
+                                         parent=self.parent).is_valid())
+
+    def test_data_migration_lifts_the_default_capacity_of_unscheduled_hospitals(self):
+        scheduled = self.book()
+        other = make_hospital("unscheduled")
+        AppointmentSlot.objects.create(hospital=other, date=self.day, time=self.moment, capacity=4, booked=4)
+        migration = importlib.import_module("accounts.migrations.0022_unlimited_slots_without_schedule")
+        migration.lift_default_capacity(django_apps, None)
+        capacities = dict(AppointmentSlot.objects.values_list("hospital_id", "capacity"))
+        self.assertEqual(capacities, {scheduled.hospital_id: 2, other.id: AppointmentSlot.UNLIMITED})
+
+
+class AgeRangeTests(SimpleTestCase):
+    def test_single_ages_and_ranges(self):
+        self.assertEqual(parse_age("birth"), (0, 0))
+        self.assertEqual(parse_age("At Birth"), (0, 0))
+        self.assertEqual(parse_age("6 weeks"), (42, 42))
+        self.assertEqual(parse_age("9-12 months"), (270, 360))
+        self.assertEqual(parse_age("5-6 years"), (1825, 2190))
+        self.assertEqual(parse_age("18 months to 2 years"), (540, 730))
+        self.assertEqual(parse_age("10 wks"), (70, 70))
+
+    def test_unreadable_ages(self):
+        for text in ("soon", "6", "12-9 months", "3 fortnights", ""):
+            with self.subTest(text):
+                self.assertIsNone(parse_age(text))
+
+    def test_series(self):
+        self.assertEqual(parse_recommended_age("birth, 6 weeks"), [(0, 0), (42, 42)])
+        self.assertEqual(parse_recommended_age("9-12 months; 5-6 years"), [(270, 360), (1825, 2190)])
+        self.assertEqual(parse_recommended_age("6 weeks and 10 weeks"), [(42, 42), (70, 70)])
+        self.assertEqual(parse_recommended_age("6 weeks, whenever"), [])
+        self.assertEqual(parse_recommended_age(None), [])
+
+
+class VaccinationScheduleTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.hospital = make_hospital()
+        self.series = Vaccine.objects.create(name="OPV", recommended_age="birth, 6 weeks")
+        self.window = Vaccine.objects.create(name="MMR", recommended_age="9-12 months")
+        self.child = make_child(self.parent)
+        self.born = self.child.date_of_birth
+
+    def due(self, vaccine, dose_number=1):
+        return VaccinationDue.objects.get(child=self.child, vaccine=vaccine, dose_number=dose_number)
+
+    def test_due_windows_follow_the_dose_series(self):
+        self.assertEqual(VaccinationDue.objects.filter(child=self.child).count(), 3)
+        second = self.due(self.series, 2)
+        self.assertEqual(second.due_date, self.born + timedelta(days=42))
+        # A single recommended age stays due for the grace period
+        self.assertEqual(second.overdue_after, self.born + timedelta(days=42 + DUE_GRACE_DAYS))
+        mmr = self.due(self.window)
+        self.assertEqual((mmr.due_date, mmr.overdue_after), (self.born + timedelta(days=270), self.born + timedelta(days=360)))
+
+    def test_completed_appointments_close_doses_in_order(self):
+        first = make_appointment(self.parent, self.child, self.hospital, self.series, status="Completed", days=-10)
+        make_appointment(self.parent, self.child, self.hospital, self.series, status="Completed", days=-3)
+        self.assertEqual(self.due(self.series, 1).completed_on, first.date)
+        self.assertEqual(self.due(self.series, 2).completed_on, date.today() - timedelta(days=3))
+
+        first.status = "Cancelled"
+        first.save()
+        self.assertEqual(self.due(self.series, 1).completed_on, date.today() - timedelta(days=3))
+        self.assertIsNone(self.due(self.series, 2).completed_on)
+
+    def test_due_overdue_and_upcoming_queries(self):
+        today = self.born + timedelta(days=300)
+        self.assertEqual(list(VaccinationDue.objects.overdue(today).values_list("vaccine__name", "dose_number")),
+                         [("OPV", 1), ("OPV", 2)])
+        self.assertEqual(list(VaccinationDue.objects.due(today).values_list("vaccine__name", flat=True)), ["MMR"])
+        self.assertFalse(VaccinationDue.objects.upcoming(today).exists())
+        self.assertEqual(VaccinationDue.objects.upcoming(self.born + timedelta(days=20)).count(), 1)
+
+    def test_schedule_changes_rebuild_the_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.window.recommended_age = "12 months, 5-6 years"
+            self.window.save()
+        self.assertEqual(self.due(self.window, 2).due_date, self.born + timedelta(days=1825))
+        # Unreadable text keeps the doses already on file
+        self.window.recommended_age = "ask your doctor"
+        self.window.save()
+        self.assertEqual(self.window.doses.count(), 2)
+
+    def test_chunked_rebuild_costs_queries_per_chunk_not_per_child(self):
+        for day in range(5):
+            make_child(self.parent, name=f"Twin {day}")
+        VaccinationDue.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rebuild_due_dates(chunk_size=2), 6 * 3)
+        # Per chunk of two children: its bounds, a savepoint pair, one DELETE and one INSERT ... SELECT
+        self.assertEqual(len([q for q in queries if q["sql"].lstrip().startswith("INSERT")]), 3)
+        self.assertEqual(len(queries), 1 + 3 * 6)
+        self.assertEqual(VaccinationDue.objects.filter(dose_number=2).count(), 6)
+        self.assertEqual(rebuild_due_dates(child_ids=[self.child.id], vaccine_ids=[self.window.id]), 1)
+        self.assertEqual(VaccinationDue.objects.count(), 6 * 3)
+
+    def test_data_migration_fills_the_same_rows(self):
+        migration = importlib.import_module("accounts.migrations.0020_fill_vaccination_due")
+        make_appointment(self.parent, self.child, self.hospital, self.series, status="Completed", days=-3)
+        expected = set(VaccinationDue.objects.values_list(
+            "child_id", "vaccine_id", "dose_number", "due_date", "overdue_after", "completed_on"
+        ))
+        VaccinationDue.objects.all().delete()
+        migration.fill_due_dates(django_apps, None)
+        self.assertEqual(set(VaccinationDue.objects.values_list(
+            "child_id", "vaccine_id", "dose_number", "due_date", "overdue_after", "completed_on"
+        )), expected)
+
+
+class AppointmentReminderTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent, name="Zoë O'Neil")
+        self.hospital = make_hospital()
+        self.hospital.name = "D'Souza & Co"
+        self.hospital.save()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+
+    def remind(self, *args):
+        out = io.StringIO()
+        call_command("send_appointment_reminders", "--backend", "locmem", *args, stdout=out)
+        return out.getvalue()
+
+    def test_plain_text_body_is_not_html_escaped(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        self.remind()
+        [message] = mail.outbox
+        self.assertEqual(message.to, ["parent@example.com"])
+        self.assertIn("Zoë O'Neil has a vaccination appointment at D'Souza & Co", message.body)
+        self.assertIn("Vaccine: BCG", message.body)
+        self.assertNotIn("&amp;", message.body)
+        self.assertNotIn("&#x27;", message.body)
+
+    def test_a_second_run_sends_nothing_new(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Cancelled", hour=11)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, days=5)
+        self.assertIn("Sent 1 reminder(s)", self.remind())
+        self.assertIn("Sent 0 reminder(s)", self.remind())
+        self.assertEqual(len(mail.outbox), 1)
+
+        # A wider window only picks up the appointment not yet reminded
+        self.assertIn("Sent 1 reminder(s)", self.remind("--days-ahead", "7"))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_rescheduled_appointment_is_reminded_again(self):
+        appointment = make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        self.remind()
+        appointment.date += timedelta(days=1)
+        appointment.save()
+        self.assertIn("Sent 1 reminder(s)", self.remind("--days-ahead", "2"))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_a_failed_send_is_resumed_without_duplicates(self):
+        for hour in (9, 10, 11):
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, hour=hour)
+        deliver = LocmemEmailBackend.send_messages
+        calls = []
+
+        def flaky(backend, messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise OSError("connection reset")
+            return deliver(backend, messages)
+
+        with mock.patch.object(LocmemEmailBackend, "send_messages", autospec=True, side_effect=flaky):
+            with self.assertRaises(OSError):
+                self.remind()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(AppointmentReminder.objects.count(), 1)
+
+        self.assertIn("Sent 2 reminder(s)", self.remind())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len({message.body for message in mail.outbox}), 3)
+
+
+class GenerateDataTests(TestCase):
+    def generate(self, prefix="gen", *args):
+        call_command(
+            "generate_data", "--parents", "20", "--hospitals", "4", "--appointments", "400",
+            "--batch-size", "64", "--prefix", prefix, *args, stdout=io.StringIO(),
+        )
+        return Appointment.objects.filter(parent__user__username__startswith=f"{prefix}-")
+
+    def test_rows_and_derived_tables_are_consistent(self):
+        appointments = self.generate()
+        self.assertEqual(appointments.count(), 400)
+        self.assertEqual(Parent.objects.filter(user__username__startswith="gen-parent-").count(), 20)
+        self.assertTrue(User.objects.get(username="gen-parent-0").check_password("loadtest123"))
+
+        for hospital_id in Hospital.objects.values_list("id", flat=True):
+            self.assertEqual(HospitalAppointmentCounter.counts_for(hospital_id),
+                             HospitalAppointmentCounter.aggregate_counts(hospital_id))
+        active = Counter(appointments.filter(status__in=Appointment.ACTIVE_STATUSES, date__gte=date.today())
+                         .values_list("hospital_id", "date", "time"))
+        slots_on_file = {(slot.hospital_id, slot.date, slot.time): slot for slot in AppointmentSlot.objects.all()}
+        self.assertEqual({key: slot.booked for key, slot in slots_on_file.items()}, dict(active))
+        self.assertTrue(all(slot.booked <= slot.capacity for slot in slots_on_file.values()))
+
+        ledger = dict(StockMovement.objects.values_list("inventory_id").annotate(total=Sum("quantity")))
+        for inventory_id, quantity in Inventory.objects.values_list("id", "stock_quantity"):
+            self.assertEqual(ledger.get(inventory_id, 0), quantity)
+        self.assertTrue(VaccinationDue.objects.exists())
+
+    def test_same_seed_gives_the_same_data(self):
+        def shape(appointments):
+            return sorted(appointments.values_list("status", "date", "time", "vaccine__name"))
+
+        self.assertEqual(shape(self.generate("one", "--skip-derived")), shape(self.generate("two", "--skip-derived")))
+        self.assertFalse(AppointmentSlot.objects.exists())
+
+    def test_bad_options_are_refused(self):
+        self.generate("dup", "--skip-derived")
+        for prefix in ("dup", "muchtoolong"):
+            with self.subTest(prefix), self.assertRaises(CommandError):
+                self.generate(prefix)
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    """A short run against the in-process server, whose threads share the file-backed test DB."""
+
+    def test_percentile_uses_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual([loadtest.percentile(samples, share) for share in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_refuses_to_run_without_generated_users(self):
+        with self.assertRaises(CommandError):
+            call_command("loadtest", "--prefix", "none", "--duration", "0", stdout=io.StringIO())
+
+    @override_settings(ALLOWED_HOSTS=["127.0.0.1"], PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_short_run_reports_every_url_it_hit(self):
+        call_command("generate_data", "--parents", "6", "--hospitals", "2", "--appointments", "50",
+                     "--prefix", "lt", "--password", "pw-lt-123", stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            out = io.StringIO()
+            call_command("loadtest", "--prefix", "lt", "--password", "pw-lt-123", "--parents", "2",
+                         "--hospitals", "1", "--duration", "2", "--output", output, stdout=out, stderr=io.StringIO())
+            with open(output) as handle:
+                results = json.load(handle)
+
+        self.assertIn("Results saved to", out.getvalue())
+        self.assertGreater(results["total"]["requests"], 0)
+        reads = ("parent_dashboard", "view_appointments", "get_available_vaccines_api", "next_free_slots_api",
+                 "hospital_dashboard", "hospital_appointments", "hospital_inventory")
+        # Concurrent writes can still hit "database is locked" without DB_PROFILE=production
+        self.assertEqual({name: results["urls"][name]["errors"] for name in reads}, dict.fromkeys(reads, 0))
+        for name, url in results["urls"].items():
+            self.assertLessEqual(url["p50_ms"], url["p99_ms"], name)
+            self.assertLessEqual(url["p99_ms"], url["max_ms"], name)
+
+
+class SqliteProfileTests(SimpleTestCase):
+    """The DB_PROFILE=production settings and the write benchmark that justifies them."""
+
+    base = {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3", "OPTIONS": {"timeout": 20}}
+
+    def test_production_profile_defaults(self):
+        database = production_database(self.base, environ={})
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(database["OPTIONS"]["timeout"], 20)
+        self.assertEqual(
+            database["OPTIONS"]["init_command"].split(";"),
+            [f"PRAGMA {name}={value}" for name, value in DEFAULT_PRAGMAS.items()],
+        )
+        self.assertEqual(database["CONN_MAX_AGE"], 600)
+        self.assertIs(database["CONN_HEALTH_CHECKS"], True)
+        # The settings entry it was built from is left alone
+        self.assertEqual(self.base["OPTIONS"], {"timeout": 20})
+
+    def test_environment_overrides(self):
+        database = production_database(self.base, environ={
+            "SQLITE_BUSY_TIMEOUT": "10000", "SQLITE_JOURNAL_MODE": "DELETE",
+            "SQLITE_TRANSACTION_MODE": "EXCLUSIVE", "DB_CONN_MAX_AGE": "0",
+        })
+        init_command = database["OPTIONS"]["init_command"]
+        self.assertIn("PRAGMA busy_timeout=10000", init_command)
+        self.assertIn("PRAGMA journal_mode=DELETE", init_command)
+        self.assertIn("PRAGMA synchronous=NORMAL", init_command)
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "EXCLUSIVE")
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+
+    def test_connections_apply_the_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = production_database(
+                {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(directory, "profile.sqlite3")},
+                environ={"SQLITE_BUSY_TIMEOUT": "7000"},
+            )
+            # A handler of its own (with a dummy default), so the test database is left alone
+            db = ConnectionHandler({"default": {}, "profile": database})["profile"]
+            try:
+                with db.cursor() as cursor:
+                    pragmas = {}
+                    for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store"):
+                        cursor.execute(f"PRAGMA {name}")
+                        pragmas[name] = cursor.fetchone()[0]
+                self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 7000,
+                                           "temp_store": 2})
+                self.assertEqual(db.transaction_mode, "IMMEDIATE")
+            finally:
+                db.close()
+
+    def test_benchmark_profile_bookkeeping_matches_its_commits(self):
+        command = benchmark_sqlite_writes.Command(stdout=io.StringIO())
+        options = {"writers": 3, "readers": 1, "seconds": 0.3, "hospitals": 2, "seed": 3}
+        profile = benchmark_sqlite_writes.Profile("production", pragmas({}), "BEGIN IMMEDIATE", persistent=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            result = command.run_profile(profile, path, options)
+            db = sqlite3.connect(path)
+            try:
+                appointments = db.execute("SELECT COUNT(*) FROM appointment").fetchone()[0]
+                booked = db.execute("SELECT SUM(booked) FROM slot").fetchone()[0]
+                pending = db.execute("SELECT SUM(pending) FROM counter").fetchone()[0]
+            finally:
+                db.close()
+        self.assertGreater(result["committed"], 0)
+        # Every committed booking took a slot and bumped the counter; failed ones left nothing behind
+        self.assertEqual((appointments, booked, pending), (result["committed"],) * 3)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+
+    def test_benchmark_reports_both_profiles(self):
+        out = io.StringIO()
+        call_command("benchmark_sqlite_writes", "--writers", "2", "--readers", "1", "--seconds", "0.2",
+                     "--hospitals", "2", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("default"))
+        self.assertTrue(lines[1].startswith("production"))
+        self.assertIn("Write throughput:", lines[2])
+
+
+class ConcurrentApprovalTests(TransactionTestCase):
+    """Many threads approving against a small stock must never oversell."""
+
+    STOCK = 5
+    APPOINTMENTS = 20
+
+    def setUp(self):
+        parent = make_parent()
+        child = make_child(parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="OPV")
+        inventory = Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine)
+        stock.set_stock_level(inventory, self.STOCK)
+        self.appointments = [
+            make_appointment(parent, child, self.hospital, self.vaccine, hour=8 + i % 8, days=1 + i // 8)
+            for i in range(self.APPOINTMENTS)
+        ]
+
+    def test_parallel_approvals_are_exact(self):
+        results = []
+        barrier = threading.Barrier(self.APPOINTMENTS)
+
+        def approve(appointment_id):
+            try:
+                appointment = Appointment.objects.get(pk=appointment_id)
+                barrier.wait()
+                results.append(stock.approve_appointment(appointment))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=approve, args=(a.id,)) for a in self.appointments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        inventory = Inventory.objects.get(hospital=self.hospital, vaccine=self.vaccine)
+        self.assertEqual(results.count(stock.APPROVED), self.STOCK)
+        self.assertEqual(results.count(stock.OUT_OF_STOCK), self.APPOINTMENTS - self.STOCK)
+        self.assertEqual(inventory.stock_quantity, 0)
+        self.assertEqual(inventory.movements.aggregate(total=Sum("quantity"))["total"], 0)
+        self.assertEqual(
+            Appointment.objects.filter(hospital=self.hospital, status="Approved").count(), self.STOCK
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    """Appointment and Inventory queries must be served by an index.
+
+    Every statement a view runs against these tables is explained; a plan
+    fails if it scans one of them without an index, or sorts in a temp
+    B-tree although every ORDER BY column lives on these tables (so an
+    index could have produced the order). Scans of a partial index are
+    allowed, as the index holds only the rows the query wants.
+    """
+
+    TABLES = {Appointment._meta.db_table, Inventory._meta.db_table}
+    PARTIAL_INDEXES = {
+        index.name
+        for model in (Appointment, Inventory)
+        for index in model._meta.indexes
+        if index.condition is not None
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = make_parent()
+        cls.hospital = make_hospital()
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass12345")
+        vaccines = [Vaccine.objects.create(name=name) for name in ("BCG", "OPV", "Hep B")]
+        cls.vaccine = vaccines[0]
+        cls.inventory = Inventory.objects.create(hospital=cls.hospital, vaccine=cls.vaccine, stock_quantity=50)
+        Inventory.objects.create(hospital=cls.hospital, vaccine=vaccines[1])
+        children = [make_child(cls.parent, name) for name in ("Asha", "Ravi")]
+        statuses = ["Pending", "Approved", "Completed", "Cancelled"]
+        for i in range(40):
+            make_appointment(
+                cls.parent, children[i % 2], cls.hospital, vaccines[i % 3],
+                status=statuses[i % 4], days=i // 8 - 2, hour=8 + i % 8,
+            )
+        cls.pending = Appointment.objects.filter(status="Pending", date__gt=date.today()).first()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plan_problems(self, sql):
+        plan = self.explain(sql)
+        if not any(re.search(rf"\b{table}\b", line) for line in plan for table in self.TABLES):
+            return []
+        problems = []
+        for line in plan:
+            match = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", line)
+            if match and match[1] in self.TABLES and match[2] not in self.PARTIAL_INDEXES:
+                problems.append(line)
+        order_by = sql.rpartition(" ORDER BY ")[2] if " ORDER BY " in sql else ""
+        order_tables = set(re.findall(r'"(\w+)"\."\w+"', order_by))
+        if order_tables and order_tables <= self.TABLES and any("TEMP B-TREE" in line for line in plan):
+            problems.append("USE TEMP B-TREE FOR ORDER BY")
+        return problems
+
+    def assertIndexedPlans(self, queries):
+        explained = 0
+        for query in queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            explained += 1
+            problems = self.plan_problems(sql)
+            self.assertFalse(problems, f"{problems} in plan for: {sql}")
+        self.assertTrue(explained)
+
+    def request(self, user, name, args=(), method="get", data=None):
+        if user is not None:
+            self.client.force_login(user)
+        # Explain the database queries, not a cached document left by an earlier test
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(reverse(f"accounts:{name}", args=args), data)
+        self.assertLess(response.status_code, 400, name)
+        self.client.logout()
+        return queries
+
+    def test_parent_views(self):
+        for name in ("parent_dashboard", "view_appointments", "book_appointment", "mobile_appointments_api"):
+            with self.subTest(name):
+                self.assertIndexedPlans(self.request(self.parent.user, name))
+
+    def test_hospital_views(self):
+        for name in ("hospital_dashboard", "hospital_appointments", "hospital_inventory"):
+            with self.subTest(name):
+                self.assertIndexedPlans(self.request(self.hospital.user, name))
+
+    def test_hospital_board_next_page(self):
+        self.assertIndexedPlans(self.request(
+            self.hospital.user, "hospital_appointments", data={"start": date.today() - timedelta(days=7)}
+        ))
+        self.client.force_login(self.hospital.user)
+        response = self.client.get(reverse("accounts:hospital_appointments"))
+        cursor = re.search(r"pending_after=([\w-]+)", response.content.decode())
+        if cursor:
+            self.assertIndexedPlans(self.request(
+                self.hospital.user, "hospital_appointments", data={"pending_after": cursor[1]}
+            ))
+
+    def test_write_views(self):
+        self.assertIndexedPlans(self.request(
+            self.hospital.user, "hospital_confirm_appointment", args=[self.pending.id], method="post"
+        ))
+        self.assertIndexedPlans(self.request(
+            self.hospital.user, "update_inventory_stock", args=[self.inventory.id],
+            method="post", data={"stock_quantity": 60},
+        ))
+        self.assertIndexedPlans(self.request(
+            self.parent.user, "cancel_appointment", args=[self.pending.id], method="post"
+        ))
+
+    def test_availability_apis(self):
+        self.assertIndexedPlans(self.request(None, "get_available_vaccines_api", args=[self.hospital.id]))
+        self.assertIndexedPlans(self.request(None, "bulk_available_vaccines_api"))
+        self.assertIndexedPlans(self.request(
+            None, "bulk_available_vaccines_api", data={"hospital": self.hospital.id, "vaccine": self.vaccine.id}
+        ))
+        self.assertIndexedPlans(self.request(None, "next_free_slots_api", args=[self.hospital.id]))
+
+    def test_reminder_run(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command("send_appointment_reminders", "--backend", "locmem", "--days-ahead", "7", stdout=io.StringIO())
+        self.assertIndexedPlans(queries)
+
+
+@override_settings(CATALOG_CHECK_INTERVAL=3600)
+class QueryBudgetTests(TestCase):
+    """Every URL has a query budget that must hold at two data volumes.
+
+    The dataset is measured once, grown about tenfold and measured again: a
+    view fails if it goes over its budget, or if its query count changes
+    with the row count (an N+1 pattern). POST-only URLs are hit with POST.
+    Requests are measured once the user's role is resolved into the session
+    and the catalog is loaded.
+    """
+
+    # url name: (role, method, budget)
+    BUDGETS = {
+        "home": (None, "get", 0),
+        "parent_register": (None, "get", 0),
+        "parent_login": (None, "get", 0),
+        "parent_logout": ("parent", "get", 4),
+        "parent_dashboard": ("parent", "get", 6),
+        "add_child": ("parent", "get", 2),
+        "view_children": ("parent", "get", 3),
+        "edit_child": ("parent", "get", 3),
+        "delete_child": ("parent", "post", 6),
+        "hospital_register": (None, "get", 0),
+        "hospital_login": (None, "get", 0),
+        "hospital_logout": ("hospital", "get", 4),
+        "hospital_dashboard": ("hospital", "get", 3),
+        "hospital_appointments": ("hospital", "get", 8),
+        "update_appointment_status": ("hospital", "post", 16),
+        "hospital_confirm_appointment": ("hospital", "post", 10),
+        "hospital_bulk_approve_appointments": ("hospital", "post", 12),
+        "approve_hospitals": ("admin", "get", 2),
+        "approve_hospital": ("admin", "post", 7),
+        "reject_hospital": ("admin", "post", 10),
+        "book_appointment": ("parent", "get", 4),
+        "view_appointments": ("parent", "get", 4),
+        "cancel_appointment": ("parent", "post", 8),
+        "hospital_inventory": ("hospital", "get", 3),
+        "hospital_export_appointments": ("hospital", "get", 3),
+        "hospital_export_inventory": ("hospital", "get", 3),
+        "hospital_import_records": ("hospital", "get", 2),
+        "update_inventory_stock": ("hospital", "get", 4),
+        "add_inventory_stock": ("hospital", "get", 7),
+        "get_available_vaccines_api": (None, "get", 1),
+        "bulk_available_vaccines_api": (None, "get", 1),
+        "next_free_slots_api": (None, "get", 3),
+        "mobile_children_api": ("parent", "get", 4),
+        "mobile_appointments_api": ("parent", "get", 4),
+        "mobile_vaccinations_api": ("parent", "get", 4),
+        "parent_dashboard_async": ("parent", "get", 6),
+        "view_appointments_async": ("parent", "get", 4),
+        "hospital_dashboard_async": ("hospital", "get", 3),
+        "get_available_vaccines_api_async": (None, "get", 1),
+    }
+
+    def setUp(self):
+        self.parent = make_parent()
+        self.hospital = make_hospital()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass12345")
+        self.users = {"parent": self.parent.user, "hospital": self.hospital.user, "admin": self.admin}
+        self.rounds = 0
+
+    def grow(self, scale):
+        """Add ``scale`` children, vaccines and hospitals and 20 appointments per unit."""
+        self.rounds += 1
+        tag = self.rounds
+        children = Child.objects.bulk_create([
+            Child(parent=self.parent, name=f"Child {tag}-{i}", date_of_birth=date(2024, 1, 1), gender="Other")
+            for i in range(scale)
+        ])
+        vaccines = Vaccine.objects.bulk_create([
+            Vaccine(name=f"Vaccine {tag}-{i}", recommended_age="6 weeks, 10 weeks") for i in range(scale)
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(hospital=self.hospital, vaccine=vaccine, stock_quantity=i) for i, vaccine in enumerate(vaccines)
+        ])
+        Hospital.objects.bulk_create([
+            Hospital(name=f"Hospital {tag}-{i}", address="-", phone=f"{tag}-{i}",
+                     email=f"h{tag}-{i}@example.com", approved=bool(i % 2))
+            for i in range(scale)
+        ])
+        statuses = ["Pending", "Approved", "Completed", "Cancelled"]
+        Appointment.objects.bulk_create([
+            Appointment(
+                parent=self.parent, child=children[i % scale], hospital=self.hospital,
+                vaccine=vaccines[i % scale], status=statuses[i % 4],
+                date=date.today() + timedelta(days=i % 30 - 10), time=time(9 + i % 8),
+            )
+            for i in range(20 * scale)
+        ])
+        HospitalAppointmentCounter.rebuild()
+        rebuild_due_dates()
+
+    def targets(self):
+        """Fresh rows for the URLs that take an id, so mutating URLs can run every round."""
+        vaccine = Vaccine.objects.create(name=f"Target vaccine {self.rounds}")
+        inventory = Inventory.objects.create(hospital=self.hospital, vaccine=vaccine, stock_quantity=5)
+        child = make_child(self.parent, name=f"Target {self.rounds}")
+        pending = make_hospital(f"pending{self.rounds}", approved=False)
+        appointments = [
+            make_appointment(self.parent, child, self.hospital, vaccine, days=self.rounds, hour=8 + i)
+            for i in range(3)
+        ]
+        return {
+            "edit_child": ([child.id], None),
+            "delete_child": ([make_child(self.parent, name="Leaving").id], None),
+            "update_appointment_status": ([appointments[0].id], {"status": "Completed"}),
+            "hospital_confirm_appointment": ([appointments[1].id], None),
+            "cancel_appointment": ([appointments[2].id], None),
+            "hospital_bulk_approve_appointments": ([], {"appointment_ids": [
+                make_appointment(self.parent, child, self.hospital, vaccine, days=self.rounds, hour=12 + i).id
+                for i in range(3)
+            ]}),
+            "approve_hospital": ([pending.id], None),
+            "reject_hospital": ([Hospital.objects.create(
+                name="Rejected", address="-", phone=f"r-{self.rounds}", email=f"r{self.rounds}@example.com"
+            ).id], None),
+            "update_inventory_stock": ([inventory.id], None),
+            "add_inventory_stock": ([Vaccine.objects.create(name=f"New vaccine {self.rounds}").id], None),
+            "get_available_vaccines_api": ([self.hospital.id], None),
+            "next_free_slots_api": ([self.hospital.id], None),
+            "get_available_vaccines_api_async": ([self.hospital.id], None),
+        }
+
+    def measure(self):
+        targets = self.targets()
+        counts = {}
+        for name, (role, method, _) in self.BUDGETS.items():
+            args, data = targets.get(name, ([], None))
+            cache.clear()
+            # Async views are measured through the ASGI handler they are written for
+            client = self.async_client if name.endswith("_async") else self.client
+            send = async_to_sync(getattr(client, method)) if client is self.async_client else getattr(client, method)
+            if role:
+                client.force_login(self.users[role])
+                # Steady state: the role is already resolved into the session
+                send(reverse("accounts:home"))
+            # ...and this process already holds the current catalog
+            get_catalog()
+            with CaptureQueriesContext(connection) as queries:
+                response = send(reverse(f"accounts:{name}", args=args), data)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 400, name)
+            counts[name] = len(queries)
+            client.logout()
+        return counts
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names - set(self.BUDGETS), set())
+
+    def test_query_counts_stay_within_budget_and_flat(self):
+        self.grow(3)
+        small = self.measure()
+        self.grow(30)
+        large = self.measure()
+        for name, (_, _, budget) in self.BUDGETS.items():
+            with self.subTest(name):
+                self.assertLessEqual(large[name], budget, f"{name} ran {large[name]} queries")
+                self.assertEqual(small[name], large[name], f"{name} query count grows with data")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.parent = make_parent()
+
+    def test_superuser_reads_per_view_aggregates(self):
+        self.client.force_login(self.parent.user)
+        self.client.get(reverse("accounts:parent_dashboard"))
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass12345")
+        self.client.force_login(admin)
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('django_request_duration_seconds_count{view="accounts:parent_dashboard"} 1', body)
+        self.assertIn('django_responses_total{view="accounts:parent_dashboard",status="2xx"} 1', body)
+        queries = re.search(r'django_sql_queries_total\{view="accounts:parent_dashboard"\} (\d+)', body)
+        self.assertGreater(int(queries[1]), 0)
+        self.assertIn('django_template_render_seconds_total{view="accounts:parent_dashboard"}', body)
+
+    def test_other_users_are_turned_away(self):
+        self.client.force_login(self.parent.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 302)
+
+    def test_threads_record_separately_and_merge(self):
+        request_metrics = RequestMetrics()
+        request_metrics.queries = 2
+        worker = threading.Thread(target=registry.record, args=("accounts:home", 200, 0.003, request_metrics))
+        worker.start()
+        worker.join()
+        registry.record("accounts:home", 404, 0.02, request_metrics)
+        merged = registry.merged()["accounts:home"]
+        self.assertEqual((merged.count, merged.queries, merged.statuses), (2, 4, {"2xx": 1, "4xx": 1}))
+        self.assertEqual(merged.buckets[:3], [1, 0, 1])
+        registry.reset()
+        self.assertEqual(registry.merged(), {})
+
+    def test_queries_outside_a_request_are_not_counted(self):
+        self.client.force_login(self.parent.user)
+        self.client.get(reverse("accounts:parent_dashboard"))
+        queries = registry.merged()["accounts:parent_dashboard"].queries
+        Parent.objects.count()
+        self.assertGreater(queries, 0)
+        self.assertEqual(registry.merged()["accounts:parent_dashboard"].queries, queries)
+
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_overhead_benchmark_reports_every_endpoint(self):
+        call_command("generate_data", "--parents", "4", "--hospitals", "2", "--appointments", "30",
+                     "--prefix", "bm", stdout=io.StringIO())
+        out = io.StringIO()
+        call_command("benchmark_metrics", "--rounds", "2", "--requests", "2", "--warmup", "0", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[2:5]], ["availability", "parent", "hospital"])
+        for line in lines[2:5]:
+            self.assertRegex(line, r"[+-]\d+\.\d\d% \[[+-]\d+\.\d\d%, [+-]\d+\.\d\d%\]$")
+        self.assertRegex(lines[5], r"^Middleware around a stub view: \d+\.\d\d us per request")
+        # Timing blocks never leave the metrics middleware switched off
+        self.assertIn("accounts.metrics.MetricsMiddleware", settings.MIDDLEWARE)
+
+    def test_overhead_benchmark_needs_generated_data(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_metrics", "--rounds", "1", stdout=io.StringIO())
+
+
+class RoleMiddlewareTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.hospital = make_hospital()
+
+    def test_profile_is_resolved_once_per_session(self):
+        self.client.force_login(self.parent.user)
+        self.client.get(reverse("accounts:home"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("accounts:view_children"))
+        self.assertEqual(response.wsgi_request.parent, self.parent)
+        self.assertIsNone(response.wsgi_request.hospital)
+        self.assertFalse([q for q in queries if "accounts_parent" in q["sql"]])
+
+    def test_profile_changes_reach_existing_sessions(self):
+        self.client.force_login(self.hospital.user)
+        self.client.get(reverse("accounts:hospital_dashboard"))
+        self.hospital.name = "Renamed Hospital"
+        self.hospital.save()
+        response = self.client.get(reverse("accounts:hospital_dashboard"))
+        self.assertEqual(response.wsgi_request.hospital.name, "Renamed Hospital")
+
+    def test_admin_bulk_approval_reaches_existing_sessions(self):
+        pending = make_hospital("pending", approved=False)
+        self.client.force_login(pending.user)
+        self.client.get(reverse("accounts:home"))
+        HospitalAdmin(Hospital, None).approve_hospitals(None, Hospital.objects.filter(pk=pending.pk))
+        response = self.client.get(reverse("accounts:home"))
+        self.assertTrue(response.wsgi_request.hospital.approved)
+
+    def test_database_version_wins_after_the_cache_loses_it(self):
+        self.client.force_login(self.hospital.user)
+        self.client.get(reverse("accounts:hospital_dashboard"))
+        # Another worker renamed the hospital, and this cache has since lost the version
+        Hospital.objects.filter(pk=self.hospital.pk).update(name="Renamed Elsewhere")
+        ProfileVersion.bump(self.hospital.user_id)
+        cache.clear()
+        response = self.client.get(reverse("accounts:hospital_dashboard"))
+        self.assertEqual(response.wsgi_request.hospital.name, "Renamed Elsewhere")
+        self.assertContains(response, "Renamed Elsewhere")
+
+    def test_committed_bump_replaces_a_stale_cached_version(self):
+        self.client.force_login(self.hospital.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hospital.name = "Renamed"
+            self.hospital.save()
+            # A concurrent request cached the version before the bump committed
+            cache.set(roles._version_key(self.hospital.user_id), -1, timeout=None)
+        self.assertEqual(roles.current_version(self.hospital.user_id), ProfileVersion.current(self.hospital.user_id))
+        response = self.client.get(reverse("accounts:hospital_dashboard"))
+        self.assertEqual(response.wsgi_request.hospital.name, "Renamed")
+
+    def test_requests_that_never_ask_for_the_role_skip_it(self):
+        self.client.force_login(self.parent.user)
+        self.client.get(reverse("accounts:home"))
+        url = reverse("accounts:get_available_vaccines_api", args=[self.hospital.id])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_version_outlives_the_local_cache(self):
+        self.client.force_login(self.parent.user)
+        self.client.get(reverse("accounts:home"))
+        # A restarted worker starts with an empty cache but the same versions
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("accounts:view_children"))
+        self.assertEqual(response.wsgi_request.parent, self.parent)
+        self.assertFalse([q for q in queries if "accounts_parent" in q["sql"]])
+        self.assertEqual(len([q for q in queries if "accounts_profileversion" in q["sql"]]), 1)
+
+    def test_deleting_a_user_with_a_profile(self):
+        user_id = self.parent.user_id
+        version = ProfileVersion.current(user_id)
+        self.parent.user.delete()
+        self.assertFalse(Parent.objects.filter(user_id=user_id).exists())
+        self.assertGreater(ProfileVersion.current(user_id), version)
+
+
+class AsyncViewTests(TestCase):
+    """The async variants, served through the ASGI handler, match their sync views."""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.parent = make_parent()
+        self.hospital = make_hospital()
+        vaccine = Vaccine.objects.create(name="BCG")
+        Inventory.objects.create(hospital=self.hospital, vaccine=vaccine, stock_quantity=5)
+        child = make_child(self.parent)
+        for i, status in enumerate(["Pending", "Completed", "Cancelled"]):
+            make_appointment(self.parent, child, self.hospital, vaccine, status=status, days=i - 1, hour=9 + i)
+
+    async def test_parent_pages_match_sync_views(self):
+        await sync_to_async(self.client.force_login)(self.parent.user)
+        await self.async_client.aforce_login(self.parent.user)
+        keys = {
+            "parent_dashboard": ("children", "recent_appointments", "total_appointments_count",
+                                 "completed_appointments_count", "vaccinations_due"),
+            "view_appointments": ("appointments", "upcoming_appointments", "past_appointments", "status_counts"),
+        }
+
+        def values(context, name):
+            return {
+                key: context[key] if isinstance(context[key], (int, dict)) else list(context[key])
+                for key in keys[name]
+            }
+
+        def sync_context(name):
+            return values(self.client.get(reverse(f"accounts:{name}")).context, name)
+
+        for name in keys:
+            with self.subTest(name):
+                expected = await sync_to_async(sync_context)(name)
+                response = await self.async_client.get(reverse(f"accounts:{name}_async"))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.asgi_request.parent, self.parent)
+                self.assertEqual(values(response.context, name), expected)
+
+    async def test_unapproved_hospital_is_logged_out(self):
+        pending = await sync_to_async(make_hospital)("pending", approved=False)
+        await self.async_client.aforce_login(pending.user)
+        response = await self.async_client.get(reverse("accounts:hospital_dashboard_async"))
+        self.assertRedirects(response, reverse("accounts:hospital_login"), fetch_redirect_response=False)
+        self.assertFalse(response.asgi_request.user.is_authenticated)
+
+    async def test_availability_answers_conditional_gets(self):
+        url = reverse("accounts:get_available_vaccines_api_async", args=[self.hospital.id])
+        response = await self.async_client.get(url)
+        self.assertEqual([vaccine["name"] for vaccine in response.json()["vaccines"]], ["BCG"])
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        sync_response = await sync_to_async(self.client.get)(
+            reverse("accounts:get_available_vaccines_api", args=[self.hospital.id])
+        )
+        self.assertEqual(response["ETag"], sync_response["ETag"])
+        self.assertEqual(response["Last-Modified"], sync_response["Last-Modified"])
+
+        response = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(reverse("accounts:get_available_vaccines_api_async", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_metrics_count_async_queries(self):
+        await self.async_client.aforce_login(self.hospital.user)
+        await self.async_client.get(reverse("accounts:hospital_dashboard_async"))
+        body = await sync_to_async(registry.render)()
+        queries = re.search(r'django_sql_queries_total\{view="accounts:hospital_dashboard_async"\} (\d+)', body)
+        self.assertGreater(int(queries[1]), 0)
+
+
+class StaticAssetsTests(TestCase):
+    def setUp(self):
+        # The anonymous home page is cached with its stylesheet URLs
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_pages_link_their_styles_instead_of_inlining_them(self):
+        for name, user in (("home", None), ("parent_dashboard", make_parent().user)):
+            with self.subTest(name):
+                if user:
+                    self.client.force_login(user)
+                content = self.client.get(reverse(f"accounts:{name}")).content.decode()
+                self.assertNotIn("<style", content)
+                self.assertIn(f'href="/static/accounts/css/{name}.css"', content)
+
+    def test_collected_styles_are_hashed_compressed_and_cached_for_a_year(self):
+        with tempfile.TemporaryDirectory() as root, self.settings(STATIC_ROOT=root):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            content = self.client.get(reverse("accounts:home")).content.decode()
+            url = re.search(r'href="(/static/accounts/css/home\.[0-9a-f]{12}\.css)"', content)[1]
+
+            response = self.client.get(url, headers={"accept-encoding": "gzip, deflate"})
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+            css = gzip.decompress(b"".join(response.streaming_content)).decode()
+            self.assertIn("font-family: 'Poppins'", css)
+
+            plain = self.client.get(url)
+            self.assertNotIn("Content-Encoding", plain)
+            self.assertEqual(b"".join(plain.streaming_content).decode(), css)
+            self.assertEqual(self.client.get(url, headers={"if-modified-since": response["Last-Modified"]}).status_code, 304)
+            self.assertEqual(self.client.get("/static/accounts/css/home.css")["Cache-Control"], "public, max-age=60")
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.parent = make_parent()
+        self.client.force_login(self.parent.user)
+
+    def test_profile_fragment_is_reused_until_the_profile_changes(self):
+        self.assertContains(self.client.get(reverse("accounts:parent_dashboard")), "1 Main St")
+        # A queryset update skips the signals, so the cached fragment is still served
+        Parent.objects.filter(pk=self.parent.pk).update(address="2 High St")
+        self.assertContains(self.client.get(reverse("accounts:parent_dashboard")), "1 Main St")
+
+        self.parent.address = "3 Low St"
+        self.parent.save()
+        self.assertContains(self.client.get(reverse("accounts:parent_dashboard")), "3 Low St")
+
+    def test_children_fragment_follows_child_changes(self):
+        self.assertNotContains(self.client.get(reverse("accounts:parent_dashboard")), "Ravi")
+        child = make_child(self.parent, "Ravi")
+        self.assertContains(self.client.get(reverse("accounts:parent_dashboard")), "Ravi")
+        child.delete()
+        self.assertNotContains(self.client.get(reverse("accounts:parent_dashboard")), "Ravi")
+
+    def test_hospital_fragments_follow_the_profile(self):
+        hospital = make_hospital()
+        self.client.force_login(hospital.user)
+        self.client.get(reverse("accounts:hospital_dashboard"))
+        hospital.phone = "555-0000"
+        hospital.save()
+        self.assertContains(self.client.get(reverse("accounts:hospital_dashboard")), "555-0000")
+
+
+class AnonymousHomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_anonymous_home_page_is_rendered_once(self):
+        first = self.client.get(reverse("accounts:home"))
+        self.assertTemplateUsed(first, "accounts/home.html")
+        second = self.client.get(reverse("accounts:home"))
+        self.assertEqual(second.templates, [])
+        self.assertEqual(second.content, first.content)
+
+    def test_pending_messages_are_still_shown(self):
+        self.client.get(reverse("accounts:home"))
+        self.client.force_login(make_parent().user)
+        self.client.get(reverse("accounts:parent_logout"))
+        response = self.client.get(reverse("accounts:home"))
+        self.assertContains(response, "You have been logged out.")
+        self.assertNotContains(self.client.get(reverse("accounts:home")), "You have been logged out.")
+
+    def test_warm_templates_compiles_everything_and_drops_cached_pages(self):
+        self.client.get(reverse("accounts:home"))
+        out = io.StringIO()
+        call_command("warm_templates", stdout=out)
+        self.assertRegex(out.getvalue(), r"Compiled \d+ templates")
+        self.assertTemplateUsed(self.client.get(reverse("accounts:home")), "accounts/home.html")
+
+
+class AppointmentGroupingTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        self.client.force_login(self.parent.user)
+
+    def test_grouping_buckets_every_row_once(self):
+        rows = [
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, "Pending", days=2),
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, "Cancelled", days=3),
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, "Completed", days=-4),
+        ]
+        grouped = GroupedAppointments(Appointment.objects.order_by("date"))
+        self.assertEqual(len(grouped), 3)
+        self.assertEqual(grouped.upcoming, [rows[0]])
+        self.assertEqual(grouped.past, [rows[2], rows[1]])
+        self.assertEqual(grouped.counts["Pending"], 1)
+        self.assertEqual(grouped.counts["Approved"], 0)
+        self.assertIs(filter_by_status(grouped, "Completed"), grouped.with_status("Completed"))
+
+    def test_view_appointments_pages_with_full_history_counts(self):
+        for day in range(APPOINTMENTS_PAGE_SIZE + 5):
+            status = "Approved" if day % 5 == 0 else "Pending"
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, status, days=day + 1)
+
+        first = self.client.get(reverse("accounts:view_appointments"))
+        self.assertEqual(len(first.context["appointments"]), APPOINTMENTS_PAGE_SIZE)
+        self.assertEqual(first.context["status_counts"]["total"], APPOINTMENTS_PAGE_SIZE + 5)
+        self.assertEqual(first.context["status_counts"]["approved"], 6)
+        self.assertTrue(first.context["next_url"].startswith("?after="))
+
+        second = self.client.get(reverse("accounts:view_appointments") + first.context["next_url"])
+        self.assertEqual(len(second.context["appointments"]), 5)
+        self.assertIsNone(second.context["next_url"])
+        self.assertFalse({a.pk for a in first.context["appointments"]} & {a.pk for a in second.context["appointments"]})
+        self.assertEqual(second.context["status_counts"]["total"], APPOINTMENTS_PAGE_SIZE + 5)
+
+
+class MobileApiTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        self.client.force_login(self.parent.user)
+
+    def test_appointments_page_with_a_cursor(self):
+        made = [
+            make_appointment(self.parent, self.child, self.hospital, self.vaccine, days=day) for day in range(1, 6)
+        ]
+        url = reverse("accounts:mobile_appointments_api")
+        first = self.client.get(url, {"limit": 3, "fields": "id,vaccine"}).json()
+        self.assertEqual(first["appointments"], [{"id": a.id, "vaccine": "BCG"} for a in made[:1:-1]])
+        second = self.client.get(url, {"limit": 3, "fields": "id", "after": first["next"]}).json()
+        self.assertEqual(second, {"appointments": [{"id": made[1].id}, {"id": made[0].id}], "next": None})
+
+    def test_sparse_fields_and_unknown_fields(self):
+        response = self.client.get(reverse("accounts:mobile_children_api"), {"fields": "name"})
+        self.assertEqual(response.json(), {"children": [{"name": "Asha"}]})
+        response = self.client.get(reverse("accounts:mobile_children_api"), {"fields": "name,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["error"])
+
+    def test_vaccination_status_is_computed_from_the_dates(self):
+        VaccinationDue.objects.create(
+            child=self.child, vaccine=self.vaccine, dose_number=1,
+            due_date=date.today() - timedelta(days=10), overdue_after=date.today() - timedelta(days=1),
+        )
+        response = self.client.get(reverse("accounts:mobile_vaccinations_api"), {"fields": "vaccine,status"})
+        self.assertEqual(response.json(), {"vaccinations": [{"vaccine": "BCG", "status": "Overdue"}]})
+
+    def test_etag_answers_unchanged_refreshes_with_304(self):
+        url = reverse("accounts:mobile_children_api")
+        etag = self.client.get(url)["ETag"]
+        unchanged = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b"")
+        make_child(self.parent, "Ravi")
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+    def test_unchanged_refresh_reads_no_rows(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        rebuild_due_dates()
+        for name, fields in [("children", "name"), ("appointments", "id,child,hospital"), ("vaccinations", "status")]:
+            url = reverse(f"accounts:mobile_{name}_api")
+            etag = self.client.get(url, {"fields": fields})["ETag"]
+            # Session, user and the validator aggregate; the rows themselves are never read
+            with self.assertNumQueries(3):
+                response = self.client.get(url, {"fields": fields}, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertNotEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 304)
+
+    def test_renaming_a_child_changes_the_etag_of_rows_that_show_the_name(self):
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine)
+        url = reverse("accounts:mobile_appointments_api")
+        etag = self.client.get(url, {"fields": "id,child"})["ETag"]
+        self.child.name = "Asha Rao"
+        self.child.save()
+        response = self.client.get(url, {"fields": "id,child"}, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["appointments"][0]["child"], "Asha Rao")
+
+    def test_requires_a_parent_session(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("accounts:mobile_children_api")).status_code, 401)
+        self.client.force_login(self.hospital.user)
+        self.assertEqual(self.client.get(reverse("accounts:mobile_children_api")).status_code, 403)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.parent = make_parent()
+        self.child = make_child(self.parent)
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+        self.client.force_login(self.hospital.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f"accounts:hospital_export_{name}"), params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def make_rows(self, count, days=1):
+        Appointment.objects.bulk_create([
+            Appointment(
+                parent=self.parent, child=self.child, hospital=self.hospital, vaccine=self.vaccine,
+                date=date.today() + timedelta(days=days), time=time(9), status="Pending", notes=f"row {i}",
+            )
+            for i in range(count)
+        ])
+
+    def test_csv_has_the_joined_columns_and_honours_the_filters(self):
+        start = date.today().isoformat()
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Approved", days=0)
+        make_appointment(self.parent, self.child, self.hospital, self.vaccine, status="Pending", days=0, hour=11)
+        Appointment.objects.filter(status="Pending").update(notes="=HYPERLINK(1)")
+
+        body = self.export("appointments", start=start, end=start, status="Pending").decode("utf-8-sig")
+        header, *rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(header[:5], ["Appointment ID", "Date", "Time", "Status", "Child"])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][3:7], ["Pending", "Asha", "2024-01-01", "parent"])
+        self.assertEqual(rows[0][9:11], ["BCG", "'=HYPERLINK(1)"])
+
+    def test_xlsx_is_a_workbook_with_one_row_per_appointment(self):
+        self.make_rows(5)
+        body = self.export("appointments", format="xlsx", start=date.today().isoformat(),
+                           end=(date.today() + timedelta(days=2)).isoformat())
+        with zipfile.ZipFile(io.BytesIO(body)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+        namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        rows = sheet.findall(f"{namespace}sheetData/{namespace}row")
+        self.assertEqual(len(rows), 6)
+        self.assertIn("row 0", "".join(rows[1].itertext()))
+
+    def test_inventory_export_streams_the_stock_ledger(self):
+        inventory = Inventory.objects.create(hospital=self.hospital, vaccine=self.vaccine)
+        stock.set_stock_level(inventory, 8, note="delivery")
+        header, row = list(csv.reader(io.StringIO(self.export("inventory").decode("utf-8-sig"))))
+        self.assertEqual(row[2:6], ["BCG", StockMovement.RESTOCK, "8", "8"])
+
+    def test_bad_filters_go_back_with_a_message(self):
+        response = self.client.get(reverse("accounts:hospital_export_appointments"), {"start": "yesterday"})
+        self.assertRedirects(response, reverse("accounts:hospital_appointments"), fetch_redirect_response=False)
+
+    def test_memory_stays_flat_as_the_export_grows(self):
+        def peak(count):
+            Appointment.objects.all().delete()
+            self.make_rows(count)
+            tracemalloc.start()
+            for _ in self.client.get(
+                reverse("accounts:hospital_export_appointments"), {"format": "xlsx", "start": date.today().isoformat()}
+            ).streaming_content:
+                pass
+            result = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result
+
+        with mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 100):
+            small, large = peak(300), peak(3000)
+        self.assertLess(large, small * 2, f"peak {small} bytes for 300 rows, {large} for 3000")
+
+
+class RecordImportTests(TestCase):
+    CSV = (
+        "parent,child_name,date_of_birth,gender,vaccine,date,status\n"
+        "parent,Asha,2024-01-01,female,BCG,2024-01-02,\n"
+        "parent@example.com,Asha,2024-01-01,Female,OPV,2024-02-15,Completed\n"
+        "parent,Ravi,2024-03-01,Male,,,\n"
+        "nobody,Mira,2024-01-01,Female,BCG,2024-01-02,\n"
+        "parent,Tara,2999-01-01,Female,Flu,2024-01-02,Pending\n"
+    )
+
+    def setUp(self):
+        self.parent = make_parent()
+        self.hospital = make_hospital()
+        Vaccine.objects.create(name="BCG", recommended_age="at birth")
+        Vaccine.objects.create(name="OPV")
+        # Only parents who already have an appointment here can be imported onto
+        make_appointment(self.parent, make_child(self.parent, name="Older"), self.hospital, None)
+
+    def run_import(self, text, batch_size=2):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write(text)
+        self.addCleanup(os.unlink, handle.name)
+        out = io.StringIO()
+        call_command("import_records", handle.name, "--hospital", str(self.hospital.id),
+                     "--batch-size", str(batch_size), stdout=out)
+        return out.getvalue()
+
+    def test_good_rows_go_in_and_bad_rows_are_reported_by_line(self):
+        out = self.run_import(self.CSV)
+        self.assertIn("2 children and 2 vaccinations added, 0 duplicates skipped, 2 rows rejected", out)
+        self.assertIn("5,parent,'nobody' has no appointments at this hospital.", out)
+        self.assertIn("6,date_of_birth,Date of birth cannot be in the future.", out)
+        self.assertIn("6,vaccine,Unknown vaccine 'Flu'.", out)
+        self.assertIn('6,status,"Status must be one of: Completed, Cancelled."', out)
+
+        asha = Child.objects.get(name="Asha")
+        self.assertEqual(asha.gender, "Female")
+        self.assertEqual(Appointment.objects.filter(child=asha, status="Completed").count(), 2)
+        self.assertEqual(HospitalAppointmentCounter.objects.get(hospital=self.hospital).completed, 2)
+        self.assertEqual(VaccinationDue.objects.get(child=asha, vaccine__name="BCG").completed_on, date(2024, 1, 2))
+
+    def test_importing_the_same_file_again_adds_nothing(self):
+        self.run_import(self.CSV)
+        out = self.run_import(self.CSV, batch_size=100)
+        self.assertIn("0 children and 0 vaccinations added, 2 duplicates skipped", out)
+        self.assertEqual(Child.objects.count(), 3)
+
+    def test_upload_view_lists_the_rejected_rows(self):
+        self.client.force_login(self.hospital.user)
+        upload = io.BytesIO(self.CSV.encode())
+        upload.name = "records.csv"
+        response = self.client.post(reverse("accounts:hospital_import_records"), {"file": upload})
+        self.assertEqual(response.context["result"].appointments_created, 2)
+        self.assertContains(response, "has no appointments at this hospital")
+        self.assertEqual(len(response.context["errors_shown"]), 4)
+
+    def test_a_hospital_cannot_import_onto_another_hospitals_parent(self):
+        stranger = make_parent("stranger")
+        make_appointment(stranger, make_child(stranger, name="Kiran"), make_hospital("elsewhere"), None)
+        out = self.run_import(
+            "parent,child_name,date_of_birth,gender,vaccine,date\n"
+            "stranger,Planted,2024-01-01,Female,BCG,2024-01-02\n"
+            "stranger@example.com,Planted,2024-01-01,Female,,\n"
+        )
+        self.assertIn("0 children and 0 vaccinations added, 0 duplicates skipped, 2 rows rejected", out)
+        self.assertIn("2,parent,'stranger' has no appointments at this hospital.", out)
+        self.assertIn("3,parent,'stranger@example.com' has no appointments at this hospital.", out)
+        self.assertEqual(list(stranger.children.values_list("name", flat=True)), ["Kiran"])
+        self.assertFalse(Appointment.objects.filter(parent=stranger, hospital=self.hospital).exists())
+
+    def test_missing_columns_are_reported_up_front(self):
+        out = self.run_import("parent,child_name\nparent,Asha\n")
+        self.assertIn("1,\"date_of_birth, gender\",Missing required column(s).", out)
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        invalidate_catalog()
+        self.hospital = make_hospital()
+        self.vaccine = Vaccine.objects.create(name="BCG")
+
+    def test_form_choices_come_from_the_catalog(self):
+        make_hospital("waiting", approved=False)
+        get_catalog()
+        form = AppointmentForm()
+        with self.assertNumQueries(0):
+            hospitals = [label for _, label in form.fields["hospital"].choices]
+            vaccines = [label for _, label in form.fields["vaccine"].choices]
+        self.assertEqual(hospitals[1:], ["Hospital Hospital"])
+        self.assertEqual(vaccines[1:], ["BCG"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(form.fields["hospital"].clean(str(self.hospital.id)), self.hospital)
+        waiting = Hospital.objects.get(name="Waiting Hospital")
+        with self.assertRaises(ValidationError):
+            form.fields["hospital"].clean(str(waiting.id))
+
+    def test_changes_here_show_at_once(self):
+        self.assertNotIn("OPV", [v.name for v in get_catalog().instances(Vaccine)])
+        Vaccine.objects.create(name="OPV")
+        self.assertIn("OPV", [v.name for v in get_catalog().instances(Vaccine)])
+
+    def test_other_processes_changes_show_after_the_check_interval(self):
+        with override_settings(CATALOG_CHECK_INTERVAL=3600):
+            catalog = get_catalog()
+            # Another worker renames the vaccine and bumps the shared version
+            Vaccine.objects.filter(pk=self.vaccine.pk).update(name="BCG (new)")
+            CatalogVersion.objects.update(version=F("version") + 1)
+            with self.assertNumQueries(0):
+                self.assertIs(get_catalog(), catalog)
+        with override_settings(CATALOG_CHECK_INTERVAL=0):
+            self.assertEqual(get_catalog().instance(Vaccine, self.vaccine.pk).name, "BCG (new)")
+
+    def test_instances_are_not_shared_between_callers(self):
+        first = get_catalog().instance(Hospital, self.hospital.pk)
+        first.name = "Changed"
+        self.assertEqual(get_catalog().instance(Hospital, self.hospital.pk).name, "Hospital Hospital")
+
+    def test_admin_appointment_form_lists_catalog_vaccines(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass12345"))
+        response = self.client.get(reverse("admin:accounts_appointment_add"))
+        self.assertContains(response, f'<option value="{self.vaccine.pk}">BCG</option>', html=True)
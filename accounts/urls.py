@@ -27,6 +27,7 @@ urlpatterns = [
     path('hospital/appointments/', views.hospital_appointments, name='hospital_appointments'),
     path('hospital/appointment/update/<int:appointment_id>/', views.update_appointment_status, name='update_appointment_status'),
     path('hospital/appointment/confirm/<int:appointment_id>/', views.hospital_confirm_appointment, name='hospital_confirm_appointment'),
+    path('hospital/appointments/approve/', views.hospital_bulk_approve_appointments, name='hospital_bulk_approve_appointments'),
     
     # Admin URLs
     path('hospitals/pending/', views.approve_hospitals, name='approve_hospitals'),
@@ -45,12 +46,32 @@ urlpatterns = [
     path('hospital/inventory/', views.hospital_inventory, name='hospital_inventory'),
     path('hospital/inventory/update/<int:inventory_id>/', views.update_inventory_stock, name='update_inventory_stock'),
     path('hospital/inventory/add/<int:vaccine_id>/', views.update_inventory_stock, name='add_inventory_stock'),
+
+    # Exports (CSV / XLSX)
+    path('hospital/export/appointments/', views.hospital_export_appointments, name='hospital_export_appointments'),
+    path('hospital/export/inventory/', views.hospital_export_inventory, name='hospital_export_inventory'),
+    path('hospital/import/', views.hospital_import_records, name='hospital_import_records'),
     # --- In accounts/urls.py ---
 
 # ... existing URLs ...
 
 # API endpoint for AJAX
     path('api/get-available-vaccines/<int:hospital_id>/', views.get_available_vaccines_api, name='get_available_vaccines_api'),
+    path('api/available-vaccines/', views.bulk_available_vaccines_api, name='bulk_available_vaccines_api'),
+    path('api/next-free-slots/<int:hospital_id>/', views.next_free_slots_api, name='next_free_slots_api'),
+
+    # Mobile app API (parent session)
+    path('api/mobile/children/', views.mobile_children_api, name='mobile_children_api'),
+    path('api/mobile/appointments/', views.mobile_appointments_api, name='mobile_appointments_api'),
+    path('api/mobile/vaccinations/', views.mobile_vaccinations_api, name='mobile_vaccinations_api'),
+
+
+    # Async variants for ASGI deployments
+    path('async/dashboard/', views.parent_dashboard_async, name='parent_dashboard_async'),
+    path('async/view-appointments/', views.view_appointments_async, name='view_appointments_async'),
+    path('async/hospital/dashboard/', views.hospital_dashboard_async, name='hospital_dashboard_async'),
+    path('async/api/get-available-vaccines/<int:hospital_id>/', views.get_available_vaccines_api_async,
+         name='get_available_vaccines_api_async'),
 
 # ... other URLs ...
 # ... other URLs ...
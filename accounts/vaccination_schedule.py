@@ -0,0 +1,104 @@
+"""Bulk computation of the VaccinationDue table.
+
+Children are processed in id-ordered chunks. Each chunk is one
+``INSERT ... SELECT`` that joins the children against the dose schedule and
+does the date arithmetic in SQLite (``date(date_of_birth, '+N days')``), so
+no row is built in Python and the number of queries depends on the chunk
+count, not the number of children. The n-th completed appointment for a
+vaccine closes dose n, matched with ``ROW_NUMBER()`` in the same statement.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, Child, VaccinationDue, VaccineDose
+
+# A dose given at a single recommended age is still "due" for this long
+DUE_GRACE_DAYS = 28
+CHUNK_SIZE = 5000
+# Ids bound into one statement when rebuilding given children; stays under SQLite's 999 variables
+MAX_IDS_PER_STATEMENT = 900
+
+INSERT_DUE_ROWS = """
+INSERT INTO {due} (child_id, vaccine_id, dose_number, due_date, overdue_after, completed_on, updated_at)
+SELECT child.id, dose.vaccine_id, dose.dose_number,
+       date(child.date_of_birth, '+' || dose.min_age_days || ' days'),
+       date(child.date_of_birth, '+' || CASE WHEN dose.max_age_days > dose.min_age_days
+                                             THEN dose.max_age_days
+                                             ELSE dose.min_age_days + %s END || ' days'),
+       given.date, %s
+FROM {child} AS child
+JOIN {dose} AS dose ON {dose_filter}
+LEFT JOIN (
+    SELECT child_id, vaccine_id, date,
+           ROW_NUMBER() OVER (PARTITION BY child_id, vaccine_id ORDER BY date, id) AS dose_number
+    FROM {appointment}
+    WHERE status = 'Completed' AND vaccine_id IS NOT NULL AND child_id BETWEEN %s AND %s
+) AS given
+  ON given.child_id = child.id AND given.vaccine_id = dose.vaccine_id AND given.dose_number = dose.dose_number
+WHERE {child_filter}
+"""
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _child_chunks(child_ids, chunk_size):
+    """Yield ``(low, high, ids)``: an inclusive id range, and the ids in it when only some are rebuilt."""
+    if child_ids is not None:
+        ids = sorted(set(child_ids))
+        step = min(chunk_size, MAX_IDS_PER_STATEMENT)
+        for start in range(0, len(ids), step):
+            chunk = ids[start:start + step]
+            yield chunk[0], chunk[-1], chunk
+        return
+
+    children = Child.objects.order_by('id').values_list('id', flat=True)
+    low = children.first()
+    while low is not None:
+        high = children.filter(id__gte=low)[chunk_size - 1:chunk_size].first()
+        if high is None:
+            high = children.last()
+        yield low, high, None
+        low = children.filter(id__gt=high).first()
+
+
+def _insert_due_rows(low, high, ids, vaccine_ids):
+    child_filter, params = 'child.id BETWEEN %s AND %s', [low, high]
+    if ids is not None:
+        child_filter, params = f'child.id IN ({_placeholders(ids)})', list(ids)
+    dose_filter, dose_params = '1 = 1', []
+    if vaccine_ids is not None:
+        dose_filter, dose_params = f'dose.vaccine_id IN ({_placeholders(vaccine_ids)})', list(vaccine_ids)
+
+    sql = INSERT_DUE_ROWS.format(
+        due=VaccinationDue._meta.db_table, child=Child._meta.db_table,
+        dose=VaccineDose._meta.db_table, appointment=Appointment._meta.db_table,
+        dose_filter=dose_filter, child_filter=child_filter,
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [DUE_GRACE_DAYS, now, *dose_params, low, high, *params])
+        return cursor.rowcount
+
+
+def rebuild_due_dates(child_ids=None, vaccine_ids=None, chunk_size=CHUNK_SIZE):
+    """Recompute VaccinationDue rows, optionally only for some children or vaccines.
+
+    Returns the number of rows written.
+    """
+    vaccine_ids = None if vaccine_ids is None else sorted(set(vaccine_ids))
+    if vaccine_ids == []:
+        return 0
+    written = 0
+    for low, high, ids in _child_chunks(child_ids, chunk_size):
+        stale = VaccinationDue.objects.filter(child_id__in=ids) if ids is not None else (
+            VaccinationDue.objects.filter(child_id__gte=low, child_id__lte=high)
+        )
+        if vaccine_ids is not None:
+            stale = stale.filter(vaccine_id__in=vaccine_ids)
+        with transaction.atomic():
+            # Clears every row of the chunk, so vaccines that lost their schedule leave none behind
+            stale.delete()
+            written += _insert_due_rows(low, high, ids, vaccine_ids)
+    return written
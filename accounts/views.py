@@ -1,21 +1,51 @@
+import asyncio
+import csv
+import io
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import alogout, authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q
-from datetime import date
-from django.http import JsonResponse
-from .forms import ParentRegistrationForm, ChildForm, HospitalRegisterForm, AppointmentForm
-from .models import Parent, Child, Hospital, Appointment, Vaccine,Inventory
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from datetime import date, timedelta, timezone as dt_timezone
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
+from . import exports, mobile_api, stock
+from .availability import aget_hospital_availability, get_hospital_availability, get_network_availability
+from .catalog import get_catalog
+from .fragments import (
+    ANONYMOUS_HOME_KEY, ANONYMOUS_HOME_TIMEOUT, FRAGMENT_TIMEOUT,
+    aparent_versions, ahospital_versions, hospital_versions, parent_versions,
+)
+from .metrics import registry
+from .forms import ParentRegistrationForm, ChildForm, HospitalRegisterForm, AppointmentForm, RecordImportForm
+from .models import Parent, Child, Hospital, Appointment, Vaccine, Inventory, HospitalAppointmentCounter, VaccinationDue
+from .grouping import GroupedAppointments
+from .importer import import_records
+from .pagination import akeyset_page, keyset_page
+from .slots import next_free_slots
 
 
 def home(request):  
     """Root URL: redirect to dashboard if logged in, else to login"""
     if request.user.is_authenticated:
-        if Parent.objects.filter(user=request.user).exists():
+        if request.parent:
             return redirect('accounts:parent_dashboard')
-        elif Hospital.objects.filter(user=request.user).exists():
+        elif request.hospital:
             return redirect('accounts:hospital_dashboard')
+    elif not messages.get_messages(request):
+        # The anonymous page is the same for everyone until a message is queued
+        content = cache.get(ANONYMOUS_HOME_KEY)
+        if content is None:
+            content = render(request, 'accounts/home.html').content
+            cache.set(ANONYMOUS_HOME_KEY, content, ANONYMOUS_HOME_TIMEOUT)
+        return HttpResponse(content)
     return render(request, 'accounts/home.html')
 
 
@@ -64,39 +94,61 @@ def parent_logout(request):
 
 @login_required
 def parent_dashboard(request):
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if parent is None:
         messages.error(request, "No parent profile found.")
         return redirect('accounts:home')
 
     children = Child.objects.filter(parent=parent)
 
     # Use date/time for ordering to match the rest of your codebase
-    recent_appointments = Appointment.objects.filter(parent=parent).order_by('-date', '-time')[:5]
+    recent_appointments = _recent_appointments(parent)
+
+    # Aggregate counts in one query
+    totals = Appointment.objects.filter(parent=parent).aggregate(**PARENT_TOTALS)
+
+    # Overdue, due and next-30-day doses from the precomputed schedule
+    vaccinations_due = _upcoming_doses(parent)
+
+    return render(request, "accounts/parent_dashboard.html", _parent_dashboard_context(
+        parent, children, recent_appointments, totals, vaccinations_due, parent_versions(parent)
+    ))
+
+
+PARENT_TOTALS = {'total': Count('id'), 'completed': Count('id', filter=Q(status='Completed'))}
+
+
+def _recent_appointments(parent):
+    return Appointment.objects.filter(parent=parent).select_related(
+        'child', 'hospital', 'vaccine'
+    ).order_by('-date', '-time')[:5]
+
 
-    # Aggregate counts
-    total_appointments_count = Appointment.objects.filter(parent=parent).count()
-    completed_appointments_count = Appointment.objects.filter(
-        parent=parent, status='Completed'
-    ).count()
+def _upcoming_doses(parent):
+    return VaccinationDue.objects.open().filter(
+        child__parent=parent, due_date__lte=date.today() + timedelta(days=30)
+    ).select_related('child', 'vaccine').order_by('due_date')[:10]
 
-    # If you want "completed among recent 5"
-    completed_recent_count = sum(1 for a in recent_appointments if a.status == "Completed")
 
-    return render(request, "accounts/parent_dashboard.html", {
+def _parent_dashboard_context(parent, children, recent_appointments, totals, vaccinations_due, versions):
+    recent_appointments = GroupedAppointments(recent_appointments)
+    return {
         "parent": parent,
         "children": children,
         "recent_appointments": recent_appointments,
-        "total_appointments_count": total_appointments_count,
-        "completed_appointments_count": completed_appointments_count,
-        "completed_recent_count": completed_recent_count,
-    })
+        "total_appointments_count": totals['total'],
+        "completed_appointments_count": totals['completed'],
+        # If you want "completed among recent 5"
+        "completed_recent_count": len(recent_appointments.with_status("Completed")),
+        "vaccinations_due": vaccinations_due,
+        # Keys of the cached profile and children fragments
+        "fragments": {"timeout": FRAGMENT_TIMEOUT, **versions},
+    }
 
 
 @login_required
 def add_child(request):
-    parent = Parent.objects.filter(user=request.user).first()
+    parent = request.parent
     
     if not parent:
         messages.error(request, "No parent profile found.")
@@ -118,7 +170,7 @@ def add_child(request):
 
 @login_required
 def view_children(request):
-    parent = Parent.objects.filter(user=request.user).first()
+    parent = request.parent
     
     if not parent:
         messages.error(request, "No parent profile found.")
@@ -130,7 +182,7 @@ def view_children(request):
 
 @login_required
 def edit_child(request, child_id):
-    child = get_object_or_404(Child, id=child_id, parent__user=request.user)
+    child = get_object_or_404(Child, id=child_id, parent=request.parent)
     
     if request.method == "POST":
         form = ChildForm(request.POST, instance=child)
@@ -146,7 +198,7 @@ def edit_child(request, child_id):
 
 @login_required
 def delete_child(request, child_id):
-    child = get_object_or_404(Child, id=child_id, parent__user=request.user)
+    child = get_object_or_404(Child, id=child_id, parent=request.parent)
     
     if request.method == "POST":
         child_name = child.name
@@ -207,9 +259,8 @@ def hospital_logout(request):
 
 @login_required
 def hospital_dashboard(request):
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied. You must log in as an approved hospital.")
         return redirect('accounts:hospital_login')
 
@@ -218,59 +269,93 @@ def hospital_dashboard(request):
         logout(request)
         return redirect('accounts:hospital_login')
 
-    # Get appointment statistics
-    total_appointments = Appointment.objects.filter(hospital=hospital).count()
-    pending_count = Appointment.objects.filter(hospital=hospital, status='Pending').count()
-    approved_count = Appointment.objects.filter(hospital=hospital, status='Approved').count()
-    completed_count = Appointment.objects.filter(hospital=hospital, status='Completed').count()
+    # Get appointment statistics from the maintained counter row
+    counts = HospitalAppointmentCounter.counts_for(hospital.id)
+    return render(request, 'accounts/hospital_dashboard.html', _hospital_dashboard_context(
+        hospital, counts, hospital_versions(hospital)
+    ))
 
-    context = {
+
+def _hospital_dashboard_context(hospital, counts, versions):
+    return {
         'hospital': hospital,
-        'total_appointments': total_appointments,
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'completed_count': completed_count,
+        'total_appointments': counts['total'],
+        'pending_count': counts['pending'],
+        'approved_count': counts['approved'],
+        'completed_count': counts['completed'],
+        'fragments': {'timeout': FRAGMENT_TIMEOUT, **versions},
     }
-    
-    return render(request, 'accounts/hospital_dashboard.html', context)
+
+
+BOARD_WINDOW_DAYS = 14
+BOARD_PAGE_SIZE = 25
+BOARD_TABS = (
+    ('Pending', 'pending'),
+    ('Approved', 'confirmed'),  # Template uses 'confirmed_appointments'
+    ('Completed', 'completed'),
+    ('Cancelled', 'cancelled'),
+)
+
+
+def _parse_date(value, default):
+    try:
+        return date.fromisoformat(value) if value else default
+    except ValueError:
+        return default
 
 
 @login_required
 def hospital_appointments(request):
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied. Please log in as a hospital.")
         return redirect("accounts:hospital_login")
 
-    # Get all appointments for this hospital
-    appointments = Appointment.objects.filter(hospital=hospital).select_related(
-        'child', 'parent', 'parent__user', 'vaccine'
-    ).order_by('date', 'time')
-    
-    # Filter by status - match template variable names
-    pending_appointments = appointments.filter(status="Pending")
-    confirmed_appointments = appointments.filter(status="Approved")  # Template uses 'confirmed_appointments'
-    completed_appointments = appointments.filter(status="Completed")
-    cancelled_appointments = appointments.filter(status="Cancelled")
-    
+    # Only look at a date window (default: today to +14 days)
+    today = date.today()
+    window_start = _parse_date(request.GET.get("start"), today)
+    window_end = _parse_date(request.GET.get("end"), window_start + timedelta(days=BOARD_WINDOW_DAYS))
+    if window_end < window_start:
+        window_end = window_start
+
+    appointments = Appointment.objects.filter(hospital=hospital, date__range=(window_start, window_end))
+    counts = appointments.aggregate(**HospitalAppointmentCounter.status_aggregates())
+
     context = {
         "hospital": hospital,
-        "all_appointments": appointments,
-        "pending_appointments": pending_appointments,
-        "confirmed_appointments": confirmed_appointments,
-        "completed_appointments": completed_appointments,
-        "cancelled_appointments": cancelled_appointments,
+        "window_start": window_start,
+        "window_end": window_end,
     }
-    
+
+    # One keyset page per status tab - template names match the tab keys
+    rows = appointments.select_related('child', 'parent__user', 'vaccine')
+    for status, tab in BOARD_TABS:
+        cursor_param = f"{tab}_after"
+        page, next_cursor = keyset_page(
+            rows.filter(status=status), request.GET.get(cursor_param), BOARD_PAGE_SIZE
+        )
+        context[f"{tab}_appointments"] = page
+        context[f"{tab}_count"] = counts[HospitalAppointmentCounter.STATUS_FIELDS[status]]
+        context[f"{tab}_next_url"] = None
+        if next_cursor:
+            params = request.GET.copy()
+            params[cursor_param] = next_cursor
+            context[f"{tab}_next_url"] = f"?{params.urlencode()}"
+
+    # Stock levels for the pending rows, fetched once for the whole board
+    stock_by_vaccine = dict(
+        Inventory.objects.filter(hospital=hospital).values_list('vaccine_id', 'stock_quantity')
+    )
+    for appt in context["pending_appointments"]:
+        appt.stock_quantity = stock_by_vaccine.get(appt.vaccine_id)
+
     return render(request, "accounts/hospital_appointments.html", context)
 
 
 @login_required
 def update_appointment_status(request, appointment_id):
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied.")
         return redirect("accounts:hospital_login")
 
@@ -283,8 +368,13 @@ def update_appointment_status(request, appointment_id):
         
         if new_status in valid_statuses:
             appointment.status = new_status
-            appointment.save()
-            messages.success(request, f"Appointment for {appointment.child.name} updated to '{new_status}'.")
+            try:
+                # Reopening a cancelled appointment has to take its slot back
+                appointment.save()
+            except ValidationError as error:
+                messages.error(request, f"Appointment for {appointment.child.name} not updated. {' '.join(error.messages)}")
+            else:
+                messages.success(request, f"Appointment for {appointment.child.name} updated to '{new_status}'.")
         else:
             messages.error(request, "Invalid status value.")
         
@@ -299,37 +389,69 @@ def update_appointment_status(request, appointment_id):
 @login_required
 def hospital_confirm_appointment(request, appointment_id):
     """Quick approve action for hospitals"""
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied.")
         return redirect("accounts:hospital_login")
 
-    appointment = get_object_or_404(Appointment, id=appointment_id, hospital=hospital)
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('vaccine'), id=appointment_id, hospital=hospital
+    )
 
-    
-    if not appointment.vaccine:
-        messages.error(request, "Cannot approve appointment: No vaccine selected.")
-        return redirect("accounts:hospital_appointments")
+    if request.method == "POST":
+        # Status change and stock decrement happen in one transaction
+        result = stock.approve_appointment(appointment)
+
+        if result == stock.APPROVED:
+            messages.success(request, f"Appointment approved and 1 dose of '{appointment.vaccine.name}' deducted from stock.")
+        elif result == stock.NO_VACCINE:
+            messages.error(request, "Cannot approve appointment: No vaccine selected.")
+        elif result == stock.OUT_OF_STOCK:
+            messages.error(request, f"Cannot approve. '{appointment.vaccine.name}' is OUT OF STOCK.")
+        else:
+            messages.error(request, "This appointment is no longer pending.")
 
-    
+    return redirect("accounts:hospital_appointments")
 
-    inventory_item = Inventory.objects.filter(hospital=hospital, vaccine=appointment.vaccine).first()
 
-    # ✅ If not available or zero stock → reject approval
-    if not inventory_item or inventory_item.stock_quantity <= 0:
-        messages.error(request, f"Cannot approve. '{appointment.vaccine.name}' is OUT OF STOCK.")
-        return redirect("accounts:hospital_appointments")
+BULK_APPROVE_MAX = 200
+BULK_APPROVE_REJECTIONS = (
+    (stock.OUT_OF_STOCK, "Not approved, out of stock"),
+    (stock.NO_VACCINE, "Not approved, no vaccine selected"),
+    (stock.NOT_PENDING, "Not approved, no longer pending"),
+)
 
-    # ✅ If stock available → approve & reduce stock
-    if request.method == "POST":
-        appointment.status = "Approved"
-        appointment.save()
 
-        inventory_item.stock_quantity -= 1
-        inventory_item.save()
+@login_required
+def hospital_bulk_approve_appointments(request):
+    """Approve the ticked pending appointments in one go, checking stock per vaccine."""
+    hospital = request.hospital
+    if hospital is None:
+        messages.error(request, "Access denied.")
+        return redirect("accounts:hospital_login")
 
-        messages.success(request, f"Appointment approved and 1 dose of '{appointment.vaccine.name}' deducted from stock.")
+    if request.method == "POST":
+        try:
+            appointment_ids = {int(value) for value in request.POST.getlist("appointment_ids")}
+        except ValueError:
+            appointment_ids = None
+        if not appointment_ids:
+            messages.error(request, "Select at least one appointment to approve.")
+        elif len(appointment_ids) > BULK_APPROVE_MAX:
+            messages.error(request, f"You can approve at most {BULK_APPROVE_MAX} appointments at once.")
+        else:
+            results = stock.approve_appointments(hospital.id, appointment_ids)
+            rows = Appointment.objects.filter(pk__in=appointment_ids, hospital=hospital).select_related('child', 'vaccine')
+            labels = {
+                appt.id: f"{appt.child.name} ({appt.vaccine.name if appt.vaccine else 'no vaccine'})" for appt in rows
+            }
+            approved = [labels[pk] for pk, result in sorted(results.items()) if result == stock.APPROVED]
+            if approved:
+                messages.success(request, f"Approved {len(approved)} appointment(s): {', '.join(approved)}.")
+            for outcome, text in BULK_APPROVE_REJECTIONS:
+                rejected = [labels.get(pk, f"#{pk}") for pk, result in sorted(results.items()) if result == outcome]
+                if rejected:
+                    messages.error(request, f"{text}: {', '.join(rejected)}.")
 
     return redirect("accounts:hospital_appointments")
 
@@ -337,7 +459,7 @@ def hospital_confirm_appointment(request, appointment_id):
 
 @login_required
 def book_appointment(request):
-    parent = Parent.objects.filter(user=request.user).first()
+    parent = request.parent
     
     if not parent:
         messages.error(request, "No parent profile found. Please complete your registration.")
@@ -354,15 +476,20 @@ def book_appointment(request):
             appointment = form.save(commit=False)
             appointment.parent = parent
             appointment.status = "Pending"
-            appointment.save()
-            
-            messages.success(
-                request, 
-                f"Appointment booked for {appointment.child.name} "
-                f"at {appointment.hospital.name} on {appointment.date} at {appointment.time}."
-            )
-            return redirect('accounts:view_appointments')
-        else:
+            try:
+                # Reserves the slot; fails if it filled up since the form was validated
+                appointment.save()
+            except ValidationError as error:
+                form.add_error('time', error)
+            else:
+                messages.success(
+                    request, 
+                    f"Appointment booked for {appointment.child.name} "
+                    f"at {appointment.hospital.name} on {appointment.date} at {appointment.time}."
+                )
+                return redirect('accounts:view_appointments')
+
+        if form.errors:
             for field, errors in form.errors.items():
                 for error in errors:
                     messages.error(request, f"{field}: {error}")
@@ -372,36 +499,53 @@ def book_appointment(request):
     return render(request, 'accounts/book_appointment.html', {'form': form})
 
 
+APPOINTMENTS_PAGE_SIZE = 25
+
+
 @login_required
 def view_appointments(request):
-    parent = Parent.objects.filter(user=request.user).first()
+    parent = request.parent
     
     if not parent:
         messages.error(request, "No parent profile found.")
         return redirect('accounts:parent_dashboard')
     
-    appointments = Appointment.objects.filter(parent=parent).select_related(
-        'child', 'hospital', 'vaccine'
-    ).order_by('-date', '-time')
-    
-    # Separate upcoming and past appointments
-    today = date.today()
-    upcoming = appointments.filter(date__gte=today).exclude(status='Cancelled')
-    past = appointments.filter(Q(date__lt=today) | Q(status='Cancelled'))
-    
-    context = {
-        'appointments': appointments,
-        'upcoming_appointments': upcoming,
-        'past_appointments': past,
+    # Totals for the whole history in one aggregate, rows one keyset page at a time
+    appointments = Appointment.objects.filter(parent=parent)
+    counts = appointments.aggregate(**HospitalAppointmentCounter.status_aggregates())
+    page, next_cursor = keyset_page(
+        _appointment_rows(appointments), request.GET.get('after'), APPOINTMENTS_PAGE_SIZE, descending=True
+    )
+    return render(request, 'accounts/view_appointments.html', _appointments_context(request, counts, page, next_cursor))
+
+
+def _appointment_rows(appointments):
+    return appointments.select_related('child', 'hospital', 'vaccine')
+
+
+def _appointments_context(request, counts, page, next_cursor):
+    counts['total'] = sum(counts.values())
+    # Split the page into status and upcoming/past buckets in one pass
+    grouped = GroupedAppointments(page)
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_url = f"?{params.urlencode()}"
+    return {
+        'appointments': grouped,
+        'upcoming_appointments': grouped.upcoming,
+        'past_appointments': grouped.past,
+        'status_counts': counts,
+        'next_url': next_url,
+        'first_page': 'after' not in request.GET,
     }
-    
-    return render(request, 'accounts/view_appointments.html', context)
 
 
 @login_required
 def cancel_appointment(request, appointment_id):
     """Allow parent to cancel their appointment"""
-    parent = Parent.objects.filter(user=request.user).first()
+    parent = request.parent
     appointment = get_object_or_404(Appointment, id=appointment_id, parent=parent)
     
     if request.method == "POST":
@@ -470,6 +614,14 @@ def reject_hospital(request, hospital_id):
     
     return redirect('accounts:approve_hospitals')
 
+
+@login_required
+@user_passes_test(is_superuser)
+@never_cache
+def metrics(request):
+    """Request, SQL and template metrics in the Prometheus text format."""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # --- In accounts/views.py ---
 
 # ... imports ...
@@ -479,18 +631,21 @@ def reject_hospital(request, hospital_id):
 
 @login_required
 def hospital_inventory(request):
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied. Please log in as a hospital.")
         return redirect("accounts:hospital_login")
 
     # Fetch all inventory items for this hospital
-    inventory_items = Inventory.objects.filter(hospital=hospital).select_related('vaccine').order_by('vaccine__name')
-    
-    # Identify vaccines not currently in the inventory for an "Add New" feature
-    existing_vaccine_ids = inventory_items.values_list('vaccine_id', flat=True)
-    available_vaccines_to_add = Vaccine.objects.exclude(id__in=existing_vaccine_ids)
+    inventory_items = list(
+        Inventory.objects.filter(hospital=hospital).select_related('vaccine').order_by('vaccine__name')
+    )
+
+    # Vaccines not yet stocked, for the "Add New" feature, from the in-process catalog
+    existing_vaccine_ids = {item.vaccine_id for item in inventory_items}
+    available_vaccines_to_add = [
+        vaccine for vaccine in get_catalog().instances(Vaccine) if vaccine.pk not in existing_vaccine_ids
+    ]
 
     context = {
         'hospital': hospital,
@@ -500,11 +655,94 @@ def hospital_inventory(request):
     return render(request, 'accounts/hospital_inventory.html', context)
 
 
+EXPORTS = {
+    # kind: (columns, rows, file and sheet name, page to return to on error)
+    'appointments': (exports.APPOINTMENT_COLUMNS, exports.appointment_rows, 'appointments', 'accounts:hospital_appointments'),
+    'inventory': (exports.STOCK_COLUMNS, exports.stock_rows, 'stock-ledger', 'accounts:hospital_inventory'),
+}
+
+
+def _hospital_export(request, kind):
+    hospital = request.hospital
+    if hospital is None:
+        messages.error(request, "Access denied. Please log in as a hospital.")
+        return redirect("accounts:hospital_login")
+
+    columns, rows, name, back = EXPORTS[kind]
+    export_format = request.GET.get('format', 'csv')
+    try:
+        if export_format not in exports.FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        filters = exports.parse_filters(request.GET)
+    except ValueError as error:
+        messages.error(request, f"Cannot export: {error}")
+        return redirect(back)
+
+    # Rows are read in chunks while the response is sent, never all at once
+    content_type, extension = exports.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        exports.stream(export_format, columns, rows(hospital.id, filters), name),
+        content_type=content_type,
+    )
+    filename = f"{name}-{hospital.id}-{filters['start']:%Y%m%d}-{filters['end']:%Y%m%d}.{extension}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def hospital_export_appointments(request):
+    """Stream the hospital's appointments as CSV or XLSX: ?format=&start=&end=&status=&vaccine=."""
+    return _hospital_export(request, 'appointments')
+
+
+@login_required
+def hospital_export_inventory(request):
+    """Stream the hospital's stock ledger as CSV or XLSX: ?format=&start=&end=&vaccine=."""
+    return _hospital_export(request, 'inventory')
+
+
+IMPORT_ERRORS_SHOWN = 200
+
+
+@login_required
+def hospital_import_records(request):
+    """Upload a CSV of children and past vaccinations; bad rows are listed, the rest imported."""
+    hospital = request.hospital
+    if hospital is None:
+        messages.error(request, "Access denied. Please log in as a hospital.")
+        return redirect("accounts:hospital_login")
+
+    result = None
+    if request.method == "POST":
+        form = RecordImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Decoded while it is read; the upload is never loaded whole
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_records(stream, hospital.id)
+            except (UnicodeDecodeError, csv.Error) as error:
+                messages.error(request, f"Could not read the file: {error}")
+            else:
+                messages.success(
+                    request,
+                    f"Imported {result.children_created} children and {result.appointments_created} vaccinations "
+                    f"from {result.rows} rows.",
+                )
+    else:
+        form = RecordImportForm()
+
+    return render(request, 'accounts/hospital_import.html', {
+        'hospital': hospital,
+        'form': form,
+        'result': result,
+        'errors_shown': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+    })
+
+
 @login_required
 def update_inventory_stock(request, inventory_id=None, vaccine_id=None):
-    try:
-        hospital = Hospital.objects.get(user=request.user)
-    except Hospital.DoesNotExist:
+    hospital = request.hospital
+    if hospital is None:
         messages.error(request, "Access denied.")
         return redirect("accounts:hospital_login")
 
@@ -531,8 +769,8 @@ def update_inventory_stock(request, inventory_id=None, vaccine_id=None):
             if new_stock < 0:
                 raise ValueError("Stock cannot be negative.")
                 
-            inventory.stock_quantity = new_stock
-            inventory.save()
+            # Booked as a restock/correction in the stock ledger
+            stock.set_stock_level(inventory, new_stock, note=f"Set by {request.user.username}")
             messages.success(request, f"Stock for {vaccine_name} updated to {new_stock}.")
         except ValueError:
             messages.error(request, "Invalid stock quantity entered.")
@@ -550,23 +788,229 @@ def update_inventory_stock(request, inventory_id=None, vaccine_id=None):
 
 # ... other imports ...
 
+def _availability_etag(request, hospital_id):
+    availability = get_hospital_availability(hospital_id)
+    return availability and availability['etag']
+
+
+def _availability_last_modified(request, hospital_id):
+    availability = get_hospital_availability(hospital_id)
+    return availability and availability['last_modified']
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=_availability_etag, last_modified_func=_availability_last_modified)
 def get_available_vaccines_api(request, hospital_id):
     """API endpoint for AJAX to fetch available vaccines for a given hospital."""
+    # Served from the availability cache; a 304 is returned before we get here
+    availability = get_hospital_availability(hospital_id)
+    if availability is None:
+        return JsonResponse({'error': 'Hospital not found'}, status=404)
+
+    return JsonResponse({'vaccines': availability['vaccines']})
+
+
+BULK_AVAILABILITY_MAX_HOSPITALS = 200
+
+
+def _bulk_availability_params(request):
+    """Parse ?hospital=1&hospital=2 (or comma lists), ?vaccine= and ?layout=."""
+    hospital_ids = None
+    raw_ids = [part for value in request.GET.getlist('hospital') for part in value.split(',') if part]
+    if raw_ids:
+        hospital_ids = [int(value) for value in raw_ids]
+        if len(set(hospital_ids)) > BULK_AVAILABILITY_MAX_HOSPITALS:
+            raise ValueError("Too many hospitals requested.")
+    vaccine_id = request.GET.get('vaccine')
+    vaccine_id = int(vaccine_id) if vaccine_id else None
+    columnar = request.GET.get('layout') == 'columnar'
+    return hospital_ids, vaccine_id, columnar
+
+
+def _bulk_availability_etag(request):
     try:
-        hospital = Hospital.objects.get(id=hospital_id)
-        
-        # Filter Inventory where stock > 0 for the hospital
-        available_inventory = Inventory.objects.filter(
-            hospital=hospital, 
-            stock_quantity__gt=0
-        ).select_related('vaccine')
-        
-        vaccine_list = [
-            {'id': item.vaccine.id, 'name': item.vaccine.name}
-            for item in available_inventory
-        ]
-        
-        return JsonResponse({'vaccines': vaccine_list})
-        
-    except Hospital.DoesNotExist:
-        return JsonResponse({'error': 'Hospital not found'}, status=404)
\ No newline at end of file
+        return get_network_availability(*_bulk_availability_params(request))['etag']
+    except ValueError:
+        return None
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=_bulk_availability_etag)
+def bulk_available_vaccines_api(request):
+    """In-stock vaccines for many (default: all approved) hospitals in one document."""
+    try:
+        params = _bulk_availability_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid hospital or vaccine id'}, status=400)
+
+    availability = get_network_availability(*params)
+    return HttpResponse(availability['body'], content_type='application/json')
+
+
+def next_free_slots_api(request, hospital_id):
+    """Next free booking slots at a hospital, from ?from=YYYY-MM-DD (default today)."""
+    hospital = get_object_or_404(Hospital, id=hospital_id, approved=True)
+    start = _parse_date(request.GET.get('from'), date.today())
+    try:
+        count = min(max(int(request.GET.get('count', 5)), 1), 50)
+    except ValueError:
+        count = 5
+
+    slots = next_free_slots(hospital.id, start, count=count)
+    return JsonResponse({
+        'slots': [{'date': day.isoformat(), 'time': moment.strftime('%H:%M')} for day, moment in slots]
+    })
+
+
+# ==================== MOBILE API ====================
+# Read-only JSON for the mobile app, signed in with the parent's session.
+# See accounts.mobile_api for the field lists and the ETag handling.
+
+
+def _mobile_parent_error(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return JsonResponse({'error': 'No parent profile found'}, status=403)
+
+
+@cache_control(private=True, no_cache=True)
+def mobile_children_api(request):
+    """The parent's children; ?fields=id,name,... selects the fields."""
+    if request.parent is None:
+        return _mobile_parent_error(request)
+    try:
+        names = mobile_api.select_fields(request.GET.get('fields'), mobile_api.CHILD_FIELDS)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return mobile_api.conditional_json(
+        request, mobile_api.children_validator(request.parent, names),
+        lambda: {'children': mobile_api.children(request.parent, names)},
+    )
+
+
+@cache_control(private=True, no_cache=True)
+def mobile_appointments_api(request):
+    """The parent's appointments, newest first, a page at a time: ?after=<next>&limit=&fields=."""
+    if request.parent is None:
+        return _mobile_parent_error(request)
+    try:
+        names = mobile_api.select_fields(request.GET.get('fields'), mobile_api.APPOINTMENT_FIELDS)
+        limit = mobile_api.page_size(request.GET.get('limit'))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    cursor = request.GET.get('after')
+
+    def build():
+        rows, next_cursor = mobile_api.appointments(request.parent, names, cursor, limit)
+        return {'appointments': rows, 'next': next_cursor}
+
+    return mobile_api.conditional_json(
+        request, mobile_api.appointments_validator(request.parent, names, cursor, limit), build
+    )
+
+
+@cache_control(private=True, no_cache=True)
+def mobile_vaccinations_api(request):
+    """Every scheduled dose of the parent's children with its status."""
+    if request.parent is None:
+        return _mobile_parent_error(request)
+    try:
+        names = mobile_api.select_fields(request.GET.get('fields'), mobile_api.VACCINATION_FIELDS)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return mobile_api.conditional_json(
+        request, mobile_api.vaccinations_validator(request.parent, names),
+        lambda: {'vaccinations': mobile_api.vaccinations(request.parent, names)},
+    )
+
+
+# ==================== ASYNC VIEWS ====================
+# Async variants of the read-heavy pages for ASGI deployments. Independent
+# queries are awaited together; every queryset is evaluated before the
+# template renders, since templates cannot run queries in async code.
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+@login_required
+async def parent_dashboard_async(request):
+    parent = request.parent
+    if parent is None:
+        messages.error(request, "No parent profile found.")
+        return redirect('accounts:home')
+
+    children, recent_appointments, totals, vaccinations_due, versions = await asyncio.gather(
+        _alist(Child.objects.filter(parent=parent)),
+        _alist(_recent_appointments(parent)),
+        Appointment.objects.filter(parent=parent).aaggregate(**PARENT_TOTALS),
+        _alist(_upcoming_doses(parent)),
+        aparent_versions(parent),
+    )
+    return render(request, "accounts/parent_dashboard.html", _parent_dashboard_context(
+        parent, children, recent_appointments, totals, vaccinations_due, versions
+    ))
+
+
+@login_required
+async def hospital_dashboard_async(request):
+    hospital = request.hospital
+    if hospital is None:
+        messages.error(request, "Access denied. You must log in as an approved hospital.")
+        return redirect('accounts:hospital_login')
+
+    if not hospital.approved:
+        messages.error(request, "Your hospital is registered but not yet approved by the administrator.")
+        await alogout(request)
+        return redirect('accounts:hospital_login')
+
+    counts, versions = await asyncio.gather(
+        HospitalAppointmentCounter.acounts_for(hospital.id), ahospital_versions(hospital)
+    )
+    return render(request, 'accounts/hospital_dashboard.html', _hospital_dashboard_context(hospital, counts, versions))
+
+
+@login_required
+async def view_appointments_async(request):
+    parent = request.parent
+    if not parent:
+        messages.error(request, "No parent profile found.")
+        return redirect('accounts:parent_dashboard')
+
+    appointments = Appointment.objects.filter(parent=parent)
+    counts, (page, next_cursor) = await asyncio.gather(
+        appointments.aaggregate(**HospitalAppointmentCounter.status_aggregates()),
+        akeyset_page(
+            _appointment_rows(appointments), request.GET.get('after'), APPOINTMENTS_PAGE_SIZE, descending=True
+        ),
+    )
+    return render(request, 'accounts/view_appointments.html', _appointments_context(request, counts, page, next_cursor))
+
+
+@cache_control(no_cache=True)
+async def get_available_vaccines_api_async(request, hospital_id):
+    """Async ``get_available_vaccines_api``; answers conditional GETs the same way."""
+    availability = await aget_hospital_availability(hospital_id)
+    if availability is None:
+        return JsonResponse({'error': 'Hospital not found'}, status=404)
+
+    # @condition calls its validator functions synchronously, so check them here
+    etag = quote_etag(availability['etag'])
+    last_modified = availability['last_modified']
+    if last_modified is not None:
+        if not timezone.is_aware(last_modified):
+            last_modified = timezone.make_aware(last_modified, dt_timezone.utc)
+        last_modified = int(last_modified.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse({'vaccines': availability['vaccines']})
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        response.headers.setdefault('ETag', etag)
+    return response
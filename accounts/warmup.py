@@ -0,0 +1,48 @@
+"""Compile every Django template ahead of the first request.
+
+With the cached template loader each process compiles a template the first
+time it is used. ``warm_templates()`` runs at WSGI/ASGI startup so that
+cost is paid before traffic arrives; ``manage.py warm_templates`` runs the
+same pass as a deploy check.
+"""
+import logging
+from pathlib import Path
+
+from django.template import TemplateSyntaxError, engines
+from django.template.autoreload import get_template_directories
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def template_names():
+    """Names of the project's and apps' templates, as get_template() expects them.
+
+    Django's own templates (the admin's) are left to compile on first use.
+    """
+    names = set()
+    for directory in get_template_directories():
+        directory = Path(directory)
+        if directory.is_dir():
+            names.update(path.relative_to(directory).as_posix() for path in directory.rglob('*') if path.is_file())
+    return sorted(names)
+
+
+def warm_templates():
+    """Compile every template into the loaders' caches; returns ``(compiled, errors)``."""
+    names = template_names()
+    compiled = 0
+    errors = {}
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in names:
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as error:
+                errors[name] = error
+            else:
+                compiled += 1
+    for name, error in errors.items():
+        logger.warning("Template %s failed to compile: %s", name, error)
+    return compiled, errors
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sqlite_profile import production_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,11 +45,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'accounts.metrics.MetricsMiddleware',
+    # Collected static files are answered before sessions and auth run
+    'child_vaccination.static_assets.StaticAssetsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.role / request.parent / request.hospital, resolved on first access and cached in the session
+    'accounts.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -56,10 +65,18 @@ ROOT_URLCONF = 'child_vaccination.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for MetricsMiddleware
+        'BACKEND': 'accounts.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR/'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process, in development too;
+            # manage.py warm_templates lists and checks them all
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -80,6 +97,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test database so concurrent-write tests get real
+        # SQLite locking instead of shared-cache table locks
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# DB_PROFILE=production turns on WAL, busy timeout, IMMEDIATE transactions and
+# persistent connections; see child_vaccination/sqlite_profile.py for the
+# SQLITE_* and DB_CONN_MAX_AGE environment overrides.
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+if DB_PROFILE == 'production':
+    DATABASES['default'] = production_database(DATABASES['default'])
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the vaccine-availability documents, the dashboard fragments and the
+# users' profile versions; point this at a shared cache (e.g. Redis or
+# Memcached) when running more than one worker process, or a role change made
+# in one worker is not seen by sessions served by another.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'child-vaccination',
     }
 }
 
@@ -124,6 +168,15 @@ STATICFILES_DIRS=[
     BASE_DIR/"static",
 ]
 
+# Built by collectstatic: content-hashed names plus .gz/.br copies, served by
+# StaticAssetsMiddleware with far-future cache headers
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'child_vaccination.static_assets.CompressedManifestStaticFilesStorage'},
+}
+
 MEDIA_URL='/media/'
 MEDIA_ROOT=BASE_DIR/'media'
 
@@ -0,0 +1,148 @@
+"""Content-hashed, precompressed static files served with far-future caching.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` is the build
+step: it writes each file under a content-hashed name (``base.3f2a….css``)
+plus ``.gz`` and, when the optional ``brotli`` package is installed, ``.br``
+copies. ``StaticAssetsMiddleware`` serves STATIC_ROOT ahead of sessions and
+auth, picks the best encoding the client accepts, and marks hashed names
+immutable for a year; a changed file gets a new name, so nothing goes stale.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import stat
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html', '.xml')
+# Smaller files gain nothing once headers are counted
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Unhashed names can change in place, so browsers revalidate them often
+UNHASHED_MAX_AGE = 60
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+# (Accept-Encoding token, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br copies of text files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and isinstance(hashed_name, str) and hashed_name not in compressed:
+                compressed.add(hashed_name)
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as handle:
+            content = handle.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, data in variants:
+            # Keep a variant only when it is actually smaller
+            if len(data) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            # collectstatic has not run (tests, a fresh checkout): fall back to the plain name
+            return StaticFilesStorage.url(self, name)
+
+
+class StaticAssetsMiddleware:
+    """Serve STATIC_URL from STATIC_ROOT; put it right after MetricsMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = settings.STATIC_ROOT
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        # Only a stat() and an open(): cheap enough to do on the event loop
+        response = self.serve(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve(self, request):
+        """Return a response for a collected static file, or None to pass the request on."""
+        if not self.root or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        try:
+            stats = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stats.st_mode):
+            return None
+
+        hashed = bool(HASHED_NAME.search(name))
+        headers = {
+            'Cache-Control': (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if hashed
+                else f'public, max-age={UNHASHED_MAX_AGE}'
+            ),
+            'Last-Modified': http_date(stats.st_mtime),
+            'Vary': 'Accept-Encoding',
+        }
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if since is not None and int(stats.st_mtime) <= since:
+            return self.with_headers(HttpResponseNotModified(), headers)
+
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = request.headers.get('Accept-Encoding', '')
+        encoding = None
+        for token, suffix in ENCODINGS:
+            if token in accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, token
+                break
+        response = self.with_headers(
+            FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream'), headers
+        )
+        # FileResponse names the file inline; the .gz/.br name would only confuse clients
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def with_headers(self, response, headers):
+        for name, value in headers.items():
+            response.headers[name] = value
+        return response
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from accounts.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls), 
+    path('metrics', metrics, name='metrics'),
     path('', include('accounts.urls')) # include app URLs at root
 ]